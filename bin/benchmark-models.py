@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks of converting members and submissions to and from DynamoDB items.
+
+Reads compare loading with full validation against the trusted decoder, writes
+compare the previous jsonable_encoder based export against ddict(). Items are built
+as DynamoDB returns them (numbers as Decimal) so only model conversion is measured,
+not any network or (de)serialisation of requests.
+"""
+import argparse
+import sys
+import timeit
+import uuid
+from collections.abc import Callable
+from decimal import Decimal
+from pathlib import Path
+from typing import Any
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from lumina.database.models import (  # noqa: E402
+    DynamoExportMixin,
+    GitHubIssueModel,
+    GitHubIssueState,
+    MemberConsentModel,
+    MemberModel,
+    SubmissionModel,
+    SubmitterModel,
+)
+from lumina.util import dates  # noqa: E402
+
+
+def as_dynamodb_item(item: Any) -> Any:
+    """Numbers come back from DynamoDB as Decimal."""
+    if isinstance(item, dict):
+        return {k: as_dynamodb_item(v) for k, v in item.items()}
+    if isinstance(item, list):
+        return [as_dynamodb_item(v) for v in item]
+    if isinstance(item, int) and not isinstance(item, bool):
+        return Decimal(item)
+    return item
+
+
+def make_member() -> MemberModel:
+    return MemberModel(
+        pk="fred_bloggs",
+        name="Fred Bloggs",
+        email="fred@bloggs.com",
+        phone="01234567890",
+        year_of_graduation=1999,
+        created_at=dates.now(),
+        email_verified_at=dates.now(),
+        consent=MemberConsentModel(
+            consent_news=dates.now(), consent_network=dates.now()
+        ),
+        anonymous_ids=[uuid.uuid4()],
+        profile_version=3,
+    )
+
+
+def make_submission() -> SubmissionModel:
+    return SubmissionModel(
+        pk="fred_bloggs",
+        sk="submission/101",
+        url="https://github.com/newtheatre/history-project/issues/101",
+        target_id="00_01/romeo_and_juliet",
+        target_name="Romeo and Juliet",
+        target_type="show",
+        message="The part of Romeo was played by a hamster.",
+        created_at=dates.now(),
+        submitter=SubmitterModel(
+            id="fred_bloggs",
+            name="Fred Bloggs",
+            email="fred@bloggs.com",
+            verified=True,
+        ),
+        github_issue=GitHubIssueModel(
+            number=101,
+            state=GitHubIssueState.OPEN,
+            title="Romeo and Juliet",
+            created_at=dates.now(),
+            updated_at=dates.now(),
+            comments=2,
+        ),
+    )
+
+
+def jsonable_ddict(model: DynamoExportMixin) -> dict[str, Any]:
+    """How ddict() exported models before it had its own encoder."""
+    return jsonable_encoder(model.model_dump())  # type: ignore
+
+
+def without_none(item: dict[str, Any]) -> dict[str, Any]:
+    """ddict() omits None, the jsonable_encoder export stored it as NULL."""
+    return {
+        k: without_none(v) if isinstance(v, dict) else v
+        for k, v in item.items()
+        if v is not None
+    }
+
+
+def time_per_item(load: Callable[[], Any], number: int) -> float:
+    """Best of five runs, in microseconds per item."""
+    return min(timeit.repeat(load, number=number, repeat=5)) / number * 1_000_000
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--number", type=int, default=10_000, help="Loads per run")
+    args = parser.parse_args()
+
+    print(f"{'benchmark':<22} {'before':>12} {'after':>12} {'speedup':>8}")
+
+    def report(name: str, before: float, after: float) -> None:
+        print(f"{name:<22} {before:>10.1f}us {after:>10.1f}us {before / after:>7.1f}x")
+
+    for model in (make_member(), make_submission()):
+        cls = type(model)
+        name = cls.__name__
+        item = as_dynamodb_item(model.ddict())
+        # Check the before and after paths agree before timing them
+        assert model.ddict() == without_none(jsonable_ddict(model))
+        assert cls.from_ddict(item) == cls.from_ddict(item, trusted=False)
+        report(
+            f"{name} write",
+            time_per_item(lambda m=model: jsonable_ddict(m), args.number),
+            time_per_item(lambda m=model: m.ddict(), args.number),
+        )
+        report(
+            f"{name} read",
+            time_per_item(
+                lambda m=cls, i=item: m.from_ddict(i, trusted=False),
+                args.number,
+            ),
+            time_per_item(lambda m=cls, i=item: m.from_ddict(i), args.number),
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+"""
+Compile the email templates to Python modules in the built service, so they aren't
+parsed on a cold start. Run after `sam build`, e.g.
+
+    PYTHONPATH=src bin/compile-templates.py
+"""
+import argparse
+import sys
+from pathlib import Path
+
+from lumina.emails.render import compile_templates
+
+BUILD_PATH = Path(".aws-sam/build/LuminaService/lumina/emails/compiled")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--target", type=Path, default=BUILD_PATH)
+    args = parser.parse_args()
+
+    compile_templates(args.target)
+    print(f"Compiled templates to {args.target}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
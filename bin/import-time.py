@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Report how long each module takes to import when the Lambda handler cold starts.
+
+Uses `python -X importtime` to import the handler in a fresh interpreter, then prints
+the slowest modules (cumulative, in ms). Exits non-zero if a module that should be
+deferred until a route needs it is imported at startup, or if the total import time
+exceeds the given budget, so it can be run in CI to catch cold start regressions.
+"""
+import argparse
+import os
+import subprocess
+import sys
+from pathlib import Path
+from typing import NamedTuple
+
+SRC_PATH = Path(__file__).parent.parent / "src"
+ENTRYPOINT = "handler"
+
+# Heavy dependencies which are imported lazily on first use
+DEFERRED_MODULES = {"github", "jinja2", "html2text", "httpx"}
+
+
+class ImportTime(NamedTuple):
+    module: str
+    self_ms: float
+    cumulative_ms: float
+    depth: int
+
+
+def measure_import_times(entrypoint: str) -> list[ImportTime]:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {entrypoint}"],
+        env={**os.environ, "PYTHONPATH": str(SRC_PATH)},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line.removeprefix("import time:").split("|")
+        times.append(
+            ImportTime(
+                module=name.strip(),
+                self_ms=int(self_us) / 1000,
+                cumulative_ms=int(cumulative_us) / 1000,
+                depth=(len(name) - len(name.lstrip())) // 2,
+            )
+        )
+    return times
+
+
+def print_report(times: list[ImportTime], top: int) -> None:
+    print(f"{'cumulative':>12} {'self':>10}  module")
+    slowest = sorted(times, key=lambda t: t.cumulative_ms, reverse=True)
+    for t in slowest[:top]:
+        print(f"{t.cumulative_ms:>10.1f}ms {t.self_ms:>8.1f}ms  {t.module}")
+    print()
+    print("Lumina modules:")
+    for t in times:
+        if t.module == "lumina" or t.module.startswith("lumina."):
+            print(f"{t.cumulative_ms:>10.1f}ms {t.self_ms:>8.1f}ms  {t.module}")
+    print()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--top", type=int, default=30, help="Modules to list")
+    parser.add_argument(
+        "--budget-ms",
+        type=float,
+        default=None,
+        help="Fail if importing the handler takes longer than this",
+    )
+    args = parser.parse_args()
+
+    times = measure_import_times(ENTRYPOINT)
+    print_report(times, args.top)
+
+    failures = []
+    imported = {t.module.split(".")[0] for t in times}
+    for module in sorted(DEFERRED_MODULES & imported):
+        failures.append(f"{module} is imported at startup but should be deferred")
+    total_ms = next(t.cumulative_ms for t in times if t.module == ENTRYPOINT)
+    print(f"Total: {total_ms:.1f}ms")
+    if args.budget_ms is not None and total_ms > args.budget_ms:
+        failures.append(f"Import took {total_ms:.1f}ms, budget {args.budget_ms}ms")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
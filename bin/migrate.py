@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+"""
+Run a data migration against the table for an environment, e.g.
+
+    ENVIRONMENT=prod PYTHONPATH=src bin/migrate.py backfill_submission_owners
+"""
+import argparse
+import logging
+import sys
+
+from lumina.config import settings
+from lumina.database.migrations import MIGRATIONS
+from lumina.database.table import get_table_name
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("migration", choices=sorted(MIGRATIONS))
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    print(f"Running {args.migration} on {get_table_name()} ({settings.environment})")
+    count = MIGRATIONS[args.migration]()
+    print(f"Done, {count} items written")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
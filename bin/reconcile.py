@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Reconcile submissions' GitHub issues for an environment, by default those updated
+since the last run, e.g.
+
+    ENVIRONMENT=prod PYTHONPATH=src bin/reconcile.py --since 2023-08-01
+"""
+import argparse
+import datetime
+import logging
+import sys
+
+from lumina.config import settings
+from lumina.database.table import get_table_name
+from lumina.github.reconcile import reconcile_issues
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument(
+        "--since",
+        type=datetime.datetime.fromisoformat,
+        help="reconcile issues updated at or after this time, in UTC",
+    )
+    group.add_argument("--all", action="store_true", help="reconcile every issue")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    since = args.since
+    if since and since.tzinfo is None:
+        since = since.replace(tzinfo=datetime.timezone.utc)
+    print(f"Reconciling issues on {get_table_name()} ({settings.environment})")
+    updated = reconcile_issues(since=since, full=args.all)
+    print(f"Done, {len(updated)} submissions updated")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,7 +2,7 @@
 import shutil
 from pathlib import Path
 
-KEEP = {"dynamodb", "ssm", "ses", "sesv2"}
+KEEP = {"dynamodb", "ssm", "ses", "sesv2", "sqs"}
 BOTOCORE_DATA_PATH = Path(".aws-sam/build/PythonDependencyLayer/python/botocore/data")
 
 
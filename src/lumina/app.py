@@ -1,7 +1,9 @@
 import lumina.router
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from lumina.auth import HEADER_REFRESHED_TOKEN
 from lumina.config import settings
+from lumina.database.cursor import HEADER_NEXT_CURSOR
 from sentry_sdk.integrations.asgi import SentryAsgiMiddleware
 
 app = FastAPI(title="Lumina", version=settings.vcs_rev, root_path=settings.root_path)
@@ -12,6 +14,7 @@ app.add_middleware(
     allow_origins=["http://localhost:3000", "https://nthp-web.pages.dev"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[HEADER_NEXT_CURSOR, HEADER_REFRESHED_TOKEN],
 )
 
 app.include_router(lumina.router.router)
@@ -1,22 +1,51 @@
+import functools
+import hashlib
+from collections import OrderedDict
 from datetime import datetime, timedelta, timezone
 from http import HTTPStatus
 
 import jwt
 import lumina.database.operations
-from fastapi import Depends, HTTPException, Request
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric.rsa import RSAPrivateKey, RSAPublicKey
+from fastapi import Depends, HTTPException, Request, Response
 from fastapi.security import HTTPBearer
 from lumina import ssm
+from lumina.config import settings
 from lumina.database.models import MemberModel
+from lumina.util import dates
 from pydantic import BaseModel
 
 JWT_ALGORITHM = "RS256"
 JWT_EXPIRATION_DELTA = timedelta(days=90)
 AUTH_URL = "https://nthp-web.pages.dev/auth"
+# Response header giving a new token, when a request changed the member's claims
+HEADER_REFRESHED_TOKEN = "X-Refreshed-Token"
+
+
+class MemberPrincipal(BaseModel):
+    """Lightweight view of a member, enough to authorise a request."""
+
+    id: str
+    is_admin: bool
+    email_verified: bool
+    profile_version: int
+
+    @classmethod
+    def from_model(cls, model: MemberModel) -> "MemberPrincipal":
+        return cls(
+            id=model.id,
+            is_admin=model.is_admin,
+            email_verified=model.email_verified,
+            profile_version=model.profile_version,
+        )
 
 
 class AuthenticatedToken(BaseModel):
     id: str
     expires_at: datetime
+    # Only present on tokens issued with member claims
+    principal: MemberPrincipal | None = None
 
 
 def get_jwt_public_key() -> str:
@@ -29,20 +58,122 @@ def get_jwt_private_key() -> str:
     return ssm.get_parameter("/lumina/jwt/private")
 
 
-def encode_jwt(sub: str) -> str:
+@functools.lru_cache(maxsize=2)
+def load_public_key(pem: str) -> RSAPublicKey:
+    """Parse a PEM public key, cached by PEM so a rotated key is parsed again."""
+    key = serialization.load_pem_public_key(pem.encode())
+    if not isinstance(key, RSAPublicKey):
+        raise TypeError(f"JWT public key must be RSA for {JWT_ALGORITHM}")
+    return key
+
+
+@functools.lru_cache(maxsize=2)
+def load_private_key(pem: str) -> RSAPrivateKey:
+    """Parse a PEM private key, cached by PEM so a rotated key is parsed again."""
+    key = serialization.load_pem_private_key(pem.encode(), password=None)
+    if not isinstance(key, RSAPrivateKey):
+        raise TypeError(f"JWT private key must be RSA for {JWT_ALGORITHM}")
+    return key
+
+
+class VerifiedTokenCache:
+    """
+    LRU of tokens which have already passed verification, keyed by a hash of the
+    token. Entries are only valid for the key that verified them and until the
+    token expires, after which the token must be verified again.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._key: RSAPublicKey | None = None
+        self._tokens: OrderedDict[bytes, AuthenticatedToken] = OrderedDict()
+
+    @staticmethod
+    def _hash(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str, key: RSAPublicKey) -> AuthenticatedToken | None:
+        if key is not self._key:
+            # Key has been rotated, nothing in the cache can be trusted
+            self.clear()
+            self._key = key
+            return None
+        token_hash = self._hash(token)
+        authenticated_token = self._tokens.get(token_hash)
+        if authenticated_token is None:
+            return None
+        if authenticated_token.expires_at <= dates.now():
+            del self._tokens[token_hash]
+            return None
+        self._tokens.move_to_end(token_hash)
+        return authenticated_token
+
+    def put(self, token: str, authenticated_token: AuthenticatedToken) -> None:
+        self._tokens[self._hash(token)] = authenticated_token
+        if len(self._tokens) > self.maxsize:
+            self._tokens.popitem(last=False)
+
+    def clear(self) -> None:
+        self._tokens.clear()
+
+
+verified_tokens = VerifiedTokenCache(maxsize=settings.jwt_verified_cache_size)
+
+
+def encode_jwt(
+    sub: str, member: MemberModel | None = None, expires_at: datetime | None = None
+) -> str:
+    payload = {
+        "sub": sub,
+        "exp": expires_at or datetime.now(tz=timezone.utc) + JWT_EXPIRATION_DELTA,
+    }
+    if member and settings.jwt_member_claims:
+        payload |= {
+            "adm": member.is_admin,
+            "evf": member.email_verified,
+            "ver": member.profile_version,
+        }
     return jwt.encode(
-        {
-            "sub": sub,
-            "exp": datetime.now(tz=timezone.utc) + JWT_EXPIRATION_DELTA,
-        },
-        get_jwt_private_key(),
+        payload,
+        load_private_key(get_jwt_private_key()),
         algorithm=JWT_ALGORITHM,
     )
 
 
+def set_refreshed_token(
+    response: Response, token: AuthenticatedToken, member: MemberModel
+) -> None:
+    """
+    After a request changed the member's own claims give them a token with the new
+    ones, expiring with the token they used, so their next requests can trust its
+    claims rather than reading their profile.
+    """
+    if settings.jwt_member_claims:
+        response.headers[HEADER_REFRESHED_TOKEN] = encode_jwt(
+            member.id, member, expires_at=token.expires_at
+        )
+
+
 def decode_jwt(token: str) -> AuthenticatedToken:
-    payload = jwt.decode(token, get_jwt_public_key(), algorithms=[JWT_ALGORITHM])
-    return AuthenticatedToken(id=payload["sub"], expires_at=payload["exp"])
+    public_key = load_public_key(get_jwt_public_key())
+    if authenticated_token := verified_tokens.get(token, public_key):
+        return authenticated_token
+    payload = jwt.decode(token, public_key, algorithms=[JWT_ALGORITHM])
+    authenticated_token = AuthenticatedToken(
+        id=payload["sub"],
+        expires_at=payload["exp"],
+        principal=MemberPrincipal(
+            id=payload["sub"],
+            is_admin=payload["adm"],
+            # Missing from some older tokens, unverified is the safe assumption
+            email_verified=payload.get("evf", False),
+            profile_version=payload["ver"],
+        )
+        if "ver" in payload
+        else None,
+    )
+    verified_tokens.put(token, authenticated_token)
+    return authenticated_token
 
 
 class JWTBearer(HTTPBearer):
@@ -68,8 +199,14 @@ class JWTBearer(HTTPBearer):
             )
 
 
+# Shared instances so FastAPI only decodes the token once per request, even when
+# several dependencies of an endpoint need it
+require_token = JWTBearer()
+optional_token = JWTBearer(optional=True)
+
+
 def require_member(
-    authenticated_member=Depends(JWTBearer()),  # noqa B008
+    authenticated_member=Depends(require_token),
 ) -> MemberModel:
     """Get member if token is provided, otherwise raise exception."""
     try:
@@ -82,7 +219,7 @@ def require_member(
 
 
 def optional_member(
-    authenticated_member=Depends(JWTBearer(optional=True)),  # noqa B008
+    authenticated_member=Depends(optional_token),
 ) -> MemberModel | None:
     """Get member if token is provided, otherwise return None."""
     if not authenticated_member:
@@ -90,17 +227,60 @@ def optional_member(
     return require_member(authenticated_member)
 
 
+def get_member_profile_version(id: str) -> int:
+    """Get a member's profile version, cached for a short time."""
+    member_versions = lumina.database.operations.member_versions
+    version = member_versions.get(id)
+    if version is None:
+        version = lumina.database.operations.get_member_profile_version(id)
+        member_versions.put(id, version)
+    return version
+
+
+def require_principal(
+    authenticated_member: AuthenticatedToken = Depends(require_token),
+) -> MemberPrincipal:
+    """
+    Get a principal for the member if token is provided, otherwise raise exception.
+    Uses the claims in the token when they are for the current profile version,
+    falling back to reading the member profile for tokens without claims.
+    """
+    try:
+        principal = authenticated_member.principal
+        if principal and principal.profile_version == get_member_profile_version(
+            principal.id
+        ):
+            return principal
+        member = lumina.database.operations.get_member(authenticated_member.id)
+    except lumina.database.operations.ResultNotFound as e:
+        raise HTTPException(
+            status_code=HTTPStatus.UNAUTHORIZED,
+            detail="Member no longer exists",
+        ) from e
+    lumina.database.operations.member_versions.put(member.id, member.profile_version)
+    return MemberPrincipal.from_model(member)
+
+
+def optional_principal(
+    authenticated_member=Depends(optional_token),
+) -> MemberPrincipal | None:
+    """Get principal if token is provided, otherwise return None."""
+    if not authenticated_member:
+        return None
+    return require_principal(authenticated_member)
+
+
 def require_admin(
-    member_model: MemberModel = Depends(require_member),
-) -> MemberModel:
+    principal: MemberPrincipal = Depends(require_principal),
+) -> MemberPrincipal:
     """Ensure member is an admin, otherwise raise exception."""
-    if not member_model.is_admin:
+    if not principal.is_admin:
         raise HTTPException(
             status_code=HTTPStatus.FORBIDDEN,
             detail="You do not have permission to perform this action",
         )
-    return member_model
+    return principal
 
 
-def get_auth_url(sub: str) -> str:
-    return f"{AUTH_URL}?token={encode_jwt(sub)}"
+def get_auth_url(sub: str, member: MemberModel | None = None) -> str:
+    return f"{AUTH_URL}?token={encode_jwt(sub, member)}"
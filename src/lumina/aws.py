@@ -0,0 +1,89 @@
+"""
+Shared boto3 session and clients.
+
+Creating a client loads the service model from disk, which costs tens of
+milliseconds, so each client is created once, on first use, and kept for the life
+of the Lambda execution environment. Every client shares one session and the
+connection and retry settings below.
+"""
+import threading
+from typing import TYPE_CHECKING, Any
+
+import boto3
+from botocore.config import Config
+from lumina.config import settings
+
+if TYPE_CHECKING:
+    from mypy_boto3_dynamodb import DynamoDBServiceResource
+    from mypy_boto3_ses import SESClient
+    from mypy_boto3_sqs import SQSClient
+    from mypy_boto3_ssm import SSMClient
+
+
+class ClientRegistry:
+    def __init__(self) -> None:
+        self._session: boto3.session.Session | None = None
+        self._clients: dict[str, Any] = {}
+        self._resources: dict[str, Any] = {}
+        # Sessions are not thread safe, clients are
+        self._lock = threading.Lock()
+
+    @property
+    def config(self) -> Config:
+        return Config(
+            connect_timeout=settings.aws_connect_timeout,
+            read_timeout=settings.aws_read_timeout,
+            max_pool_connections=settings.aws_max_pool_connections,
+            retries={"mode": "adaptive", "max_attempts": settings.aws_max_attempts},
+            tcp_keepalive=True,
+        )
+
+    def _get_session(self) -> boto3.session.Session:
+        if self._session is None:
+            self._session = boto3.session.Session(region_name=settings.aws_region)
+        return self._session
+
+    def client(self, service_name: str) -> Any:
+        if (client := self._clients.get(service_name)) is None:
+            with self._lock:
+                if (client := self._clients.get(service_name)) is None:
+                    client = self._get_session().client(  # type: ignore[call-overload]
+                        service_name, config=self.config
+                    )
+                    self._clients[service_name] = client
+        return client
+
+    def resource(self, service_name: str) -> Any:
+        if (resource := self._resources.get(service_name)) is None:
+            with self._lock:
+                if (resource := self._resources.get(service_name)) is None:
+                    resource = self._get_session().resource(  # type: ignore[call-overload]
+                        service_name, config=self.config
+                    )
+                    self._resources[service_name] = resource
+        return resource
+
+    def clear(self) -> None:
+        with self._lock:
+            self._session = None
+            self._clients = {}
+            self._resources = {}
+
+
+clients = ClientRegistry()
+
+
+def get_dynamodb_resource() -> "DynamoDBServiceResource":
+    return clients.resource("dynamodb")
+
+
+def get_ses_client() -> "SESClient":
+    return clients.client("ses")
+
+
+def get_sqs_client() -> "SQSClient":
+    return clients.client("sqs")
+
+
+def get_ssm_client() -> "SSMClient":
+    return clients.client("ssm")
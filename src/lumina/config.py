@@ -6,9 +6,63 @@ class Settings(BaseSettings):
     stage_name: str = ""
     vcs_rev: str = "unknown"
     aws_region: str = "eu-west-2"
+    # Applied to every AWS client, see lumina.aws
+    aws_connect_timeout: float = 2
+    aws_read_timeout: float = 5
+    aws_max_attempts: int = 3
+    aws_max_pool_connections: int = 10
+
+    # All parameters under this path are fetched from SSM in one go
+    ssm_parameter_path: str = "/lumina/"
+    # Seconds before fetched parameters are refreshed, in the background
+    ssm_parameter_ttl: int = 300
+
+    # Number of verified JWTs to remember so they aren't verified again
+    jwt_verified_cache_size: int = 1024
+    # Embed member claims in issued JWTs so requests needing only the id or admin
+    # flag can skip reading the member profile
+    jwt_member_claims: bool = False
+    # Seconds a member's profile version is trusted before it is checked again
+    member_version_cache_ttl: int = 60
+    # Seconds a submission's owner is remembered, owners only change when anonymous
+    # submissions are moved to a member
+    submission_owner_cache_ttl: int = 3600
+    # Seconds the public list of submissions for a target is cached, in process and
+    # by clients. Changes made through this instance invalidate it immediately.
+    target_submissions_cache_ttl: int = 60
+
+    # Seconds a webhook delivery id is remembered so redeliveries are skipped, GitHub
+    # can redeliver for up to three days
+    webhook_delivery_ttl: int = 259200
+    # Queue the issue from a webhook and respond straight away, writing it from the
+    # queue in batches, see lumina.webhook_queue
+    webhook_deferred: bool = False
+    # SQS queue for deferred webhooks, when unset messages are handled in process
+    webhook_queue_url: str | None = None
+
+    # Create the GitHub issues of new submissions from a queue, responding before
+    # the issue exists, see lumina.outbox
+    submission_outbox: bool = False
+    # SQS queue for the outbox, when unset messages are handled in process
+    submission_queue_url: str | None = None
+    # Seconds a worker holds a pending submission while creating its issue
+    pending_submission_claim_ttl: int = 120
 
     github_owner: str = "newtheatre"
     github_repo: str = "lumina-test"
+    # Seconds before a request to GitHub times out
+    github_timeout: int = 10
+    # Connections kept open to GitHub, reused across requests
+    github_pool_size: int = 4
+    # Retries of requests to GitHub failing with a server error, GETs only
+    github_max_retries: int = 3
+    # Requests left in the rate limit quota at which we stop making them until it
+    # resets, leaving room for the health check and webhooks catching up
+    github_rate_limit_reserve: int = 50
+    # Seconds to back off when rate limited without being told how long for
+    github_rate_limit_backoff: int = 60
+    # Seconds an issue fetched for a fresh listing of submissions is reused
+    github_fresh_issue_cache_ttl: int = 30
 
     sentry_dsn: str | None = None
 
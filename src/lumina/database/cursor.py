@@ -0,0 +1,46 @@
+import base64
+import binascii
+import json
+from collections.abc import Collection, Mapping
+from typing import Any
+
+# Response header giving the cursor of the next page
+HEADER_NEXT_CURSOR = "X-Next-Cursor"
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(last_evaluated_key: dict[str, Any]) -> str:
+    """Encode a DynamoDB LastEvaluatedKey as an opaque, URL safe cursor."""
+    data = json.dumps(last_evaluated_key, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(data).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> dict[str, Any]:
+    """Decode a cursor back into an ExclusiveStartKey."""
+    try:
+        data = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        key = json.loads(data)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as e:
+        raise InvalidCursor("Cursor is not valid") from e
+    if not isinstance(key, dict) or not all(
+        isinstance(value, str) for value in key.values()
+    ):
+        raise InvalidCursor("Cursor is not valid")
+    return key
+
+
+def check_start_key(
+    key: Mapping[str, Any], attributes: Collection[str], **values: str
+) -> None:
+    """
+    Check a decoded cursor continues the query it's given to, it must have exactly
+    the query's key attributes and the `values` its key condition fixes. DynamoDB
+    rejects any other ExclusiveStartKey as a ValidationException.
+    """
+    if set(key) != set(attributes) or any(
+        key[name] != value for name, value in values.items()
+    ):
+        raise InvalidCursor("Cursor is not for this query")
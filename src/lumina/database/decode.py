@@ -0,0 +1,95 @@
+"""
+Trusted decoding of items read from our own table.
+
+Items we wrote ourselves have already been validated, so rather than validating
+them again a decoder is compiled once per model which only converts the values
+DynamoDB can't give back as the right type: datetimes, enums, UUIDs, ints (which
+come back as Decimal) and nested models. Everything else is passed through to
+model_construct as is.
+"""
+import datetime
+import functools
+import types
+from collections.abc import Callable, Mapping
+from enum import Enum
+from typing import Any, TypeVar, Union, get_args, get_origin
+from uuid import UUID
+
+from lumina.util.dates import as_utc
+from pydantic import BaseModel, TypeAdapter
+
+M = TypeVar("M", bound=BaseModel)
+
+Converter = Callable[[Any], Any]
+
+_datetime_adapter = TypeAdapter(datetime.datetime)
+
+
+def parse_datetime(value: Any) -> datetime.datetime:
+    """Parse a stored datetime, naive ones are in UTC."""
+    if isinstance(value, str):
+        try:
+            # Python < 3.11 doesn't accept a Z suffix
+            return as_utc(datetime.datetime.fromisoformat(value.replace("Z", "+00:00")))
+        except ValueError:
+            pass
+    return as_utc(_datetime_adapter.validate_python(value))
+
+
+SCALAR_CONVERTERS: dict[Any, Converter] = {
+    datetime.datetime: parse_datetime,
+    int: int,
+    UUID: UUID,
+}
+
+
+def _optional(convert: Converter) -> Converter:
+    return lambda value: None if value is None else convert(value)
+
+
+def _list_of(convert: Converter) -> Converter:
+    return lambda value: [convert(item) for item in value]
+
+
+def get_converter(annotation: Any) -> Converter | None:
+    """Get the function converting a DynamoDB value for a field with this annotation,
+    None if the value can be used as is."""
+    origin = get_origin(annotation)
+    if origin in (Union, types.UnionType):
+        args = [arg for arg in get_args(annotation) if arg is not type(None)]
+        if len(args) != 1:
+            raise TypeError(f"Cannot decode union {annotation}")
+        convert = get_converter(args[0])
+        return _optional(convert) if convert else None
+    if origin is list:
+        convert = get_converter(get_args(annotation)[0])
+        return _list_of(convert) if convert else list
+    if origin is None and isinstance(annotation, type):
+        if issubclass(annotation, BaseModel):
+            return get_trusted_decoder(annotation)
+        if issubclass(annotation, Enum):
+            return annotation
+    # Anything else, e.g. str or Literal, is stored as it is
+    return SCALAR_CONVERTERS.get(annotation)
+
+
+@functools.cache
+def get_trusted_decoder(model: type[M]) -> Callable[[Mapping[str, Any]], M]:
+    """Compile a decoder building `model` from an item without validating it. Fields
+    missing from the item take their defaults, attributes not on the model are
+    dropped."""
+    converters = {
+        name: get_converter(field.annotation)
+        for name, field in model.model_fields.items()
+    }
+
+    def decode(item: Mapping[str, Any]) -> M:
+        values = {}
+        for name, convert in converters.items():
+            if name not in item:
+                continue
+            value = item[name]
+            values[name] = convert(value) if convert and value is not None else value
+        return model.model_construct(**values)
+
+    return decode
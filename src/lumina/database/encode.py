@@ -0,0 +1,87 @@
+"""
+Encoding of models into items for our own table, the counterpart of decode.
+
+An encoder is compiled once per model which reads field values straight off the
+instance and converts only those DynamoDB can't store as they are: datetimes become
+ISO 8601 strings, enums their values, UUIDs strings, floats Decimal and nested
+models maps. Fields which are None are omitted rather than stored as NULL.
+"""
+import datetime
+import functools
+import types
+from collections.abc import Callable
+from decimal import Decimal
+from enum import Enum
+from typing import Any, Union, get_args, get_origin
+from uuid import UUID
+
+from pydantic import BaseModel
+
+Encoder = Callable[[Any], Any]
+
+
+def encode_datetime(value: datetime.datetime) -> str:
+    return value.isoformat()
+
+
+def encode_float(value: float) -> Decimal:
+    # Via str so the Decimal isn't the float's full binary expansion
+    return Decimal(str(value))
+
+
+def encode_enum(value: Enum) -> Any:
+    return value.value
+
+
+SCALAR_ENCODERS: dict[Any, Encoder] = {
+    datetime.datetime: encode_datetime,
+    float: encode_float,
+    UUID: str,
+}
+
+
+def _list_of(encode: Encoder) -> Encoder:
+    return lambda value: [None if item is None else encode(item) for item in value]
+
+
+def get_encoder(annotation: Any) -> Encoder | None:
+    """Get the function encoding a value for a field with this annotation, None if
+    the value can be stored as is."""
+    origin = get_origin(annotation)
+    if origin in (Union, types.UnionType):
+        args = [arg for arg in get_args(annotation) if arg is not type(None)]
+        if len(args) != 1:
+            raise TypeError(f"Cannot encode union {annotation}")
+        # None is handled by the caller
+        return get_encoder(args[0])
+    if origin is list:
+        encode = get_encoder(get_args(annotation)[0])
+        return _list_of(encode) if encode else list
+    if origin is None and isinstance(annotation, type):
+        if issubclass(annotation, BaseModel):
+            return get_model_encoder(annotation)
+        if issubclass(annotation, Enum):
+            return encode_enum
+    # Anything else, e.g. str, int or Literal, is stored as it is
+    return SCALAR_ENCODERS.get(annotation)
+
+
+@functools.cache
+def get_model_encoder(model: type[BaseModel]) -> Callable[[BaseModel], dict[str, Any]]:
+    """Compile an encoder building an item from an instance of `model`."""
+    encoders = [
+        (name, get_encoder(field.annotation))
+        for name, field in model.model_fields.items()
+    ]
+
+    def encode(instance: BaseModel) -> dict[str, Any]:
+        values = instance.__dict__
+        item = {}
+        for name, encode_value in encoders:
+            value = values[name]
+            if value is None:
+                continue
+            item[name] = encode_value(value) if encode_value else value
+        return item
+
+    return encode
@@ -0,0 +1,103 @@
+"""
+One-off data migrations, run against an environment with bin/migrate.py. Each must
+be safe to run more than once.
+"""
+import collections
+import logging
+from collections.abc import Callable, Iterator
+from typing import Any
+
+from boto3.dynamodb.conditions import Attr
+from lumina.database.models import SubmissionModel, SubmissionStatsModel
+from lumina.database.table import (
+    GSI_SUBMISSION_CREATED_SK,
+    MEMBER_PARTITION_KEY,
+    MEMBER_SORT_KEY,
+    SK_SUBMISSION_PREFIX,
+    SUBMISSION_OWNER_ATTRIBUTE,
+    get_member_table,
+    get_submission_owner_key,
+    get_submission_stats_key,
+    get_target_pk,
+)
+
+log = logging.getLogger(__name__)
+
+
+def scan_items(**options: Any) -> Iterator[dict[str, Any]]:
+    while True:
+        response = get_member_table().scan(**options)
+        yield from response["Items"]
+        if not (last_evaluated_key := response.get("LastEvaluatedKey")):
+            return
+        options["ExclusiveStartKey"] = last_evaluated_key
+
+
+def iter_submissions() -> Iterator[SubmissionModel]:
+    for item in scan_items(
+        FilterExpression=Attr(MEMBER_SORT_KEY).begins_with(SK_SUBMISSION_PREFIX)
+    ):
+        # Not trusted, as older items may not match the model
+        yield SubmissionModel.from_ddict(item, trusted=False)
+
+
+def backfill_submission_owners() -> int:
+    """Write the owner pointer for every submission, returns the number written."""
+    count = 0
+    with get_member_table().batch_writer() as batch:
+        for submission in iter_submissions():
+            batch.put_item(
+                Item={
+                    **get_submission_owner_key(submission.issue_id),
+                    SUBMISSION_OWNER_ATTRIBUTE: submission.pk,
+                }
+            )
+            count += 1
+    log.info("Wrote %d submission owner pointers", count)
+    return count
+
+
+def backfill_submission_stats() -> int:
+    """
+    Recount the submission counters of every owner and target, returns the number
+    of counters written. Submissions made while this runs may be missed, so run it
+    again if the counts look off.
+    """
+    counters: dict[str, SubmissionStatsModel] = collections.defaultdict(
+        SubmissionStatsModel
+    )
+    for submission in iter_submissions():
+        state = submission.github_issue.state.value
+        for pk in (
+            submission.pk,
+            get_target_pk(submission.target_type, submission.target_id),
+        ):
+            counters[pk].count += 1
+            setattr(counters[pk], state, getattr(counters[pk], state) + 1)
+    with get_member_table().batch_writer() as batch:
+        for pk, stats in counters.items():
+            batch.put_item(Item={**get_submission_stats_key(pk), **stats.model_dump()})
+    log.info("Wrote %d submission counters", len(counters))
+    return len(counters)
+
+
+def backfill_submission_created_at() -> int:
+    """Copy created_at to the attribute submissions are listed by, returns the number
+    of submissions updated."""
+    count = 0
+    for submission in iter_submissions():
+        get_member_table().update_item(
+            Key={MEMBER_PARTITION_KEY: submission.pk, MEMBER_SORT_KEY: submission.sk},
+            UpdateExpression=f"set {GSI_SUBMISSION_CREATED_SK} = created_at",
+            ConditionExpression=Attr(MEMBER_PARTITION_KEY).exists(),
+        )
+        count += 1
+    log.info("Updated %d submissions", count)
+    return count
+
+
+MIGRATIONS: dict[str, Callable[[], int]] = {
+    "backfill_submission_owners": backfill_submission_owners,
+    "backfill_submission_stats": backfill_submission_stats,
+    "backfill_submission_created_at": backfill_submission_created_at,
+}
@@ -1,20 +1,34 @@
 import datetime
+from collections.abc import Mapping
 from enum import Enum
-from typing import Literal
+from typing import Any, Literal, TypeVar
 from uuid import UUID
 
-from fastapi.encoders import jsonable_encoder
 from lumina.util.types import BaseModelProtocol
 from pydantic import BaseModel, EmailStr
 
 from . import table
+from .decode import get_trusted_decoder
+from .encode import get_model_encoder
+
+M = TypeVar("M", bound=BaseModel)
 
 
 class DynamoExportMixin:
-    def ddict(self: BaseModelProtocol, **kwargs):
+    def ddict(self: BaseModelProtocol) -> dict[str, Any]:
         """dict() export for DynamoDB, removes any Python-only fields, essentially
-        JSON but still in dict form"""
-        return jsonable_encoder(self.model_dump(**kwargs))
+        JSON but still in dict form. Fields which are None are omitted."""
+        return get_model_encoder(type(self))(self)  # type: ignore
+
+    @classmethod
+    def from_ddict(  # type: ignore[misc]
+        cls: type[M], item: Mapping[str, Any], trusted: bool = True
+    ) -> M:
+        """Load an item read from DynamoDB. Items are trusted to be valid as we wrote
+        them, so are built without validation unless `trusted` is False."""
+        if trusted:
+            return get_trusted_decoder(cls)(item)
+        return cls(**item)
 
 
 class BaseDynamoModel(BaseModel):
@@ -40,6 +54,10 @@ class MemberModel(BaseDynamoModel, DynamoExportMixin):
     consent: MemberConsentModel | None = None
     anonymous_ids: list[UUID] | None = None
     is_admin: bool = False
+    # Incremented by every write of the member through lumina.database.operations,
+    # tokens carrying an older version are not trusted. Bump by hand if changing
+    # is_admin directly in the table.
+    profile_version: int = 0
 
     @property
     def id(self) -> str:
@@ -100,3 +118,59 @@ class SubmissionModel(BaseDynamoModel, DynamoExportMixin):
             return int(self.sk.removeprefix(table.SK_SUBMISSION_PREFIX))
         except ValueError as e:
             raise ValueError(f"Invalid target_id: {self.sk}, cannot parse int") from e
+
+
+class SubmissionStatsModel(BaseModel):
+    """Submission counters, fields other than count are named by GitHubIssueState"""
+
+    count: int = 0
+    open: int = 0
+    closed: int = 0
+    completed: int = 0
+
+
+class SubmissionDraftModel(BaseModel, DynamoExportMixin):
+    """The fields of a submission known before its GitHub issue is created"""
+
+    url: str
+    target_id: str
+    target_type: str
+    target_name: str
+    subject: str | None = None
+    message: str | None = None
+    submitter: SubmitterModel
+
+
+class PendingSubmissionModel(BaseDynamoModel, DynamoExportMixin):
+    """
+    A submission waiting for the outbox worker to create its GitHub issue, in the
+    owner's partition. The draft is nested so pending items stay out of the
+    submission indexes.
+    """
+
+    created_at: datetime.datetime
+    draft: SubmissionDraftModel
+    # Set while a worker is creating the issue, so concurrent deliveries of the
+    # same message don't create two
+    claimed_until: datetime.datetime | None = None
+    # Recorded as soon as the issue is created, so a retry won't create another
+    github_issue: GitHubIssueModel | None = None
+
+    @property
+    def id(self) -> UUID:
+        return UUID(self.sk.removeprefix(table.SK_PENDING_SUBMISSION_PREFIX))
+
+    def to_submission(self, github_issue: GitHubIssueModel) -> SubmissionModel:
+        return SubmissionModel(
+            pk=self.pk,
+            sk=table.get_submission_sk(github_issue.number),
+            url=self.draft.url,
+            target_id=self.draft.target_id,
+            target_type=self.draft.target_type,
+            target_name=self.draft.target_name,
+            created_at=self.created_at,
+            subject=self.draft.subject,
+            message=self.draft.message,
+            submitter=self.draft.submitter,
+            github_issue=github_issue,
+        )
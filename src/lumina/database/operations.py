@@ -1,12 +1,33 @@
+import collections
+import contextlib
+import datetime
+import functools
+import operator
+import time
+from collections.abc import Callable, Iterable, Iterator, Mapping, Sequence
+from typing import Any, NamedTuple
 from uuid import UUID
 
-from boto3.dynamodb.conditions import Key
-from lumina.database.models import GitHubIssueModel, MemberModel
+from boto3.dynamodb.conditions import Attr, ConditionBase, Key
+from lumina.config import settings
+from lumina.database.models import (
+    GitHubIssueModel,
+    GitHubIssueState,
+    MemberModel,
+    PendingSubmissionModel,
+    SubmissionStatsModel,
+)
 from lumina.util import dates
+from lumina.util.cache import TTLCache
 
+from . import transact
+from .connection import get_dynamo_db
+from .cursor import check_start_key
 from .models import SubmissionModel
 from .table import (
     GSI_SK,
+    GSI_SUBMISSION_CREATED,
+    GSI_SUBMISSION_CREATED_SK,
     GSI_SUBMISSION_TARGET,
     GSI_SUBMISSION_TARGET_PK,
     GSI_SUBMISSION_TARGET_SK,
@@ -14,8 +35,18 @@ from .table import (
     MEMBER_SORT_KEY,
     SK_PROFILE,
     SK_SUBMISSION_PREFIX,
+    SK_SUBMISSION_STATS,
+    SUBMISSION_OWNER_ATTRIBUTE,
+    TTL_ATTRIBUTE,
+    get_github_issues_watermark_key,
     get_member_table,
+    get_pending_submission_sk,
+    get_submission_owner_key,
     get_submission_sk,
+    get_submission_stats_key,
+    get_table_name,
+    get_target_pk,
+    get_webhook_delivery_key,
 )
 
 
@@ -27,20 +58,157 @@ class ResultNotFound(DbError):
     pass
 
 
-def get_members() -> list[MemberModel]:
-    options = {
+class ResultAlreadyExists(DbError):
+    pass
+
+
+class ResultOutdated(DbError):
+    """The change is older than what is already stored, so wasn't applied"""
+
+
+# Always fetched so a projected item can still be validated as a MemberModel
+MEMBER_REQUIRED_ATTRIBUTES = (MEMBER_PARTITION_KEY, MEMBER_SORT_KEY, "name", "email")
+
+
+def get_projection_options(attributes: Sequence[str]) -> dict[str, Any]:
+    """Build a ProjectionExpression, aliasing every attribute as many of our
+    attribute names (e.g. name) are DynamoDB reserved words."""
+    names = {f"#p{i}": attribute for i, attribute in enumerate(attributes)}
+    return {
+        "ProjectionExpression": ", ".join(names),
+        "ExpressionAttributeNames": names,
+    }
+
+
+def get_member_filter(  # noqa: PLR0913
+    *,
+    email_verified: bool | None = None,
+    year_of_graduation_min: int | None = None,
+    year_of_graduation_max: int | None = None,
+    consent_news: bool | None = None,
+    consent_network: bool | None = None,
+    consent_members: bool | None = None,
+    consent_students: bool | None = None,
+) -> ConditionBase | None:
+    """
+    Build a FilterExpression for member queries, None means no filter. Unset
+    optional datetimes are omitted, or NULL in older items, so presence is checked
+    by type.
+    """
+
+    def is_set(attribute: str, value: bool) -> ConditionBase:
+        if value:
+            return Attr(attribute).attribute_type("S")
+        return Attr(attribute).not_exists() | Attr(attribute).attribute_type("NULL")
+
+    conditions = []
+    if email_verified is not None:
+        conditions.append(is_set("email_verified_at", email_verified))
+    if year_of_graduation_min is not None:
+        conditions.append(Attr("year_of_graduation").gte(year_of_graduation_min))
+    if year_of_graduation_max is not None:
+        conditions.append(Attr("year_of_graduation").lte(year_of_graduation_max))
+    for attribute, value in (
+        ("consent.consent_news", consent_news),
+        ("consent.consent_network", consent_network),
+        ("consent.consent_members", consent_members),
+        ("consent.consent_students", consent_students),
+    ):
+        if value is not None:
+            conditions.append(is_set(attribute, value))
+    return functools.reduce(operator.and_, conditions) if conditions else None
+
+
+def get_member_query_options(
+    projection: Sequence[str] | None = None,
+    filter_expression: ConditionBase | None = None,
+) -> dict[str, Any]:
+    options: dict[str, Any] = {
         "IndexName": GSI_SK,
         "KeyConditionExpression": Key(MEMBER_SORT_KEY).eq(SK_PROFILE),
     }
-    response = get_member_table().query(**options)  # type: ignore
-    data = response["Items"]
-    while response.get("LastEvaluatedKey"):
-        response = get_member_table().scan(
-            ExclusiveStartKey=response["LastEvaluatedKey"],
-            **options,  # type: ignore
+    if projection:
+        options |= get_projection_options(
+            list(dict.fromkeys([*MEMBER_REQUIRED_ATTRIBUTES, *projection]))
+        )
+    if filter_expression is not None:
+        options["FilterExpression"] = filter_expression
+    return options
+
+
+def iter_members(
+    page_size: int | None = None,
+    projection: Sequence[str] | None = None,
+    filter_expression: ConditionBase | None = None,
+) -> Iterator[MemberModel]:
+    """
+    Iterate over all members, fetching a page at a time from the sort key index and
+    validating each member only as it is reached.
+    :param page_size: Maximum items to read from DynamoDB per request.
+    :param projection: Only fetch these attributes, other fields are left as their
+                       defaults. Attributes required by MemberModel are always fetched.
+    :param filter_expression: Only return members matching, see get_member_filter.
+    """
+    options = get_member_query_options(projection, filter_expression)
+    if page_size:
+        options["Limit"] = page_size
+    while True:
+        response = get_member_table().query(**options)
+        for item in response["Items"]:
+            yield MemberModel.from_ddict(item)  # type: ignore
+        if not (last_evaluated_key := response.get("LastEvaluatedKey")):
+            return
+        options["ExclusiveStartKey"] = last_evaluated_key
+
+
+def get_members_page(
+    limit: int,
+    start_key: dict[str, Any] | None = None,
+    filter_expression: ConditionBase | None = None,
+) -> tuple[list[MemberModel], dict[str, Any] | None]:
+    """
+    Get up to `limit` members starting after `start_key`, raises InvalidCursor if it
+    isn't the key of a member.
+    :return: The members and the key to start the next page from, None if there are
+             no more members.
+    """
+    options = get_member_query_options(filter_expression=filter_expression)
+    if start_key:
+        check_start_key(
+            start_key,
+            (MEMBER_PARTITION_KEY, MEMBER_SORT_KEY),
+            **{MEMBER_SORT_KEY: SK_PROFILE},
         )
-        data.extend(response["Items"])
-    return [MemberModel(**item) for item in data]
+        options["ExclusiveStartKey"] = start_key
+    # Limit counts items read before filtering, each query reads a whole page so a
+    # selective filter doesn't shrink the reads to one item at a time
+    options["Limit"] = limit
+    members: list[MemberModel] = []
+    while True:
+        response = get_member_table().query(**options)
+        items = response["Items"]
+        last_evaluated_key = response.get("LastEvaluatedKey")
+        for i, item in enumerate(items):
+            members.append(MemberModel.from_ddict(item))  # type: ignore
+            if len(members) == limit:
+                # Continue after the last member returned, not the last read
+                more = i + 1 < len(items) or last_evaluated_key
+                return members, get_member_page_key(item) if more else None
+        if not last_evaluated_key:
+            return members, None
+        options["ExclusiveStartKey"] = last_evaluated_key
+
+
+def get_member_page_key(item: Mapping[str, Any]) -> dict[str, Any]:
+    """The key of a member in the profile index, to start a query after it"""
+    return {
+        MEMBER_PARTITION_KEY: item[MEMBER_PARTITION_KEY],
+        MEMBER_SORT_KEY: item[MEMBER_SORT_KEY],
+    }
+
+
+def get_members() -> list[MemberModel]:
+    return list(iter_members())
 
 
 def get_member(id: str) -> MemberModel:
@@ -48,30 +216,99 @@ def get_member(id: str) -> MemberModel:
         Key={MEMBER_PARTITION_KEY: id, MEMBER_SORT_KEY: SK_PROFILE}
     )
     if result := response.get("Item"):
-        return MemberModel(**result)
+        return MemberModel.from_ddict(result)
+    raise ResultNotFound(f"Member with id {id} not found")
+
+
+# Profile version of each member, as checked against the claims of their tokens.
+# Invalidated by the writes here which bump it, other processes see the new version
+# once their entry expires.
+member_versions: TTLCache[str, int] = TTLCache(ttl=settings.member_version_cache_ttl)
+
+
+def get_member_profile_version(id: str) -> int:
+    """Get only the profile version of a member, cheaper than the full profile."""
+    response = get_member_table().get_item(
+        Key={MEMBER_PARTITION_KEY: id, MEMBER_SORT_KEY: SK_PROFILE},
+        ProjectionExpression="profile_version",
+    )
+    if (result := response.get("Item")) is not None:
+        return int(result.get("profile_version", 0))  # type: ignore
     raise ResultNotFound(f"Member with id {id} not found")
 
 
-def put_member(model: MemberModel) -> MemberModel:
-    get_member_table().put_item(Item=model.ddict())
+# Fields of a member written by put_member, the version is only ever incremented
+MEMBER_UPDATE_FIELDS = tuple(
+    name
+    for name in MemberModel.model_fields
+    if name not in {MEMBER_PARTITION_KEY, MEMBER_SORT_KEY, "profile_version"}
+)
+
+
+def put_member(model: MemberModel, create_only: bool = False) -> MemberModel:
+    """
+    Write a member, with `create_only` raises ResultAlreadyExists rather than
+    overwriting an existing member. Overwriting increments the profile version, so
+    tokens carrying claims from before are no longer trusted, and returns the member
+    as written.
+    """
+    table = get_member_table()
+    if not create_only:
+        item = model.ddict()
+        names = {f"#f{i}": name for i, name in enumerate(MEMBER_UPDATE_FIELDS)}
+        values: dict[str, Any] = {":one": 1}
+        sets, removes = [], []
+        for alias, name in names.items():
+            if name in item:
+                sets.append(f"{alias} = :{alias[1:]}")
+                values[f":{alias[1:]}"] = item[name]
+            else:
+                removes.append(alias)
+        update = f"set {', '.join(sets)}"
+        if removes:
+            update += f" remove {', '.join(removes)}"
+        response = table.update_item(
+            Key={MEMBER_PARTITION_KEY: model.pk, MEMBER_SORT_KEY: SK_PROFILE},
+            UpdateExpression=f"{update} add profile_version :one",
+            ExpressionAttributeNames=names,
+            ExpressionAttributeValues=values,
+            ReturnValues="ALL_NEW",
+        )
+        member_versions.invalidate(model.id)
+        return MemberModel.from_ddict(response["Attributes"])
+    try:
+        table.put_item(
+            Item=model.ddict(),
+            ConditionExpression=Attr(MEMBER_PARTITION_KEY).not_exists(),
+        )
+    except table.meta.client.exceptions.ConditionalCheckFailedException as e:
+        raise ResultAlreadyExists(f"Member with id {model.id} already exists") from e
     return model
 
 
-def set_member_email_verified(id: str) -> None:
-    get_member_table().update_item(
+def set_member_email_verified(id: str) -> MemberModel:
+    """Mark a member's email verified, incrementing their profile version as it's
+    one of their claims. Returns the member as updated."""
+    response = get_member_table().update_item(
         Key={MEMBER_PARTITION_KEY: id, MEMBER_SORT_KEY: SK_PROFILE},
-        UpdateExpression="set email_verified_at = :v",
-        ExpressionAttributeValues={":v": dates.now().isoformat()},
+        UpdateExpression="set email_verified_at = :v add profile_version :one",
+        ExpressionAttributeValues={":v": dates.now().isoformat(), ":one": 1},
+        ReturnValues="ALL_NEW",
     )
+    member_versions.invalidate(id)
+    return MemberModel.from_ddict(response["Attributes"])
 
 
 def delete_member(id: str) -> None:
     get_member_table().delete_item(
         Key={MEMBER_PARTITION_KEY: id, MEMBER_SORT_KEY: SK_PROFILE}
     )
+    member_versions.invalidate(id)
 
 
-def get_submission(id: int) -> SubmissionModel:
+def query_submission_by_sk(id: int) -> SubmissionModel:
+    """Find a submission through the sort key index, eventually consistent. Only
+    needed for submissions written before owner pointers existed."""
     response = get_member_table().query(
         IndexName=GSI_SK,
         KeyConditionExpression=Key(MEMBER_SORT_KEY).eq(get_submission_sk(id)),
@@ -80,66 +317,863 @@ def get_submission(id: int) -> SubmissionModel:
         raise ResultNotFound(f"Submission with id {id} not found")
     if response["Count"] > 1:
         raise DbError(f"Multiple submissions with id {id} found")
-    return SubmissionModel(**response["Items"][0])  # type: ignore
+    return SubmissionModel.from_ddict(response["Items"][0])  # type: ignore
+
+
+# Owner of each submission by issue number, saves the pointer lookup when a
+# submission is updated repeatedly, e.g. by a burst of webhooks
+submission_owners: TTLCache[int, str] = TTLCache(
+    ttl=settings.submission_owner_cache_ttl
+)
+
+
+def get_submission_owner(id: int) -> str:
+    """Get the partition key of the member, or anonymous id, owning a submission."""
+    if owner := submission_owners.get(id):
+        return owner
+    response = get_member_table().get_item(
+        Key=get_submission_owner_key(id), ConsistentRead=True
+    )
+    if result := response.get("Item"):
+        owner = str(result[SUBMISSION_OWNER_ATTRIBUTE])
+    else:
+        owner = str(query_submission_by_sk(id).pk)
+    submission_owners.put(id, owner)
+    return owner
+
+
+def refresh_submission_owner(id: int, owner: str) -> str | None:
+    """Forget a cached owner which turned out to be wrong, returns the current owner
+    if it differs."""
+    submission_owners.invalidate(id)
+    current_owner = get_submission_owner(id)
+    return current_owner if current_owner != owner else None
+
+
+def get_submission_item(owner: str, id: int) -> dict[str, Any] | None:
+    response = get_member_table().get_item(
+        Key={MEMBER_PARTITION_KEY: owner, MEMBER_SORT_KEY: get_submission_sk(id)},
+        ConsistentRead=True,
+    )
+    return response.get("Item")
+
+
+def get_submission(id: int) -> SubmissionModel:
+    owner = get_submission_owner(id)
+    result = get_submission_item(owner, id)
+    if result is None and (current_owner := refresh_submission_owner(id, owner)):
+        result = get_submission_item(current_owner, id)
+    if result is None:
+        raise ResultNotFound(f"Submission with id {id} not found")
+    return SubmissionModel.from_ddict(result)  # type: ignore
 
 
 def get_submissions_for_member(id: str | UUID) -> list[SubmissionModel]:
-    response = get_member_table().query(
-        KeyConditionExpression=Key(MEMBER_PARTITION_KEY).eq(str(id))
+    options: dict[str, Any] = {
+        "KeyConditionExpression": Key(MEMBER_PARTITION_KEY).eq(str(id))
         & Key(MEMBER_SORT_KEY).begins_with(SK_SUBMISSION_PREFIX),
+    }
+    submissions: list[SubmissionModel] = []
+    while True:
+        response = get_member_table().query(**options)
+        submissions.extend(SubmissionModel.from_ddict(item) for item in response["Items"])  # type: ignore
+        if not (last_evaluated_key := response.get("LastEvaluatedKey")):
+            return submissions
+        options["ExclusiveStartKey"] = last_evaluated_key
+
+
+def get_member_submissions_query_options(id: str | UUID) -> dict[str, Any]:
+    return {
+        "IndexName": GSI_SUBMISSION_CREATED,
+        "KeyConditionExpression": Key(MEMBER_PARTITION_KEY).eq(str(id)),
+        "ScanIndexForward": False,
+    }
+
+
+def iter_member_submissions(
+    id: str | UUID, page_size: int | None = None
+) -> Iterator[SubmissionModel]:
+    """Iterate over a member's submissions newest first, a page at a time."""
+    options = get_member_submissions_query_options(id)
+    if page_size:
+        options["Limit"] = page_size
+    while True:
+        response = get_member_table().query(**options)
+        for item in response["Items"]:
+            yield SubmissionModel.from_ddict(item)  # type: ignore
+        if not (last_evaluated_key := response.get("LastEvaluatedKey")):
+            return
+        options["ExclusiveStartKey"] = last_evaluated_key
+
+
+def get_member_submissions_page(
+    id: str | UUID, limit: int, start_key: dict[str, Any] | None = None
+) -> tuple[list[SubmissionModel], dict[str, Any] | None]:
+    """
+    Get up to `limit` of a member's submissions newest first, starting after
+    `start_key`, raises InvalidCursor if it isn't the key of one of their submissions.
+    :return: The submissions and the key to start the next page from, None if there
+             are no more submissions.
+    """
+    options = get_member_submissions_query_options(id)
+    options["Limit"] = limit
+    if start_key:
+        check_start_key(
+            start_key,
+            (MEMBER_PARTITION_KEY, MEMBER_SORT_KEY, GSI_SUBMISSION_CREATED_SK),
+            **{MEMBER_PARTITION_KEY: str(id)},
+        )
+        options["ExclusiveStartKey"] = start_key
+    response = get_member_table().query(**options)
+    return (
+        [SubmissionModel.from_ddict(item) for item in response["Items"]],  # type: ignore
+        response.get("LastEvaluatedKey"),
     )
-    return [SubmissionModel(**item) for item in response["Items"]]  # type: ignore
 
 
 def get_submissions_for_target(
     target_type: str, target_id: str
 ) -> list[SubmissionModel]:
-    response = get_member_table().query(
-        IndexName=GSI_SUBMISSION_TARGET,
-        KeyConditionExpression=Key(GSI_SUBMISSION_TARGET_PK).eq(target_type)
+    options: dict[str, Any] = {
+        "IndexName": GSI_SUBMISSION_TARGET,
+        "KeyConditionExpression": Key(GSI_SUBMISSION_TARGET_PK).eq(target_type)
         & Key(GSI_SUBMISSION_TARGET_SK).eq(target_id),
+    }
+    submissions: list[SubmissionModel] = []
+    while True:
+        response = get_member_table().query(**options)
+        submissions.extend(SubmissionModel.from_ddict(item) for item in response["Items"])  # type: ignore
+        if not (last_evaluated_key := response.get("LastEvaluatedKey")):
+            return submissions
+        options["ExclusiveStartKey"] = last_evaluated_key
+
+
+# Submissions by target, for the public listing on the history site
+target_submissions: TTLCache[tuple[str, str], list[SubmissionModel]] = TTLCache(
+    ttl=settings.target_submissions_cache_ttl
+)
+
+
+def get_cached_submissions_for_target(
+    target_type: str, target_id: str
+) -> list[SubmissionModel]:
+    """Like get_submissions_for_target, but cached until a submission for the target
+    is changed by this instance or the cache expires."""
+    key = (target_type, target_id)
+    submissions = target_submissions.get(key)
+    if submissions is None:
+        submissions = get_submissions_for_target(target_type, target_id)
+        target_submissions.put(key, submissions)
+    return submissions
+
+
+def count_submissions(**options: Any) -> int:
+    """Count the items matched by a query without reading them."""
+    count = 0
+    while True:
+        response = get_member_table().query(Select="COUNT", **options)
+        count += response["Count"]
+        if not (last_evaluated_key := response.get("LastEvaluatedKey")):
+            return count
+        options["ExclusiveStartKey"] = last_evaluated_key
+
+
+def count_submission_stats(**options: Any) -> SubmissionStatsModel:
+    counts = {
+        state.value: count_submissions(
+            FilterExpression=Attr("github_issue.state").eq(state.value), **options
+        )
+        for state in GitHubIssueState
+    }
+    return SubmissionStatsModel(count=sum(counts.values()), **counts)
+
+
+def get_submission_stats(
+    pk: str, count: Callable[[], SubmissionStatsModel]
+) -> SubmissionStatsModel:
+    """
+    Get the submission counters for an owner or target partition. If there are
+    none, as for new partitions or those with submissions from before counters were
+    kept, the submissions are counted and the counters seeded. Nothing is written
+    for partitions without submissions. Writes skip counters which aren't seeded,
+    so one made between counting and seeding is missed until
+    backfill_submission_stats recounts.
+    """
+    table = get_member_table()
+    response = table.get_item(Key=get_submission_stats_key(pk))
+    if result := response.get("Item"):
+        return SubmissionStatsModel(**result)  # type: ignore
+    stats = count()
+    if stats.count == 0:
+        return stats
+    # Counters created since we counted are more accurate than ours
+    with contextlib.suppress(
+        table.meta.client.exceptions.ConditionalCheckFailedException
+    ):
+        table.put_item(
+            Item={**get_submission_stats_key(pk), **stats.model_dump()},
+            ConditionExpression=Attr(MEMBER_PARTITION_KEY).not_exists(),
+        )
+    return stats
+
+
+def get_member_submission_stats(id: str | UUID) -> SubmissionStatsModel:
+    return get_submission_stats(
+        str(id),
+        lambda: count_submission_stats(
+            KeyConditionExpression=Key(MEMBER_PARTITION_KEY).eq(str(id))
+            & Key(MEMBER_SORT_KEY).begins_with(SK_SUBMISSION_PREFIX)
+        ),
+    )
+
+
+def get_target_submission_stats(
+    target_type: str, target_id: str
+) -> SubmissionStatsModel:
+    return get_submission_stats(
+        get_target_pk(target_type, target_id),
+        lambda: count_submission_stats(
+            IndexName=GSI_SUBMISSION_TARGET,
+            KeyConditionExpression=Key(GSI_SUBMISSION_TARGET_PK).eq(target_type)
+            & Key(GSI_SUBMISSION_TARGET_SK).eq(target_id),
+        ),
+    )
+
+
+def submission_to_item(model: SubmissionModel) -> dict[str, Any]:
+    """The item to write for a submission, with the attributes it is indexed by."""
+    item = model.ddict()
+    item[GSI_SUBMISSION_CREATED_SK] = item["created_at"]
+    return item
+
+
+def put_submission_owner_action(
+    model: SubmissionModel, condition: str | None = None
+) -> dict[str, Any]:
+    return transact.put(
+        {
+            **get_submission_owner_key(model.issue_id),
+            SUBMISSION_OWNER_ATTRIBUTE: str(model.pk),
+        },
+        condition=condition,
     )
-    return [SubmissionModel(**item) for item in response["Items"]]  # type: ignore
+
+
+def update_submission_stats_action(
+    pk: str, deltas: Mapping[GitHubIssueState, int]
+) -> dict[str, Any]:
+    """Add to the submission counters of an owner or target partition. The total
+    count changes by the sum of the deltas. Conditional on the counters having been
+    seeded, as adding to missing ones would create them partial, write these with
+    write_counted."""
+    names = {"#count": "count"}
+    values = {":count": sum(deltas.values())}
+    additions = ["#count :count"]
+    for i, (state, delta) in enumerate(deltas.items()):
+        names[f"#s{i}"] = state.value
+        values[f":s{i}"] = delta
+        additions.append(f"#s{i} :s{i}")
+    return transact.update(
+        get_submission_stats_key(pk),
+        f"add {', '.join(additions)}",
+        values=values,
+        names=names,
+        condition=f"attribute_exists({MEMBER_PARTITION_KEY})",
+    )
+
+
+def is_submission_stats_action(action: Mapping[str, Any]) -> bool:
+    update = action.get("Update", {})
+    return bool(update.get("Key", {}).get(MEMBER_SORT_KEY) == SK_SUBMISSION_STATS)
+
+
+def write_counted(actions: Sequence[dict[str, Any]]) -> None:
+    """
+    Apply actions including those of update_submission_stats_action, skipping any
+    counters which haven't been seeded, they are counted when next read. A skipped
+    counter is checked to still not exist instead, so the actions keep their
+    indexes and a counter seeded meanwhile isn't skipped. Raises
+    TransactionCanceledException as transact.write if any other action fails.
+    """
+    client = get_member_table().meta.client
+    unseeded: set[int] = set()
+    while True:
+        attempt = [
+            transact.condition_check(
+                action["Update"]["Key"], f"attribute_not_exists({MEMBER_PARTITION_KEY})"
+            )
+            if i in unseeded
+            else action
+            for i, action in enumerate(actions)
+        ]
+        try:
+            transact.write(attempt)
+        except client.exceptions.TransactionCanceledException as e:
+            counters = {
+                i
+                for i, action in enumerate(actions)
+                if is_submission_stats_action(action)
+            }
+            failed = {i for i in counters if transact.failed_conditions(e, i)}
+            others = set(range(len(actions))) - counters
+            if not failed or transact.failed_conditions(e, *others):
+                raise
+            # Counters which were missing are skipped, those seeded since added to
+            unseeded ^= failed
+        else:
+            return
+
+
+def update_target_stats_action(
+    target_type: str, target_id: str, deltas: Mapping[GitHubIssueState, int]
+) -> dict[str, Any]:
+    return update_submission_stats_action(get_target_pk(target_type, target_id), deltas)
+
+
+# Indexes of the actions from put_submission_actions whose conditions failing means
+# the submission exists, under this owner or, by its pointer, another
+PUT_SUBMISSION_CONDITIONS = (0, 1)
+
+
+def put_submission_actions(model: SubmissionModel) -> list[dict[str, Any]]:
+    """Write a new submission along with its owner pointer, counting it in the stats
+    of its owner and target. Conditional on the submission not existing."""
+    deltas = {model.github_issue.state: 1}
+    not_exists = f"attribute_not_exists({MEMBER_PARTITION_KEY})"
+    return [
+        transact.put(submission_to_item(model), condition=not_exists),
+        # Submissions with the same id but another owner have a pointer
+        put_submission_owner_action(model, condition=not_exists),
+        update_submission_stats_action(str(model.pk), deltas),
+        update_target_stats_action(model.target_type, model.target_id, deltas),
+    ]
 
 
 def put_submission(model: SubmissionModel) -> SubmissionModel:
-    get_member_table().put_item(Item=model.ddict())
+    """Raises ResultAlreadyExists if the submission exists. Other cancellations, e.g.
+    conflicting with another transaction on the stats, are raised as they are."""
+    client = get_member_table().meta.client
+    try:
+        write_counted(put_submission_actions(model))
+    except client.exceptions.TransactionCanceledException as e:
+        if not transact.failed_conditions(e, *PUT_SUBMISSION_CONDITIONS):
+            raise
+        raise ResultAlreadyExists(
+            f"Submission with id {model.issue_id} already exists"
+        ) from e
+    submission_owners.put(model.issue_id, str(model.pk))
+    target_submissions.invalidate((model.target_type, model.target_id))
     return model
 
 
-def update_submission_github_issue(id: int, issue: GitHubIssueModel) -> SubmissionModel:
-    submission = get_submission(id)
-    get_member_table().update_item(
+def put_pending_submission(model: PendingSubmissionModel) -> PendingSubmissionModel:
+    table = get_member_table()
+    try:
+        table.put_item(
+            Item=model.ddict(),
+            ConditionExpression=Attr(MEMBER_PARTITION_KEY).not_exists(),
+        )
+    except table.meta.client.exceptions.ConditionalCheckFailedException as e:
+        raise ResultAlreadyExists(
+            f"Pending submission with id {model.id} already exists"
+        ) from e
+    return model
+
+
+def get_pending_submission(owner: str, id: UUID) -> PendingSubmissionModel:
+    response = get_member_table().get_item(
         Key={
-            MEMBER_PARTITION_KEY: submission.pk,
-            MEMBER_SORT_KEY: get_submission_sk(id),
+            MEMBER_PARTITION_KEY: owner,
+            MEMBER_SORT_KEY: get_pending_submission_sk(id),
         },
-        UpdateExpression="set github_issue = :v",
-        ExpressionAttributeValues={":v": issue.ddict()},
+        ConsistentRead=True,
     )
-    return get_submission(id)
+    if result := response.get("Item"):
+        return PendingSubmissionModel.from_ddict(result)
+    raise ResultNotFound(f"Pending submission with id {id} not found")
 
 
-def move_anonymous_submissions_to_member(
-    member_id: str, anonymous_id: UUID
-) -> list[SubmissionModel]:
-    """Delete all submissions for the anonymous member and create them as member
-    submissions."""
-    anonymous_submissions = get_submissions_for_member(anonymous_id)
-    new_member_submissions = []
-    for anonymous_submission in anonymous_submissions:
-        # Create a new submission using the member ID
-        new_member_submissions.append(
-            # Direct copy and change only the PK
-            put_submission(anonymous_submission.model_copy(update={"pk": member_id}))
+def claim_pending_submission(owner: str, id: UUID, until: datetime.datetime) -> bool:
+    """Claim a pending submission until the given time, returns False if it has been
+    claimed by someone else whose claim hasn't expired, or no longer exists."""
+    table = get_member_table()
+    try:
+        table.update_item(
+            Key={
+                MEMBER_PARTITION_KEY: owner,
+                MEMBER_SORT_KEY: get_pending_submission_sk(id),
+            },
+            UpdateExpression="set claimed_until = :until",
+            ExpressionAttributeValues={
+                ":until": until.isoformat(),
+                ":now": dates.now().isoformat(),
+            },
+            ConditionExpression=f"attribute_exists({MEMBER_PARTITION_KEY}) AND "
+            "(attribute_not_exists(claimed_until) OR claimed_until < :now)",
         )
-        # Delete the old submission
-        delete_response = get_member_table().delete_item(
+    except table.meta.client.exceptions.ConditionalCheckFailedException:
+        return False
+    return True
+
+
+def set_pending_submission_issue(owner: str, id: UUID, issue: GitHubIssueModel) -> None:
+    """Record the issue created for a pending submission. Raises ResultNotFound if
+    the pending submission no longer exists."""
+    table = get_member_table()
+    try:
+        table.update_item(
             Key={
-                MEMBER_PARTITION_KEY: anonymous_submission.pk,
-                MEMBER_SORT_KEY: anonymous_submission.sk,
+                MEMBER_PARTITION_KEY: owner,
+                MEMBER_SORT_KEY: get_pending_submission_sk(id),
+            },
+            UpdateExpression="set github_issue = :v",
+            ExpressionAttributeValues={":v": issue.ddict()},
+            ConditionExpression=Attr(MEMBER_PARTITION_KEY).exists(),
+        )
+    except table.meta.client.exceptions.ConditionalCheckFailedException as e:
+        raise ResultNotFound(f"Pending submission with id {id} not found") from e
+
+
+def complete_pending_submission(
+    pending: PendingSubmissionModel, model: SubmissionModel
+) -> SubmissionModel:
+    """Replace a pending submission with the submission in one transaction. Raises
+    ResultAlreadyExists if this has already been done, other cancellations are
+    raised as they are so the caller retries."""
+    client = get_member_table().meta.client
+    actions = put_submission_actions(model)
+    actions.append(
+        transact.delete(
+            {MEMBER_PARTITION_KEY: pending.pk, MEMBER_SORT_KEY: pending.sk},
+            condition=f"attribute_exists({MEMBER_PARTITION_KEY})",
+        )
+    )
+    try:
+        write_counted(actions)
+    except client.exceptions.TransactionCanceledException as e:
+        if not transact.failed_conditions(
+            e, *PUT_SUBMISSION_CONDITIONS, len(actions) - 1
+        ):
+            raise
+        raise ResultAlreadyExists(
+            f"Pending submission with id {pending.id} already completed"
+        ) from e
+    submission_owners.put(model.issue_id, str(model.pk))
+    target_submissions.invalidate((model.target_type, model.target_id))
+    return model
+
+
+def delete_submission(id: int) -> None:
+    """Delete a submission, its owner pointer and its place in the stats."""
+    submission = get_submission(id)
+    deltas = {submission.github_issue.state: -1}
+    client = get_member_table().meta.client
+    try:
+        write_counted(
+            [
+                # Conditional on the state so the right counter is decremented
+                transact.delete(
+                    {
+                        MEMBER_PARTITION_KEY: submission.pk,
+                        MEMBER_SORT_KEY: submission.sk,
+                    },
+                    condition="github_issue.#state = :state",
+                    names={"#state": "state"},
+                    values={":state": submission.github_issue.state.value},
+                ),
+                transact.delete(get_submission_owner_key(id)),
+                update_submission_stats_action(submission.pk, deltas),
+                update_target_stats_action(
+                    submission.target_type, submission.target_id, deltas
+                ),
+            ]
+        )
+    except client.exceptions.TransactionCanceledException as e:
+        raise DbError(f"Submission with id {id} changed while being deleted") from e
+    submission_owners.invalidate(id)
+    target_submissions.invalidate((submission.target_type, submission.target_id))
+
+
+def update_submission_github_issue_item(
+    owner: str, id: int, issue: GitHubIssueModel
+) -> dict[str, Any] | None:
+    """
+    Update the issue on a submission, moving its stats if the state changed, in one
+    transaction conditional on the state it was read with. Returns the item as it
+    was before, None if there is no such submission for the owner. Raises
+    ResultOutdated if the stored issue was updated later, or at the same time and
+    is the same, e.g. the update is from a duplicate or out of order webhook.
+    GitHub's times are to the second, so an issue changed twice within one is
+    applied.
+    """
+    key = {MEMBER_PARTITION_KEY: owner, MEMBER_SORT_KEY: get_submission_sk(id)}
+    client = get_member_table().meta.client
+    while (item := get_submission_item(owner, id)) is not None:
+        old_state = GitHubIssueState(item["github_issue"]["state"])
+        actions = [
+            transact.update(
+                key,
+                "set github_issue = :v",
+                values={
+                    ":v": issue.ddict(),
+                    ":updated_at": issue.updated_at.isoformat(),
+                    ":old_state": old_state.value,
+                },
+                names={"#state": "state"},
+                # Both sides are written by isoformat so compare in time order
+                condition=f"attribute_exists({MEMBER_PARTITION_KEY}) AND "
+                "github_issue.#state = :old_state AND "
+                "(attribute_not_exists(github_issue.updated_at) OR "
+                "github_issue.updated_at < :updated_at OR "
+                "(github_issue.updated_at = :updated_at AND github_issue <> :v))",
+            )
+        ]
+        if old_state != issue.state:
+            deltas = {old_state: -1, issue.state: 1}
+            actions.append(update_submission_stats_action(owner, deltas))
+            actions.append(
+                update_target_stats_action(
+                    str(item["target_type"]), str(item["target_id"]), deltas
+                )
+            )
+        try:
+            write_counted(actions)
+        except client.exceptions.TransactionCanceledException as e:
+            if not transact.failed_conditions(e, 0):
+                raise
+            current = get_submission_item(owner, id)
+            # Read again if the state changed after we read it, otherwise the
+            # stored issue is newer
+            if current and current["github_issue"]["state"] == old_state.value:
+                raise ResultOutdated(
+                    f"Submission with id {id} has a newer issue than "
+                    f"{issue.updated_at}"
+                ) from e
+        else:
+            return item
+    return None
+
+
+def update_submission_github_issue(
+    id: int, issue: GitHubIssueModel, return_model: bool = True
+) -> SubmissionModel | None:
+    """
+    Set the GitHub issue of a submission, moving its stats if the state changed.
+    Only newer issues are applied, raises ResultOutdated otherwise. Set
+    `return_model` to False to skip validating the updated submission when it
+    isn't needed.
+    """
+    owner = get_submission_owner(id)
+    result = update_submission_github_issue_item(owner, id, issue)
+    if result is None and (current_owner := refresh_submission_owner(id, owner)):
+        owner = current_owner
+        result = update_submission_github_issue_item(owner, id, issue)
+    if result is None:
+        raise ResultNotFound(f"Submission with id {id} not found")
+    target_submissions.invalidate(
+        (str(result["target_type"]), str(result["target_id"]))
+    )
+    if not return_model:
+        return None
+    return SubmissionModel.from_ddict(result).model_copy(update={"github_issue": issue})
+
+
+# Maximum keys in one BatchGetItem request
+BATCH_GET_MAX_KEYS = 100
+# Each submission updated in a batch takes up to three actions, its own and those of
+# the two counters it moves between states
+ISSUE_UPDATES_PER_TRANSACTION = transact.TRANSACTION_MAX_ITEMS // 3
+
+
+def batch_get_items(keys: Sequence[Mapping[str, Any]]) -> list[dict[str, Any]]:
+    """Get items by key with BatchGetItem, consistently but in no particular order.
+    Keys without an item are left out."""
+    table_name = get_table_name()
+    items: list[dict[str, Any]] = []
+    for start in range(0, len(keys), BATCH_GET_MAX_KEYS):
+        request: Any = {
+            table_name: {
+                "Keys": list(keys[start : start + BATCH_GET_MAX_KEYS]),
+                "ConsistentRead": True,
+            }
+        }
+        attempt = 0
+        while request:
+            if attempt:
+                # Keys are left unprocessed when throttled, back off before retrying
+                time.sleep(min(0.05 * 2**attempt, 1))
+            response = get_dynamo_db().batch_get_item(RequestItems=request)
+            items.extend(response["Responses"].get(table_name, []))
+            request = response.get("UnprocessedKeys")
+            attempt += 1
+    return items
+
+
+def get_submission_owners(ids: Iterable[int]) -> dict[int, str]:
+    """Get the owners of many submissions from their pointers in batches. Ids with
+    no pointer, e.g. issues which aren't submissions, are left out."""
+    owners = {}
+    uncached = []
+    for id in ids:
+        if owner := submission_owners.get(id):
+            owners[id] = owner
+        else:
+            uncached.append(id)
+    for item in batch_get_items([get_submission_owner_key(id) for id in uncached]):
+        id = int(str(item[MEMBER_PARTITION_KEY]).removeprefix(SK_SUBMISSION_PREFIX))
+        owners[id] = str(item[SUBMISSION_OWNER_ATTRIBUTE])
+        submission_owners.put(id, owners[id])
+    return owners
+
+
+def update_submission_github_issues_actions(
+    changes: Sequence[tuple[SubmissionModel, GitHubIssueModel, str]]
+) -> list[dict[str, Any]]:
+    """Set the issues of submissions as read, conditional on the stored issues not
+    having changed since, moving the stats of any which changed state. Each change
+    gives the stored updated_at as read, compared as it is as older items may hold
+    naive times."""
+    actions = []
+    deltas: dict[str, collections.Counter[GitHubIssueState]] = collections.defaultdict(
+        collections.Counter
+    )
+    for submission, issue, read_updated_at in changes:
+        actions.append(
+            transact.update(
+                {MEMBER_PARTITION_KEY: submission.pk, MEMBER_SORT_KEY: submission.sk},
+                "set github_issue = :v",
+                values={
+                    ":v": issue.ddict(),
+                    ":read_updated_at": read_updated_at,
+                },
+                condition="github_issue.updated_at = :read_updated_at",
+            )
+        )
+        if (old_state := submission.github_issue.state) != issue.state:
+            target_pk = get_target_pk(submission.target_type, submission.target_id)
+            for pk in (submission.pk, target_pk):
+                deltas[pk][old_state] -= 1
+                deltas[pk][issue.state] += 1
+    for pk, counter in deltas.items():
+        if pk_deltas := {state: delta for state, delta in counter.items() if delta}:
+            actions.append(update_submission_stats_action(pk, pk_deltas))
+    return actions
+
+
+def update_submission_github_issues(issues: Iterable[GitHubIssueModel]) -> list[int]:
+    """
+    Set the GitHub issues of many submissions, e.g. when reconciling with GitHub,
+    returns the ids of the submissions changed. The submissions are read in batches
+    and only those whose stored issue differs, and isn't newer, are written, in
+    transactions of many submissions. A submission changed since being read fails
+    its transaction, the submissions in it are then updated one at a time.
+    """
+    by_id = {issue.number: issue for issue in issues}
+    owners = get_submission_owners(by_id)
+    items = batch_get_items(
+        [
+            {MEMBER_PARTITION_KEY: owner, MEMBER_SORT_KEY: get_submission_sk(id)}
+            for id, owner in owners.items()
+        ]
+    )
+    changes = []
+    for item in items:
+        submission = SubmissionModel.from_ddict(item)
+        issue = by_id[submission.issue_id]
+        if (
+            submission.github_issue != issue
+            and submission.github_issue.updated_at <= issue.updated_at
+        ):
+            changes.append(
+                (submission, issue, str(item["github_issue"]["updated_at"]))  # type: ignore
+            )
+    client = get_member_table().meta.client
+    updated: list[int] = []
+    for start in range(0, len(changes), ISSUE_UPDATES_PER_TRANSACTION):
+        chunk = changes[start : start + ISSUE_UPDATES_PER_TRANSACTION]
+        try:
+            write_counted(update_submission_github_issues_actions(chunk))
+            updated.extend(submission.issue_id for submission, _, _ in chunk)
+        except client.exceptions.TransactionCanceledException:
+            for submission, issue, _ in chunk:
+                with contextlib.suppress(ResultOutdated, ResultNotFound):
+                    update_submission_github_issue(
+                        submission.issue_id, issue, return_model=False
+                    )
+                    updated.append(submission.issue_id)
+        for submission, _, _ in chunk:
+            target_submissions.invalidate(
+                (submission.target_type, submission.target_id)
+            )
+    return updated
+
+
+class GitHubIssuesWatermark(NamedTuple):
+    # Time up to which issues have been reconciled, by GitHub's clock
+    watermark: datetime.datetime
+    # ETag of the listing of issues updated since the watermark, to make the next
+    # listing conditional
+    etag: str | None = None
+
+
+def get_github_issues_watermark_item() -> GitHubIssuesWatermark | None:
+    """The watermark of reconciling issues with GitHub, None if they never have
+    been."""
+    response = get_member_table().get_item(
+        Key=get_github_issues_watermark_key(), ConsistentRead=True
+    )
+    if item := response.get("Item"):
+        return GitHubIssuesWatermark(
+            watermark=datetime.datetime.fromisoformat(str(item["watermark"])),
+            etag=str(item["etag"]) if "etag" in item else None,
+        )
+    return None
+
+
+def get_github_issues_watermark() -> datetime.datetime | None:
+    """The time up to which issues have been reconciled with GitHub, by GitHub's
+    clock, None if they never have."""
+    item = get_github_issues_watermark_item()
+    return item.watermark if item else None
+
+
+def put_github_issues_watermark(
+    watermark: datetime.datetime, etag: str | None = None
+) -> None:
+    item = {**get_github_issues_watermark_key(), "watermark": watermark.isoformat()}
+    if etag:
+        item["etag"] = etag
+    get_member_table().put_item(Item=item)
+
+
+# Webhook deliveries handled by this instance, saves the conditional write for
+# redeliveries arriving at the same instance
+webhook_deliveries: TTLCache[str, bool] = TTLCache(ttl=settings.webhook_delivery_ttl)
+
+
+def put_webhook_delivery(id: str) -> bool:
+    """Record a webhook delivery, returns False if it has already been recorded."""
+    if webhook_deliveries.get(id):
+        return False
+    table = get_member_table()
+    now = int(time.time())
+    try:
+        table.put_item(
+            Item={
+                **get_webhook_delivery_key(id),
+                TTL_ATTRIBUTE: now + settings.webhook_delivery_ttl,
             },
-            ReturnValues="ALL_OLD",  # Needed for 'Attributes' in response
+            # DynamoDB can take a while to remove expired items
+            ConditionExpression=Attr(MEMBER_PARTITION_KEY).not_exists()
+            | Attr(TTL_ATTRIBUTE).lt(now),
         )
-        assert delete_response["Attributes"], "Original submission not deleted"
-    return new_member_submissions
+    except table.meta.client.exceptions.ConditionalCheckFailedException:
+        webhook_deliveries.put(id, True)
+        return False
+    webhook_deliveries.put(id, True)
+    return True
+
+
+def delete_webhook_delivery(id: str) -> None:
+    """Forget a webhook delivery, e.g. if handling it failed so it can be retried"""
+    webhook_deliveries.invalidate(id)
+    get_member_table().delete_item(Key=get_webhook_delivery_key(id))
+
+
+def get_member_anonymous_ids(id: str) -> list[str]:
+    response = get_member_table().get_item(
+        Key={MEMBER_PARTITION_KEY: id, MEMBER_SORT_KEY: SK_PROFILE},
+        ProjectionExpression="anonymous_ids",
+        ConsistentRead=True,
+    )
+    return list(response.get("Item", {}).get("anonymous_ids") or [])  # type: ignore
+
+
+def remove_anonymous_id_action(
+    member_id: str, anonymous_id: UUID
+) -> dict[str, Any] | None:
+    """Remove the anonymous id from the member, conditional on it being at the index
+    we read in case the list has changed since."""
+    anonymous_ids = get_member_anonymous_ids(member_id)
+    if str(anonymous_id) not in anonymous_ids:
+        return None
+    index = anonymous_ids.index(str(anonymous_id))
+    return transact.update(
+        {MEMBER_PARTITION_KEY: member_id, MEMBER_SORT_KEY: SK_PROFILE},
+        f"remove anonymous_ids[{index}]",
+        values={":id": str(anonymous_id)},
+        condition=f"anonymous_ids[{index}] = :id",
+    )
+
+
+def move_submission_actions(
+    submission: SubmissionModel, member_id: str
+) -> list[dict[str, Any]]:
+    member_submission = submission.model_copy(update={"pk": member_id})
+    return [
+        transact.put(submission_to_item(member_submission)),
+        transact.delete(
+            {MEMBER_PARTITION_KEY: submission.pk, MEMBER_SORT_KEY: submission.sk},
+            condition=f"attribute_exists({MEMBER_PARTITION_KEY})",
+        ),
+        put_submission_owner_action(member_submission),
+    ]
+
+
+# Each submission moved is three actions, leaving room for updating the stats of
+# both owners and removing the anonymous id
+SUBMISSIONS_PER_TRANSACTION = (transact.TRANSACTION_MAX_ITEMS - 3) // 3
+
+
+def move_anonymous_submissions_to_member(
+    member_id: str, anonymous_id: UUID
+) -> list[SubmissionModel]:
+    """
+    Move all submissions for the anonymous id to the member, then remove the
+    anonymous id from the member so it isn't checked again.
+
+    Submissions are moved in transactions of up to SUBMISSIONS_PER_TRANSACTION,
+    the anonymous id is removed in the last. Raises DbError if the move was
+    cancelled as the submissions or anonymous ids changed underneath us, e.g. the
+    same move was made by a concurrent request.
+    """
+    anonymous_submissions = get_submissions_for_member(anonymous_id)
+    chunks = [
+        anonymous_submissions[i : i + SUBMISSIONS_PER_TRANSACTION]
+        for i in range(0, len(anonymous_submissions), SUBMISSIONS_PER_TRANSACTION)
+    ] or [[]]
+    client = get_member_table().meta.client
+    member_submissions = []
+    for i, chunk in enumerate(chunks):
+        actions = [
+            action
+            for submission in chunk
+            for action in move_submission_actions(submission, member_id)
+        ]
+        if chunk:
+            deltas = collections.Counter(s.github_issue.state for s in chunk)
+            actions.append(update_submission_stats_action(member_id, deltas))
+            actions.append(
+                update_submission_stats_action(
+                    str(anonymous_id), {state: -n for state, n in deltas.items()}
+                )
+            )
+        if i == len(chunks) - 1 and (
+            remove_action := remove_anonymous_id_action(member_id, anonymous_id)
+        ):
+            actions.append(remove_action)
+        if not actions:
+            continue
+        try:
+            write_counted(actions)
+        except client.exceptions.TransactionCanceledException as e:
+            raise DbError(
+                f"Could not move submissions from {anonymous_id} to {member_id}"
+            ) from e
+        for submission in chunk:
+            member_submissions.append(submission.model_copy(update={"pk": member_id}))
+            submission_owners.put(submission.issue_id, member_id)
+            target_submissions.invalidate(
+                (submission.target_type, submission.target_id)
+            )
+    return member_submissions
@@ -1,5 +1,6 @@
 import functools
 from typing import Literal
+from uuid import UUID
 
 from lumina.config import settings
 from lumina.database.connection import get_dynamo_db
@@ -26,8 +27,31 @@ MEMBER_SORT_KEY = "sk"
 
 SK_PROFILE: Literal["profile"] = "profile"
 SK_SUBMISSION_PREFIX = "submission/"
+# Submissions waiting on their GitHub issue, keyed by a random id as there is no
+# issue number yet
+SK_PENDING_SUBMISSION_PREFIX = "pending/"
 PK_ANONYMOUS = "ANONYMOUS"
 
+# Pointer items map a submission id to the member that owns it, so a submission can
+# be found by id with a GetItem. Partitioned by the submission's sort key.
+SK_SUBMISSION_OWNER = "owner"
+SUBMISSION_OWNER_ATTRIBUTE = "owner"
+
+# Counters of submissions by issue state, kept per owner and per target so stats are
+# a single GetItem. Target counters are partitioned by the target.
+SK_SUBMISSION_STATS = "stats/submissions"
+PK_TARGET_PREFIX = "target/"
+
+# Records of webhook deliveries already handled, partitioned by delivery id and
+# removed by DynamoDB once expired
+PK_WEBHOOK_DELIVERY_PREFIX = "delivery/"
+SK_WEBHOOK_DELIVERY = "delivery"
+TTL_ATTRIBUTE = "expires_at"
+
+# Time up to which submissions' issues have been reconciled with GitHub
+PK_RECONCILE = "reconcile"
+SK_GITHUB_ISSUES_WATERMARK = "github_issues"
+
 GSI_SK = "gsi_sk"
 
 GSI_SUBMISSION_TARGET = "gsi_submission_target"
@@ -35,17 +59,58 @@ GSI_SUBMISSION_TARGET_PK = "target_type"
 GSI_SUBMISSION_TARGET_SK = "target_id"
 
 
+# Used to list an owner's submissions newest first. Sparse, the sort key attribute is
+# a copy of created_at written only on submission items.
+GSI_SUBMISSION_CREATED = "gsi_submission_created"
+GSI_SUBMISSION_CREATED_SK = "submission_created_at"
+
+
 def get_submission_sk(submission_id: int) -> str:
     """Get the sort key for a submission id, the id is a GitHub issue id"""
     return f"{SK_SUBMISSION_PREFIX}{submission_id}"
 
 
+def get_pending_submission_sk(pending_id: UUID) -> str:
+    return f"{SK_PENDING_SUBMISSION_PREFIX}{pending_id}"
+
+
+def get_submission_owner_key(submission_id: int) -> dict[str, str]:
+    """Get the key of the pointer item recording who owns a submission"""
+    return {
+        MEMBER_PARTITION_KEY: get_submission_sk(submission_id),
+        MEMBER_SORT_KEY: SK_SUBMISSION_OWNER,
+    }
+
+
+def get_webhook_delivery_key(delivery_id: str) -> dict[str, str]:
+    return {
+        MEMBER_PARTITION_KEY: f"{PK_WEBHOOK_DELIVERY_PREFIX}{delivery_id}",
+        MEMBER_SORT_KEY: SK_WEBHOOK_DELIVERY,
+    }
+
+
+def get_github_issues_watermark_key() -> dict[str, str]:
+    return {
+        MEMBER_PARTITION_KEY: PK_RECONCILE,
+        MEMBER_SORT_KEY: SK_GITHUB_ISSUES_WATERMARK,
+    }
+
+
+def get_target_pk(target_type: str, target_id: str) -> str:
+    return f"{PK_TARGET_PREFIX}{target_type}/{target_id}"
+
+
+def get_submission_stats_key(pk: str) -> dict[str, str]:
+    """Get the key of the submission counters for an owner or target partition"""
+    return {MEMBER_PARTITION_KEY: pk, MEMBER_SORT_KEY: SK_SUBMISSION_STATS}
+
+
 def create_tables():
     """
     Create the tables for the database, this is used in testing and locally.
     On AWS, this is done by the SAM template where the **definitions are duplicated**.
     """
-    return get_dynamo_db().create_table(
+    table = get_dynamo_db().create_table(
         TableName=get_table_name(),
         KeySchema=[
             {"AttributeName": MEMBER_PARTITION_KEY, "KeyType": "HASH"},
@@ -58,6 +123,7 @@ def create_tables():
             {"AttributeName": MEMBER_SORT_KEY, "AttributeType": "S"},
             {"AttributeName": GSI_SUBMISSION_TARGET_PK, "AttributeType": "S"},
             {"AttributeName": GSI_SUBMISSION_TARGET_SK, "AttributeType": "S"},
+            {"AttributeName": GSI_SUBMISSION_CREATED_SK, "AttributeType": "S"},
         ],
         GlobalSecondaryIndexes=[
             # Used to query on sort keys, e.g. getting submission by ID
@@ -75,6 +141,20 @@ def create_tables():
                 ],
                 "Projection": {"ProjectionType": "ALL"},
             },
+            # Used to list submissions by owner, newest first
+            {
+                "IndexName": GSI_SUBMISSION_CREATED,
+                "KeySchema": [
+                    {"AttributeName": MEMBER_PARTITION_KEY, "KeyType": "HASH"},
+                    {"AttributeName": GSI_SUBMISSION_CREATED_SK, "KeyType": "RANGE"},
+                ],
+                "Projection": {"ProjectionType": "ALL"},
+            },
         ],
         BillingMode="PAY_PER_REQUEST",
     )
+    table.meta.client.update_time_to_live(
+        TableName=get_table_name(),
+        TimeToLiveSpecification={"Enabled": True, "AttributeName": TTL_ATTRIBUTE},
+    )
+    return table
@@ -0,0 +1,83 @@
+"""
+Helpers for TransactWriteItems, which the Table resource does not have. The
+resource's client still converts attribute values from Python types for us.
+"""
+from collections.abc import Mapping, Sequence
+from typing import Any
+
+from lumina.database.connection import get_dynamo_db
+from lumina.database.table import get_table_name
+
+# Maximum actions in one TransactWriteItems request
+TRANSACTION_MAX_ITEMS = 100
+
+
+def put(item: Mapping[str, Any], condition: str | None = None) -> dict[str, Any]:
+    action: dict[str, Any] = {"TableName": get_table_name(), "Item": dict(item)}
+    if condition:
+        action["ConditionExpression"] = condition
+    return {"Put": action}
+
+
+def delete(
+    key: Mapping[str, Any],
+    condition: str | None = None,
+    values: Mapping[str, Any] | None = None,
+    names: Mapping[str, str] | None = None,
+) -> dict[str, Any]:
+    action: dict[str, Any] = {"TableName": get_table_name(), "Key": dict(key)}
+    if condition:
+        action["ConditionExpression"] = condition
+    if values:
+        action["ExpressionAttributeValues"] = dict(values)
+    if names:
+        action["ExpressionAttributeNames"] = dict(names)
+    return {"Delete": action}
+
+
+def update(
+    key: Mapping[str, Any],
+    update_expression: str,
+    values: Mapping[str, Any] | None = None,
+    names: Mapping[str, str] | None = None,
+    condition: str | None = None,
+) -> dict[str, Any]:
+    action: dict[str, Any] = {
+        "TableName": get_table_name(),
+        "Key": dict(key),
+        "UpdateExpression": update_expression,
+    }
+    if values:
+        action["ExpressionAttributeValues"] = dict(values)
+    if names:
+        action["ExpressionAttributeNames"] = dict(names)
+    if condition:
+        action["ConditionExpression"] = condition
+    return {"Update": action}
+
+
+def condition_check(key: Mapping[str, Any], condition: str) -> dict[str, Any]:
+    return {
+        "ConditionCheck": {
+            "TableName": get_table_name(),
+            "Key": dict(key),
+            "ConditionExpression": condition,
+        }
+    }
+
+
+def failed_conditions(error: Any, *indexes: int) -> bool:
+    """Whether a TransactionCanceledException was caused by the condition of one of
+    the actions at `indexes` failing, rather than e.g. a conflict with another
+    transaction, which is worth retrying."""
+    reasons = error.response.get("CancellationReasons", [])
+    return any(
+        i < len(reasons) and reasons[i].get("Code") == "ConditionalCheckFailed"
+        for i in indexes
+    )
+
+
+def write(actions: Sequence[dict[str, Any]]) -> None:
+    """Apply all actions atomically, raises TransactionCanceledException if any
+    condition fails."""
+    get_dynamo_db().meta.client.transact_write_items(TransactItems=list(actions))
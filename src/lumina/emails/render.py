@@ -1,11 +1,108 @@
-import html2text
-from jinja2 import Environment, PackageLoader
+"""
+Rendering of the emails we send.
+
+Templates are compiled to Python modules at build time, see
+bin/compile-templates.py, so a cold start doesn't parse them. Without compiled
+templates, e.g. locally and in tests, they are loaded from source.
+
+The plaintext of an email is html2text's conversion of the HTML, which is slow.
+It's converted once per template, rendered with placeholders for the context,
+after which each email only substitutes the context into that skeleton. Templates
+which transform the context, so the substituted HTML wouldn't match, are still
+converted on every render.
+"""
+import functools
+import re
+from collections.abc import Mapping
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, NamedTuple
+
 from lumina.emails.send import EmailBody
 
-env = Environment(loader=PackageLoader("lumina.emails", "templates"))
+if TYPE_CHECKING:
+    from jinja2 import BaseLoader, Environment
+
+COMPILED_TEMPLATES_PATH = Path(__file__).parent / "compiled"
+
+# Only letters and digits, so html2text leaves placeholders as they are
+PLACEHOLDER = "LUMINA{}CONTEXT"
+PLACEHOLDER_RE = re.compile(PLACEHOLDER.format(r"(\d+)"))
+
+
+def get_source_loader() -> "BaseLoader":
+    from jinja2 import PackageLoader
+
+    return PackageLoader("lumina.emails", "templates")
+
+
+@functools.lru_cache(maxsize=1)
+def get_environment() -> "Environment":
+    # Jinja2 is only needed when sending email, defer the import until then
+    from jinja2 import Environment, ModuleLoader
+
+    if COMPILED_TEMPLATES_PATH.is_dir():
+        return Environment(loader=ModuleLoader(COMPILED_TEMPLATES_PATH))
+    return Environment(loader=get_source_loader())
+
+
+def compile_templates(target: Path) -> None:
+    """Compile every template to a module in `target`, for get_environment."""
+    from jinja2 import Environment
+
+    Environment(loader=get_source_loader()).compile_templates(
+        target, zip=None, ignore_errors=False
+    )
+
+
+class Skeleton(NamedTuple):
+    html: str
+    plaintext: str
+
+
+@functools.lru_cache
+def get_skeleton(template_filename: str, keys: tuple[str, ...]) -> Skeleton | None:
+    """
+    A template rendered, and converted to plaintext, with a placeholder for each
+    context key, the nth key's placeholder is PLACEHOLDER formatted with n. None if
+    a placeholder didn't come through the conversion intact.
+    """
+    import html2text
+
+    placeholders = {key: PLACEHOLDER.format(i) for i, key in enumerate(keys)}
+    html = get_environment().get_template(template_filename).render(**placeholders)
+    plaintext = html2text.html2text(html).strip()
+    if any(
+        html.count(placeholder) != plaintext.count(placeholder)
+        for placeholder in placeholders.values()
+    ):
+        return None
+    return Skeleton(html=html, plaintext=plaintext)
+
+
+def render_plaintext(
+    template_filename: str, html: str, context: Mapping[str, Any]
+) -> str:
+    """
+    The plaintext of a rendered email. Substituted into the template's skeleton if
+    that gives the same HTML, i.e. the template uses the context as it is, otherwise
+    converted from the HTML.
+    """
+    keys = tuple(sorted(context))
+
+    def substitute(skeleton: str) -> str:
+        return PLACEHOLDER_RE.sub(lambda m: str(context[keys[int(m[1])]]), skeleton)
+
+    skeleton = get_skeleton(template_filename, keys)
+    if skeleton is None or substitute(skeleton.html) != html:
+        import html2text
+
+        return html2text.html2text(html).strip()
+    return substitute(skeleton.plaintext)
 
 
 def render_email(template_filename: str, **context) -> EmailBody:
-    template = env.get_template(template_filename)
+    template = get_environment().get_template(template_filename)
     html = template.render(**context)
-    return EmailBody(plaintext=html2text.html2text(html).strip(), html=html)
+    return EmailBody(
+        plaintext=render_plaintext(template_filename, html, context), html=html
+    )
@@ -1,11 +1,13 @@
 import email.utils
 import logging
-from typing import NamedTuple
+from typing import TYPE_CHECKING, NamedTuple
 
-import boto3
 from botocore.exceptions import ClientError
-from lumina.config import settings
-from mypy_boto3_ses.type_defs import BodyTypeDef, ContentTypeDef, MessageTypeDef
+from lumina import aws
+
+if TYPE_CHECKING:
+    from mypy_boto3_ses import SESClient
+    from mypy_boto3_ses.type_defs import MessageTypeDef
 
 log = logging.getLogger(__name__)
 
@@ -26,6 +28,10 @@ class EmailBody(NamedTuple):
     html: str
 
 
+def get_ses_client() -> "SESClient":
+    return aws.get_ses_client()
+
+
 def send_email(
     to_addresses: list[tuple[str | None, str]],
     subject: str,
@@ -40,22 +46,22 @@ def send_email(
     :param html: The HTML body of the email, optional.
     :return: The message ID of the email.
     """
-    ses_client = boto3.client("ses", region_name=settings.aws_region)
+    message: MessageTypeDef = {
+        "Subject": {"Data": subject, "Charset": CHARSET},
+        "Body": {
+            "Text": {"Data": body.plaintext, "Charset": CHARSET},
+            "Html": {"Data": body.html, "Charset": CHARSET},
+        },
+    }
 
     # Try to send the email.
     try:
         # Provide the contents of the email.
-        response = ses_client.send_email(
+        response = get_ses_client().send_email(
             Destination={
                 "ToAddresses": list(map(email.utils.formataddr, to_addresses)),
             },
-            Message=MessageTypeDef(
-                Subject=ContentTypeDef(Data=subject, Charset=CHARSET),
-                Body=BodyTypeDef(
-                    Text=ContentTypeDef(Data=body.plaintext, Charset=CHARSET),
-                    Html=ContentTypeDef(Data=body.html, Charset=CHARSET),
-                ),
-            ),
+            Message=message,
             Source=FROM_ADDRESS,
         )
     # Display an error if something goes wrong.
@@ -2,7 +2,6 @@ from http import HTTPStatus
 
 from fastapi import APIRouter, Depends
 from lumina import auth
-from lumina.database.models import MemberModel
 from lumina.schema.auth import AuthCheckOptionalResponse, AuthCheckRequiredResponse
 
 router = APIRouter()
@@ -14,10 +13,10 @@ router = APIRouter()
     responses={int(HTTPStatus.UNAUTHORIZED): {"description": "Unauthorized"}},
 )
 def check_auth(
-    token: auth.AuthenticatedToken = Depends(auth.JWTBearer(optional=False)),
-    member: MemberModel = Depends(auth.require_member),
+    token: auth.AuthenticatedToken = Depends(auth.require_token),
+    principal: auth.MemberPrincipal = Depends(auth.require_principal),
 ):
-    return AuthCheckRequiredResponse(id=member.id, expires_at=token.expires_at)
+    return AuthCheckRequiredResponse(id=principal.id, expires_at=token.expires_at)
 
 
 @router.get(
@@ -28,9 +27,9 @@ def check_auth(
     },
 )
 def check_auth_optional(
-    token: auth.AuthenticatedToken = Depends(auth.JWTBearer(optional=True)),
-    member: MemberModel | None = Depends(auth.optional_member),
+    token: auth.AuthenticatedToken = Depends(auth.optional_token),
+    principal: auth.MemberPrincipal | None = Depends(auth.optional_principal),
 ):
-    if member:
-        return AuthCheckOptionalResponse(id=member.id, expires_at=token.expires_at)
+    if principal:
+        return AuthCheckOptionalResponse(id=principal.id, expires_at=token.expires_at)
     return AuthCheckOptionalResponse()
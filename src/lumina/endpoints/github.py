@@ -1,8 +1,9 @@
 from http import HTTPStatus
 
-from fastapi import APIRouter, Header, HTTPException, Request
+import lumina.webhook_queue
+from fastapi import APIRouter, BackgroundTasks, Header, HTTPException, Request, Response
+from lumina.config import settings
 from lumina.github import webhooks
-from lumina.schema.github import GitHubWebhook
 
 router = APIRouter()
 
@@ -10,23 +11,40 @@ router = APIRouter()
 @router.post(
     "/webhook",
     responses={
+        int(HTTPStatus.ACCEPTED): {"description": "Accepted, queued to be handled"},
         int(HTTPStatus.BAD_REQUEST): {"description": "Missing signature header"},
         int(HTTPStatus.UNAUTHORIZED): {"description": "Signature verification failed"},
     },
 )
 async def handle_webhook(
     request: Request,
-    webhook: GitHubWebhook,
+    background_tasks: BackgroundTasks,
     X_Hub_Signature_256: str | None = Header(None),
+    X_GitHub_Event: str | None = Header(None),
+    X_GitHub_Delivery: str | None = Header(None),
 ):
+    """
+    Receive a webhook from GitHub. The raw body is read once and its signature
+    verified before anything is parsed, then only events changing an issue are.
+    With deferred webhooks enabled those events are queued, returning 202 Accepted.
+    """
     if not X_Hub_Signature_256:
         raise HTTPException(
             status_code=HTTPStatus.BAD_REQUEST, detail="Missing signature header"
         )
-    if not webhooks.verify_webhook(
-        signature=X_Hub_Signature_256, body=await request.body()
-    ):
+    body = await request.body()
+    if not webhooks.verify_webhook(signature=X_Hub_Signature_256, body=body):
         raise HTTPException(
             status_code=HTTPStatus.UNAUTHORIZED, detail="Signature verification failed"
         )
-    webhooks.handle_webhook(webhook)
+    if settings.webhook_deferred:
+        if lumina.webhook_queue.enqueue(
+            event=X_GitHub_Event, body=body, delivery=X_GitHub_Delivery
+        ):
+            background_tasks.add_task(lumina.webhook_queue.get_queue().flush)
+            return Response(status_code=HTTPStatus.ACCEPTED)
+    else:
+        webhooks.handle_webhook(
+            event=X_GitHub_Event, body=body, delivery=X_GitHub_Delivery
+        )
+    return None
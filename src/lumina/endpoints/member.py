@@ -3,8 +3,15 @@ from http import HTTPStatus
 import lumina.database.operations
 import lumina.emails.render
 import lumina.emails.send
-from fastapi import APIRouter, Depends, HTTPException
+from boto3.dynamodb.conditions import ConditionBase
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from lumina import auth
+from lumina.database.cursor import (
+    HEADER_NEXT_CURSOR,
+    InvalidCursor,
+    decode_cursor,
+    encode_cursor,
+)
 from lumina.database.models import MemberModel
 from lumina.schema.member import (
     MemberPrivateResponse,
@@ -13,26 +20,77 @@ from lumina.schema.member import (
     UpdateMemberRequest,
 )
 from lumina.util.email import mask_email
+from lumina.util.streaming import stream_json_array
 
 router = APIRouter()
 
+MEMBER_PAGE_SIZE = 100
+MEMBER_PAGE_SIZE_MAX = 1000
+
+
+def member_filter(  # noqa: PLR0913
+    email_verified: bool | None = Query(None, alias="emailVerified"),
+    year_of_graduation_min: int | None = Query(None, alias="yearOfGraduationMin"),
+    year_of_graduation_max: int | None = Query(None, alias="yearOfGraduationMax"),
+    consent_news: bool | None = Query(None, alias="consentNews"),
+    consent_network: bool | None = Query(None, alias="consentNetwork"),
+    consent_members: bool | None = Query(None, alias="consentMembers"),
+    consent_students: bool | None = Query(None, alias="consentStudents"),
+) -> ConditionBase | None:
+    return lumina.database.operations.get_member_filter(
+        email_verified=email_verified,
+        year_of_graduation_min=year_of_graduation_min,
+        year_of_graduation_max=year_of_graduation_max,
+        consent_news=consent_news,
+        consent_network=consent_network,
+        consent_members=consent_members,
+        consent_students=consent_students,
+    )
+
 
 @router.get(
     "/",
     response_model=list[MemberPrivateResponse],
     responses={
+        int(HTTPStatus.BAD_REQUEST): {"description": "Invalid cursor"},
         int(HTTPStatus.UNAUTHORIZED): {"description": "Unauthorized"},
         int(HTTPStatus.FORBIDDEN): {"description": "Forbidden"},
     },
 )
 def list_members(
-    member_model: MemberModel = Depends(auth.require_admin),
+    response: Response,
+    limit: int | None = Query(None, ge=1, le=MEMBER_PAGE_SIZE_MAX),
+    cursor: str | None = None,
+    filter_expression: ConditionBase | None = Depends(member_filter),
+    principal: auth.MemberPrincipal = Depends(auth.require_admin),
 ):
     """
-    Read all members details. Restricted to Alumni Network managers.
+    Read members details. Restricted to Alumni Network managers.
+
+    Without a `limit` or `cursor` every matching member is returned. Otherwise a page
+    of at most `limit` members is returned and, if there are more, the cursor for
+    the next page is given in the `X-Next-Cursor` header.
     """
-    all_members = lumina.database.operations.get_members()
-    return [MemberPrivateResponse.from_model(m) for m in all_members]
+    if limit is None and cursor is None:
+        return stream_json_array(
+            MemberPrivateResponse.from_model(m)
+            for m in lumina.database.operations.iter_members(
+                page_size=MEMBER_PAGE_SIZE, filter_expression=filter_expression
+            )
+        )
+    try:
+        members, next_key = lumina.database.operations.get_members_page(
+            limit=limit or MEMBER_PAGE_SIZE,
+            start_key=decode_cursor(cursor) if cursor else None,
+            filter_expression=filter_expression,
+        )
+    except InvalidCursor as e:
+        raise HTTPException(
+            status_code=HTTPStatus.BAD_REQUEST, detail="Invalid cursor"
+        ) from e
+    if next_key:
+        response.headers[HEADER_NEXT_CURSOR] = encode_cursor(next_key)
+    return [MemberPrivateResponse.from_model(m) for m in members]
 
 
 @router.get(
@@ -45,28 +103,34 @@ def list_members(
 )
 def read_member(
     id: str,
+    response: Response,
     member_model: MemberModel = Depends(auth.require_member),
+    token: auth.AuthenticatedToken = Depends(auth.require_token),
 ):
     """
     Read a member's details.
-    Requires permission to view, only works for your own profile.
+    Requires permission to view, only works for your own profile. Verifies the
+    member's email on first use of a token, giving a refreshed token with the
+    verified claim in the `X-Refreshed-Token` header.
     """
     if id != member_model.id:
         raise HTTPException(
             status_code=HTTPStatus.FORBIDDEN, detail="You cannot read another member"
         )
     if not member_model.email_verified:
-        lumina.database.operations.set_member_email_verified(member_model.id)
-        # Fetch again, so we get the updated email_verified_at field
-        return MemberPrivateResponse.from_model(
-            lumina.database.operations.get_member(member_model.id)
-        )
+        verified = lumina.database.operations.set_member_email_verified(member_model.id)
+        auth.set_refreshed_token(response, token, verified)
+        return MemberPrivateResponse.from_model(verified)
     if member_model.anonymous_ids:
+        # Moved anonymous ids are removed from the member, so this only happens once
         for anonymous_id in member_model.anonymous_ids:
             lumina.database.operations.move_anonymous_submissions_to_member(
                 member_id=member_model.id,
                 anonymous_id=anonymous_id,
             )
+        return MemberPrivateResponse.from_model(
+            lumina.database.operations.get_member(member_model.id)
+        )
     return MemberPrivateResponse.from_model(member_model)
 
 
@@ -98,14 +162,13 @@ def register_member(id: str, new_member: RegisterMemberRequest):
     After success the member will be emailed a link to complete registration.
     """
     try:
-        lumina.database.operations.get_member(id)
+        member = lumina.database.operations.put_member(
+            new_member.to_model(id), create_only=True
+        )
+    except lumina.database.operations.ResultAlreadyExists as e:
         raise HTTPException(
             status_code=HTTPStatus.CONFLICT, detail="Member already exists"
-        )
-    except lumina.database.operations.ResultNotFound:
-        pass
-
-    lumina.database.operations.put_member(new_member.to_model(id))
+        ) from e
 
     lumina.emails.send.send_email(
         to_addresses=[(new_member.full_name, new_member.email)],
@@ -113,7 +176,7 @@ def register_member(id: str, new_member: RegisterMemberRequest):
         body=lumina.emails.render.render_email(
             "register_member.html",
             name=new_member.full_name,
-            auth_url=auth.get_auth_url(id),
+            auth_url=auth.get_auth_url(id, member),
         ),
     )
 
@@ -130,13 +193,16 @@ def register_member(id: str, new_member: RegisterMemberRequest):
 def update_member(
     id: str,
     member_update: UpdateMemberRequest,
-    member_model: MemberModel = Depends(auth.require_member),
+    response: Response,
+    principal: auth.MemberPrincipal = Depends(auth.require_principal),
+    token: auth.AuthenticatedToken = Depends(auth.require_token),
 ) -> MemberPrivateResponse:
     """
     Update certain fields of a member.
-    Requires permission to update, only works for your own profile.
+    Requires permission to update, only works for your own profile. A token for the
+    updated profile is given in the `X-Refreshed-Token` header.
     """
-    if id != member_model.id:
+    if id != principal.id:
         raise HTTPException(
             status_code=HTTPStatus.FORBIDDEN, detail="You cannot update another member"
         )
@@ -151,6 +217,7 @@ def update_member(
     existing_member.consent = member_update.consent.to_model()
 
     updated_member = lumina.database.operations.put_member(existing_member)
+    auth.set_refreshed_token(response, token, updated_member)
     return MemberPrivateResponse.from_model(updated_member)
 
 
@@ -163,13 +230,13 @@ def update_member(
 )
 def delete_member(
     id: str,
-    member_model: MemberModel = Depends(auth.require_member),
+    principal: auth.MemberPrincipal = Depends(auth.require_principal),
 ):
     """
     Delete a member.
     Requires permission to delete, only works for your own profile.
     """
-    if id != member_model.id:
+    if id != principal.id:
         raise HTTPException(
             status_code=HTTPStatus.FORBIDDEN, detail="You cannot delete another member"
         )
@@ -193,7 +260,7 @@ def send_token_link_for_member(id: str):
             body=lumina.emails.render.render_email(
                 "login.html",
                 name=member.name,
-                auth_url=auth.get_auth_url(id),
+                auth_url=auth.get_auth_url(id, member),
             ),
         )
     except lumina.database.operations.ResultNotFound as e:
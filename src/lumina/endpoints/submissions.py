@@ -1,15 +1,37 @@
+import hashlib
 from http import HTTPStatus
 
 import lumina.database.operations
 import lumina.github
+import lumina.github.issues
 import lumina.github.submissions
-from fastapi import APIRouter, Depends, HTTPException
+import lumina.outbox
+from fastapi import (
+    APIRouter,
+    BackgroundTasks,
+    Depends,
+    Header,
+    HTTPException,
+    Query,
+    Response,
+)
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
 from lumina import auth
-from lumina.database.models import MemberModel
+from lumina.config import settings
+from lumina.database.cursor import (
+    HEADER_NEXT_CURSOR,
+    InvalidCursor,
+    decode_cursor,
+    encode_cursor,
+)
+from lumina.database.models import MemberModel, SubmissionModel
+from lumina.github.ratelimit import GitHubRateLimited
 from lumina.schema.submissions import (
     BaseSubmissionRequest,
     BioSubmissionRequest,
     GenericSubmissionRequest,
+    PendingSubmissionResponse,
     ShowSubmissionRequest,
     SubmissionResponse,
     SubmissionStatsResponse,
@@ -17,31 +39,141 @@ from lumina.schema.submissions import (
 
 router = APIRouter()
 
+# Submissions read from DynamoDB per request when listing
+SUBMISSION_PAGE_SIZE = 50
+SUBMISSION_PAGE_SIZE_MAX = 100
+
+
+def check_can_refresh(
+    principal: auth.MemberPrincipal | None, owner: str | None = None
+) -> None:
+    """
+    Refreshing submissions queries GitHub, spending quota shared with creating
+    submissions, so it's only allowed for the owner of the submissions or an admin.
+    """
+    if principal and (principal.is_admin or principal.id == owner):
+        return
+    raise HTTPException(
+        status_code=HTTPStatus.FORBIDDEN,
+        detail="You cannot refresh these submissions",
+    )
+
 
-@router.get("/member/{id}", response_model=list[SubmissionResponse])
-def list_member_submissions(
+@router.get(
+    "/member/{id}",
+    response_model=list[SubmissionResponse],
+    responses={
+        int(HTTPStatus.BAD_REQUEST): {"description": "Invalid cursor"},
+        int(HTTPStatus.FORBIDDEN): {"description": "Forbidden"},
+    },
+)
+def list_member_submissions(  # noqa: PLR0913
     id: str,
+    response: Response,
+    limit: int | None = Query(None, ge=1, le=SUBMISSION_PAGE_SIZE_MAX),
+    cursor: str | None = None,
+    fresh: bool = False,
+    principal: auth.MemberPrincipal | None = Depends(auth.optional_principal),
 ):
-    return [
-        SubmissionResponse.from_model(submission)
-        for submission in sorted(
-            lumina.database.operations.get_submissions_for_member(id),
-            key=lambda x: x.created_at,
-            reverse=True,
+    """
+    List a member's submissions, newest first.
+
+    Without a `limit` or `cursor` every submission is returned. Otherwise a page of
+    at most `limit` submissions is returned and, if there are more, the cursor for
+    the next page is given in the `X-Next-Cursor` header.
+
+    With `fresh` the submissions' issues are fetched from GitHub rather than served
+    as last stored, only for the member themselves or an admin.
+    """
+    if fresh:
+        check_can_refresh(principal, owner=id)
+    if limit is None and cursor is None:
+        submissions = list(
+            lumina.database.operations.iter_member_submissions(
+                id, page_size=SUBMISSION_PAGE_SIZE
+            )
         )
-    ]
+        if fresh:
+            submissions = lumina.github.issues.refresh_submissions(submissions)
+        return [SubmissionResponse.from_model(submission) for submission in submissions]
+    try:
+        submissions, next_key = lumina.database.operations.get_member_submissions_page(
+            id,
+            limit=limit or SUBMISSION_PAGE_SIZE,
+            start_key=decode_cursor(cursor) if cursor else None,
+        )
+    except InvalidCursor as e:
+        raise HTTPException(
+            status_code=HTTPStatus.BAD_REQUEST, detail="Invalid cursor"
+        ) from e
+    if next_key:
+        response.headers[HEADER_NEXT_CURSOR] = encode_cursor(next_key)
+    if fresh:
+        submissions = lumina.github.issues.refresh_submissions(submissions)
+    return [SubmissionResponse.from_model(submission) for submission in submissions]
 
 
 @router.get("/member/{id}/stats", response_model=SubmissionStatsResponse)
 def read_member_submission_stats(
     id: str,
 ):
-    member_submissions = lumina.database.operations.get_submissions_for_member(id)
-    return SubmissionStatsResponse(
-        count=len(member_submissions),
+    return SubmissionStatsResponse.from_model(
+        lumina.database.operations.get_member_submission_stats(id)
     )
 
 
+def get_submissions_etag(submissions: list[SubmissionModel]) -> str:
+    """A weak ETag changing whenever a submission is added, removed or its issue is
+    updated, without hashing the whole response."""
+    newest = max((s.github_issue.updated_at for s in submissions), default=None)
+    ids = ",".join(sorted(str(s.issue_id) for s in submissions))
+    digest = hashlib.sha256(f"{ids}|{newest}".encode()).hexdigest()[:32]
+    return f'W/"{digest}"'
+
+
+@router.get(
+    "/target/{target_type}/{target_id:path}",
+    response_model=list[SubmissionResponse],
+    responses={
+        int(HTTPStatus.NOT_MODIFIED): {"description": "Not modified"},
+        int(HTTPStatus.FORBIDDEN): {"description": "Forbidden"},
+    },
+)
+def list_target_submissions(  # noqa: PLR0913
+    target_type: str,
+    target_id: str,
+    response: Response,
+    if_none_match: str | None = Header(None),
+    fresh: bool = False,
+    principal: auth.MemberPrincipal | None = Depends(auth.optional_principal),
+):
+    """
+    List the submissions for a target, e.g. a show, newest first. Public, and cached
+    for a short time. With `fresh` the submissions' issues are fetched from GitHub
+    rather than served as last stored, only for admins.
+    """
+    if fresh:
+        check_can_refresh(principal)
+    submissions = lumina.database.operations.get_cached_submissions_for_target(
+        target_type, target_id
+    )
+    if fresh:
+        submissions = lumina.github.issues.refresh_submissions(submissions)
+    headers = {
+        "ETag": get_submissions_etag(submissions),
+        "Cache-Control": f"public, max-age={settings.target_submissions_cache_ttl}",
+    }
+    if if_none_match and headers["ETag"] in (
+        tag.strip() for tag in if_none_match.split(",")
+    ):
+        return Response(status_code=HTTPStatus.NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
+    return [
+        SubmissionResponse.from_model(submission)
+        for submission in sorted(submissions, key=lambda s: s.created_at, reverse=True)
+    ]
+
+
 def require_submitter_or_member(
     submission: BaseSubmissionRequest, member: MemberModel | None
 ):
@@ -61,16 +193,46 @@ def require_submitter_or_member(
     "/message",
     description="Create a generic submission, a 'message the editors' type thing.",
     response_model=SubmissionResponse,
+    responses={
+        int(HTTPStatus.ACCEPTED): {
+            "model": PendingSubmissionResponse,
+            "description": "Accepted, the GitHub issue is being created",
+        },
+        int(HTTPStatus.SERVICE_UNAVAILABLE): {
+            "description": "Rate limited by GitHub, retry after Retry-After seconds"
+        },
+    },
 )
 def create_generic_submission(
     submission: GenericSubmissionRequest,
+    background_tasks: BackgroundTasks,
     member: MemberModel | None = Depends(auth.optional_member),
 ):
+    """
+    With the submission outbox enabled the submission is accepted without waiting
+    for its GitHub issue to be created, returning 202 Accepted.
+    """
     require_submitter_or_member(submission, member)
     submitter_id = member.pk if member else submission.submitter.id
-    issue = lumina.github.submissions.create_generic_submission_issue(
-        submission_request=submission, member=member
-    )
+    if settings.submission_outbox:
+        pending = lumina.outbox.submit(
+            submission.to_pending_model(submitter_id=submitter_id, member=member)
+        )
+        background_tasks.add_task(lumina.outbox.get_queue().flush)
+        return JSONResponse(
+            status_code=HTTPStatus.ACCEPTED,
+            content=jsonable_encoder(PendingSubmissionResponse.from_model(pending)),
+        )
+    try:
+        issue = lumina.github.submissions.create_generic_submission_issue(
+            submission_request=submission, member=member
+        )
+    except GitHubRateLimited as e:
+        raise HTTPException(
+            status_code=HTTPStatus.SERVICE_UNAVAILABLE,
+            detail="Too many submissions, please try again later",
+            headers={"Retry-After": str(e.retry_after)},
+        ) from e
     submission_instance = lumina.database.operations.put_submission(
         submission.to_model(
             submission_id=issue.number,
@@ -1,16 +1,63 @@
 import functools
+from typing import TYPE_CHECKING
 
-from github import Github
-from github.Repository import Repository
 from lumina import ssm
 from lumina.config import settings
 
+if TYPE_CHECKING:
+    from github import Github
+    from github.Repository import Repository
+    from github.Requester import Requester
+
 
 def get_access_token() -> str:
     return ssm.get_parameter("/lumina/github/access-token")
 
 
+def get_github() -> "Github":
+    """The GitHub client, kept while the access token stays the same so requests
+    reuse the pooled connections of its HTTP session. A rotated token, picked up
+    from SSM, gets a new client."""
+    return make_github(get_access_token())
+
+
 @functools.lru_cache(maxsize=1)
-def get_content_repo() -> Repository:
-    client = Github(get_access_token())
-    return client.get_repo(f"{settings.github_owner}/{settings.github_repo}")
+def make_github(token: str) -> "Github":
+    # PyGithub is slow to import, defer until a route needs to talk to GitHub
+    from github import Auth, Github
+    from urllib3.util.retry import Retry
+
+    return Github(
+        auth=Auth.Token(token),
+        timeout=settings.github_timeout,
+        pool_size=settings.github_pool_size,
+        # The most GitHub allows, fewer requests to page through a list
+        per_page=100,
+        # Retry-After is respected for these. Rate limits are left to lumina.github
+        # .ratelimit, retrying them here would only extend the penalty.
+        retry=Retry(
+            total=settings.github_max_retries,
+            backoff_factor=0.5,
+            status_forcelist=(502, 503, 504),
+        ),
+    )
+
+
+def get_content_repo() -> "Repository":
+    """A lazy handle on the content repo, no request is made until an operation
+    needs one. Its attributes, e.g. name, are fetched on first access."""
+    return make_content_repo(get_access_token())
+
+
+@functools.lru_cache(maxsize=1)
+def make_content_repo(token: str) -> "Repository":
+    return make_github(token).get_repo(
+        f"{settings.github_owner}/{settings.github_repo}", lazy=True
+    )
+
+
+def get_requester() -> "Requester":
+    """The client's requester, shared by everything it returns. PyGithub doesn't
+    expose it, we need it for GraphQL and to read the rate limit it recorded from
+    the last response, without the fetch Github.rate_limiting falls back to."""
+    return get_content_repo()._requester  # noqa: SLF001
@@ -0,0 +1,132 @@
+import logging
+from collections.abc import Iterable, Sequence
+from typing import Any
+
+import lumina.database.operations
+from lumina.config import settings
+from lumina.database.models import GitHubIssueModel, SubmissionModel
+from lumina.github import ratelimit, webhooks
+from lumina.github.connection import get_requester
+from lumina.github.ratelimit import GitHubRateLimited
+from lumina.schema.github import GitHubIssue
+from lumina.util.cache import TTLCache
+from lumina.util.dates import as_utc
+
+log = logging.getLogger(__name__)
+
+# Snapshots of issues fetched for fresh listings, by number
+fresh_issues: TTLCache[int, GitHubIssueModel] = TTLCache(
+    ttl=settings.github_fresh_issue_cache_ttl
+)
+
+# Issues fetched by one GraphQL query, each is an aliased field
+GRAPHQL_MAX_ISSUES = 100
+
+GRAPHQL_ISSUE_FIELDS = """
+    number state stateReason title createdAt updatedAt closedAt
+    comments { totalCount }
+"""
+
+
+def make_issues_query(numbers: Iterable[int]) -> str:
+    aliases = "\n".join(
+        f"i{number}: issue(number: {int(number)}) {{{GRAPHQL_ISSUE_FIELDS}}}"
+        for number in numbers
+    )
+    return (
+        "query($owner: String!, $name: String!) {\n"
+        f"  repository(owner: $owner, name: $name) {{\n{aliases}\n  }}\n"
+        "}"
+    )
+
+
+def parse_graphql_issue(node: dict[str, Any]) -> GitHubIssue:
+    return GitHubIssue(
+        number=node["number"],
+        state=node["state"].lower(),
+        state_reason=(node["stateReason"] or "").lower() or None,
+        title=node["title"],
+        created_at=node["createdAt"],
+        updated_at=node["updatedAt"],
+        closed_at=node["closedAt"],
+        comments=node["comments"]["totalCount"],
+    )
+
+
+def graphql(query: str, variables: dict[str, Any]) -> dict[str, Any]:
+    """Make a GitHub GraphQL query, returning its data. Errors, e.g. for a field
+    which doesn't resolve, are logged as the rest of the data is still useful."""
+    # PyGithub has no GraphQL API, its requester shares the client's auth and pooled
+    # connections
+    headers, response = get_requester().requestJsonAndCheck(
+        "POST", "/graphql", input={"query": query, "variables": variables}
+    )
+    # GraphQL has its own quota, PyGithub would record it as the REST one
+    ratelimit.record_response_rate_limit(headers)
+    if errors := response.get("errors"):
+        log.warning("GitHub GraphQL errors: %s", errors)
+    return response.get("data") or {}
+
+
+@ratelimit.rate_limited_by(ratelimit.RESOURCE_GRAPHQL)
+def query_issues(numbers: Sequence[int]) -> dict[int, GitHubIssueModel]:
+    """Fetch issues of the content repo in one GraphQL query, each aliased by its
+    number. Issues which don't exist, e.g. were deleted, are left out."""
+    data = graphql(
+        make_issues_query(numbers),
+        {"owner": settings.github_owner, "name": settings.github_repo},
+    )
+    repository = data.get("repository") or {}
+    return {
+        node["number"]: webhooks.make_issue_snapshot(parse_graphql_issue(node))
+        for node in repository.values()
+        if node
+    }
+
+
+def get_fresh_issues(numbers: Iterable[int]) -> dict[int, GitHubIssueModel]:
+    """Current snapshots of issues, from the cache or fetched in as few queries as
+    GraphQL allows."""
+    fresh = {}
+    uncached = []
+    for number in dict.fromkeys(numbers):
+        if (issue := fresh_issues.get(number)) is not None:
+            fresh[number] = issue
+        else:
+            uncached.append(number)
+    for start in range(0, len(uncached), GRAPHQL_MAX_ISSUES):
+        for number, issue in query_issues(
+            uncached[start : start + GRAPHQL_MAX_ISSUES]
+        ).items():
+            fresh_issues.put(number, issue)
+            fresh[number] = issue
+    return fresh
+
+
+def refresh_submissions(submissions: list[SubmissionModel]) -> list[SubmissionModel]:
+    """
+    The submissions with their current issue from GitHub, writing back any snapshots
+    which changed. If GitHub can't be reached the stored snapshots are returned.
+    """
+    from github import GithubException
+
+    try:
+        fresh = get_fresh_issues(s.issue_id for s in submissions)
+    except (GitHubRateLimited, GithubException):
+        log.warning("Could not refresh issues, serving stored snapshots", exc_info=True)
+        return submissions
+    changed = {
+        s.issue_id: issue
+        for s in submissions
+        if (issue := fresh.get(s.issue_id)) is not None and issue != s.github_issue
+        # Snapshots of issues created through PyGithub may be naive
+        and issue.updated_at >= as_utc(s.github_issue.updated_at)
+    }
+    if changed:
+        lumina.database.operations.update_submission_github_issues(changed.values())
+    return [
+        s.model_copy(update={"github_issue": changed[s.issue_id]})
+        if s.issue_id in changed
+        else s
+        for s in submissions
+    ]
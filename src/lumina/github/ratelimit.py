@@ -0,0 +1,197 @@
+"""
+Awareness of GitHub's rate limits.
+
+GitHub keeps a quota per resource, named by the x-ratelimit-resource header of
+responses, each is tracked apart. PyGithub records the remaining quota from the
+headers of every response, after each REST call we read it into the core tracker
+and emit it as metrics. GraphQL queries record theirs from their own response. Before a call, if the
+quota is nearly spent or GitHub has told us to back off, GitHubRateLimited is raised
+instead of making a request which would fail and extend the penalty. Callers either
+tell the client when to retry or, from the outbox, leave the message to be retried.
+"""
+import datetime
+import functools
+import logging
+import threading
+from collections.abc import Callable, Mapping
+from typing import Any, ParamSpec, TypeVar
+
+from lumina import metrics
+from lumina.config import settings
+from lumina.github import connection
+from lumina.util import dates
+
+log = logging.getLogger(__name__)
+
+P = ParamSpec("P")
+R = TypeVar("R")
+
+
+class GitHubRateLimited(Exception):
+    def __init__(self, retry_at: datetime.datetime) -> None:
+        super().__init__(f"GitHub rate limited until {retry_at.isoformat()}")
+        self.retry_at = retry_at
+
+    @property
+    def retry_after(self) -> int:
+        """Seconds until the request can be retried, for a Retry-After header"""
+        return max(1, int((self.retry_at - dates.now()).total_seconds()) + 1)
+
+
+def is_rate_limit_exception(e: Any) -> bool:
+    """Primary and secondary rate limits are both 403s, or 429, which carry either
+    the rate limit headers or a Retry-After."""
+    if e.status not in (403, 429):
+        return False
+    headers = {k.lower(): v for k, v in (e.headers or {}).items()}
+    return "retry-after" in headers or headers.get("x-ratelimit-remaining") == "0"
+
+
+class RateLimitTracker:
+    def __init__(self) -> None:
+        self.remaining: int | None = None
+        self.limit: int | None = None
+        self.reset_at: datetime.datetime | None = None
+        # Set when GitHub tells us to back off, e.g. by a secondary rate limit
+        self.blocked_until: datetime.datetime | None = None
+        self._lock = threading.Lock()
+
+    def update(self, remaining: int, limit: int, reset: int) -> None:
+        """Update from PyGithub's record of the last response, -1 if unknown"""
+        if remaining < 0:
+            return
+        with self._lock:
+            self.remaining, self.limit = remaining, limit
+            self.reset_at = datetime.datetime.fromtimestamp(
+                reset, datetime.timezone.utc
+            )
+
+    def update_from_headers(self, headers: Mapping[str, str]) -> None:
+        headers = {k.lower(): v for k, v in headers.items()}
+        if "x-ratelimit-remaining" in headers and "x-ratelimit-limit" in headers:
+            self.update(
+                int(headers["x-ratelimit-remaining"]),
+                int(headers["x-ratelimit-limit"]),
+                int(headers.get("x-ratelimit-reset", 0)),
+            )
+
+    def record_exceeded(self, headers: Mapping[str, str]) -> datetime.datetime:
+        headers = {k.lower(): v for k, v in headers.items()}
+        now = dates.now()
+        if "retry-after" in headers:
+            blocked_until = now + datetime.timedelta(
+                seconds=int(headers["retry-after"])
+            )
+        elif "x-ratelimit-reset" in headers:
+            blocked_until = datetime.datetime.fromtimestamp(
+                int(headers["x-ratelimit-reset"]), datetime.timezone.utc
+            )
+        else:
+            blocked_until = now + datetime.timedelta(
+                seconds=settings.github_rate_limit_backoff
+            )
+        with self._lock:
+            blocked_until = max(blocked_until, self.blocked_until or now)
+            self.blocked_until = blocked_until
+        return blocked_until
+
+    def check(self) -> None:
+        """Raise GitHubRateLimited if we shouldn't make a request now"""
+        now = dates.now()
+        with self._lock:
+            if self.blocked_until and self.blocked_until > now:
+                raise GitHubRateLimited(self.blocked_until)
+            if (
+                self.remaining is not None
+                and self.remaining <= settings.github_rate_limit_reserve
+                and self.reset_at
+                and self.reset_at > now
+            ):
+                raise GitHubRateLimited(self.reset_at)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.remaining = self.limit = None
+            self.reset_at = self.blocked_until = None
+
+
+RESOURCE_CORE = "core"
+RESOURCE_GRAPHQL = "graphql"
+
+trackers = {RESOURCE_CORE: RateLimitTracker(), RESOURCE_GRAPHQL: RateLimitTracker()}
+tracker = trackers[RESOURCE_CORE]
+
+# Metric of each resource's remaining quota
+REMAINING_METRICS = {
+    RESOURCE_CORE: "GitHubRateLimitRemaining",
+    RESOURCE_GRAPHQL: "GitHubGraphQLRateLimitRemaining",
+}
+
+
+def put_remaining_metric(resource: str) -> None:
+    if (remaining := trackers[resource].remaining) is not None:
+        metrics.put_metrics({REMAINING_METRICS[resource]: remaining})
+
+
+def record_rate_limit() -> None:
+    """Update the core tracker from the rate limit recorded from the last response.
+    Never raises, as it runs while an exception from the request may be
+    propagating."""
+    try:
+        requester = connection.get_requester()
+        remaining, limit = requester.rate_limiting
+        tracker.update(remaining, limit, requester.rate_limiting_resettime)
+    except Exception:
+        log.warning("Could not read the GitHub rate limit", exc_info=True)
+        return
+    put_remaining_metric(RESOURCE_CORE)
+
+
+def record_response_rate_limit(headers: Mapping[str, str]) -> None:
+    """Update the tracker of the resource a response counted against, from its
+    headers. For requests made outside PyGithub's models, e.g. GraphQL."""
+    resource = {k.lower(): v for k, v in headers.items()}.get(
+        "x-ratelimit-resource", RESOURCE_CORE
+    )
+    if resource not in trackers:
+        return
+    trackers[resource].update_from_headers(headers)
+    put_remaining_metric(resource)
+
+
+def rate_limited_by(resource: str) -> Callable[[Callable[P, R]], Callable[P, R]]:
+    """
+    Check the resource's tracker before calling a function which makes GitHub
+    requests against it, and update it after. Rate limit errors from GitHub are
+    raised as GitHubRateLimited. Only the core quota is read from PyGithub, other
+    resources record their responses with record_response_rate_limit.
+    """
+    resource_tracker = trackers[resource]
+
+    def decorator(func: Callable[P, R]) -> Callable[P, R]:
+        @functools.wraps(func)
+        def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
+            from github import GithubException
+
+            resource_tracker.check()
+            try:
+                return func(*args, **kwargs)
+            except GithubException as e:
+                if not is_rate_limit_exception(e):
+                    raise
+                retry_at = resource_tracker.record_exceeded(e.headers or {})
+                log.warning(
+                    "GitHub %s rate limited until %s", resource, retry_at.isoformat()
+                )
+                metrics.put_metrics({"GitHubRateLimited": 1})
+                raise GitHubRateLimited(retry_at) from e
+            finally:
+                if resource == RESOURCE_CORE:
+                    record_rate_limit()
+
+        return wrapper
+
+    return decorator
+
+
+rate_limited = rate_limited_by(RESOURCE_CORE)
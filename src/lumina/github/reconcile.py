@@ -0,0 +1,129 @@
+"""
+Reconcile submissions' issues with GitHub, catching up on any missed webhooks.
+
+One paginated list of the issues updated since the last run, by the watermark
+stored in the table, is diffed against the stored issues and only the changed
+ones written. The listing is conditional on the ETag stored with the watermark,
+GitHub doesn't count a 304 Not Modified against the rate limit so a run finding
+nothing new is free. Run on a schedule by reconcile_worker.py, or with
+bin/reconcile.py.
+"""
+import datetime
+import logging
+from typing import Any, NamedTuple
+
+import lumina.database.operations
+from lumina import metrics
+from lumina.config import settings
+from lumina.github import webhooks
+from lumina.github.connection import get_requester
+from lumina.github.ratelimit import rate_limited
+from lumina.schema.github import GitHubIssue
+
+log = logging.getLogger(__name__)
+
+
+class IssueListing(NamedTuple):
+    issues: list[GitHubIssue]
+    # ETag of the first page, changes whenever any issue in the listing does
+    etag: str | None
+
+
+def get_next_page_url(headers: dict[str, Any]) -> str | None:
+    """The URL of the next page from a response's Link header"""
+    for link in str(headers.get("link", "")).split(","):
+        url, _, rel = link.partition(";")
+        if rel.strip() == 'rel="next"':
+            return url.strip().strip("<>")
+    return None
+
+
+def parse_issues(data: list[dict[str, Any]]) -> list[GitHubIssue]:
+    """Issues as listed by GitHub, the same as a webhook gives them. Pull requests,
+    which GitHub lists as issues, are left out."""
+    return [
+        GitHubIssue.model_validate(item)
+        for item in data
+        if not item.get("pull_request")
+    ]
+
+
+@rate_limited
+def list_issues_since(
+    since: datetime.datetime | None, etag: str | None = None
+) -> IssueListing | None:
+    """
+    Issues of the content repo updated at or after `since`, all if None. With the
+    `etag` of a previous listing returns None if nothing has changed since.
+    """
+    parameters: dict[str, Any] = {
+        "state": "all",
+        "sort": "updated",
+        "direction": "asc",
+        # The most GitHub allows, fewer requests to page through
+        "per_page": 100,
+    }
+    if since is not None:
+        parameters["since"] = since.astimezone(datetime.timezone.utc).strftime(
+            "%Y-%m-%dT%H:%M:%SZ"
+        )
+    requester = get_requester()
+    headers, data = requester.requestJsonAndCheck(
+        "GET",
+        f"/repos/{settings.github_owner}/{settings.github_repo}/issues",
+        parameters,
+        headers={"If-None-Match": etag} if etag else None,
+    )
+    if etag:
+        metrics.put_metrics({"GitHubConditionalRequestHit": int(data is None)})
+    if data is None:
+        return None
+    listing = IssueListing(issues=parse_issues(data), etag=headers.get("etag"))
+    while url := get_next_page_url(headers):
+        headers, data = requester.requestJsonAndCheck("GET", url)
+        listing.issues.extend(parse_issues(data))
+    return listing
+
+
+def reconcile_issues(
+    since: datetime.datetime | None = None, full: bool = False
+) -> list[int]:
+    """
+    Update the submissions whose issue changed since `since`, by default since the
+    last run, or of every issue if `full`, returns their ids. The watermark only
+    moves to the newest issue seen, so issues updated during a run are picked up
+    by the next.
+    """
+    etag = None
+    from_watermark = since is None and not full
+    if from_watermark and (
+        stored := lumina.database.operations.get_github_issues_watermark_item()
+    ):
+        since, etag = stored
+    listing = list_issues_since(since, etag)
+    if listing is None:
+        log.info("No issues updated since %s", since)
+        metrics.put_metrics({"GitHubIssuesReconciled": 0, "SubmissionsReconciled": 0})
+        return []
+    issues = listing.issues
+    updated = lumina.database.operations.update_submission_github_issues(
+        webhooks.make_issue_snapshot(issue) for issue in issues
+    )
+    log.info("Reconciled %d issues, %d submissions updated", len(issues), len(updated))
+    metrics.put_metrics(
+        {"GitHubIssuesReconciled": len(issues), "SubmissionsReconciled": len(updated)}
+    )
+    if issues:
+        watermark = max(issue.updated_at for issue in issues)
+        # The ETag is of the listing since the old watermark, only useful if the
+        # next run lists from the same
+        lumina.database.operations.put_github_issues_watermark(
+            watermark,
+            etag=listing.etag if from_watermark and watermark == since else None,
+        )
+    return updated
+
+
+def handle_scheduled_event(event: dict[str, Any], context: Any) -> dict[str, Any]:
+    """Lambda handler for the reconciliation schedule"""
+    return {"updated": reconcile_issues()}
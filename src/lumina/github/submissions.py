@@ -1,30 +1,28 @@
-from github.Issue import Issue
-from lumina.database.models import GitHubIssueModel, GitHubIssueState, MemberModel
+from typing import TYPE_CHECKING
+
+from lumina.database.models import (
+    GitHubIssueModel,
+    GitHubIssueState,
+    MemberModel,
+    PendingSubmissionModel,
+)
 from lumina.github.connection import get_content_repo
+from lumina.github.ratelimit import rate_limited
 from lumina.github.util import get_content_repo_file_url, get_content_repo_path
 from lumina.schema.submissions import GenericSubmissionRequest, SubmitterRequest
+from lumina.util.dates import as_utc
+
+if TYPE_CHECKING:
+    from github.Issue import Issue
 
 
 def get_submitter_public_link(id: str) -> str:
     return f"https://history.newtheatre.org.uk/people/{id}"
 
 
-def get_body_for_submission(
-    target_type: str,
-    target_id: str,
-    message: str,
-    submitter: SubmitterRequest | None,
-    member: MemberModel | None,
-):
-    assert not (submitter and member), "Cannot have both submitter and member"
-
-    if member:
-        submitter = f"[{member.name}]({get_submitter_public_link(member.pk)})"
-    elif submitter:
-        submitter = submitter.name
-    else:
-        raise ValueError("Must have submitter or member")
-
+def format_submission_body(
+    target_type: str, target_id: str, message: str, submitter: str, verified: bool
+) -> str:
     repo_file_path = get_content_repo_path(target_type, target_id)
     repo_file_url = (
         get_content_repo_file_url(repo_file_path) if repo_file_path else None
@@ -35,7 +33,7 @@ def get_body_for_submission(
 |-----------------|---------------------------------------------------|
 | URL             | [/a/b/c](https://history.newtheatre.org.uk/a/b/c) |
 | Source          | [{repo_file_path}]({repo_file_url}) |
-| Submitter State | {"Member" if member else "Unverified"} |
+| Submitter State | {"Member" if verified else "Unverified"} |
 | Submitter       | {submitter} |
 
 ---
@@ -43,9 +41,31 @@ def get_body_for_submission(
 {message}"""
 
 
+def get_body_for_submission(
+    target_type: str,
+    target_id: str,
+    message: str,
+    submitter: SubmitterRequest | None,
+    member: MemberModel | None,
+):
+    assert not (submitter and member), "Cannot have both submitter and member"
+
+    if member:
+        submitter_markdown = f"[{member.name}]({get_submitter_public_link(member.pk)})"
+    elif submitter:
+        submitter_markdown = submitter.name
+    else:
+        raise ValueError("Must have submitter or member")
+
+    return format_submission_body(
+        target_type, target_id, message, submitter_markdown, verified=bool(member)
+    )
+
+
+@rate_limited
 def create_generic_submission_issue(
     submission_request: GenericSubmissionRequest, member: MemberModel | None
-) -> Issue:
+) -> "Issue":
     return get_content_repo().create_issue(
         title=submission_request.subject
         or f"{submission_request.target_type}/{submission_request.target_id}",
@@ -59,15 +79,36 @@ def create_generic_submission_issue(
     )
 
 
-def make_issue_model(issue: Issue) -> GitHubIssueModel:
+@rate_limited
+def create_pending_submission_issue(pending: PendingSubmissionModel) -> "Issue":
+    """Create the issue for a submission made through the outbox, the same issue
+    create_generic_submission_issue would have."""
+    draft = pending.draft
+    submitter = draft.submitter
+    return get_content_repo().create_issue(
+        title=draft.subject or f"{draft.target_type}/{draft.target_id}",
+        body=format_submission_body(
+            target_type=draft.target_type,
+            target_id=draft.target_id,
+            message=draft.message or "",
+            submitter=f"[{submitter.name}]({get_submitter_public_link(submitter.id)})"
+            if submitter.verified
+            else submitter.name,
+            verified=submitter.verified,
+        ),
+    )
+
+
+def make_issue_model(issue: "Issue") -> GitHubIssueModel:
     return GitHubIssueModel(
         number=issue.number,
         state=GitHubIssueState(
             issue.state
         ),  # Does not handle completed state but only used for new issues
         title=issue.title,
-        created_at=issue.created_at,
-        updated_at=issue.updated_at,
-        closed_at=issue.closed_at,
+        # PyGithub gives naive datetimes, stored aware to compare with webhooks'
+        created_at=as_utc(issue.created_at),
+        updated_at=as_utc(issue.updated_at),
+        closed_at=as_utc(issue.closed_at) if issue.closed_at else None,
         comments=issue.comments,
     )
@@ -2,11 +2,12 @@ import hmac
 import logging
 
 import lumina.database.operations
+import orjson
 from lumina import ssm
 from lumina.database.models import GitHubIssueModel
-from lumina.database.operations import ResultNotFound
+from lumina.database.operations import ResultNotFound, ResultOutdated
 from lumina.github.util import get_state_from_issue
-from lumina.schema.github import GitHubWebhook
+from lumina.schema.github import GitHubIssue
 
 log = logging.getLogger(__name__)
 
@@ -45,19 +46,74 @@ def verify_webhook(signature: str, body: bytes) -> bool:
     )
 
 
-def update_issue_from_webhook(webhook: GitHubWebhook) -> None:
-    github_issue = GitHubIssueModel(**webhook.issue.model_dump())
-    github_issue.state = get_state_from_issue(webhook.issue)
-    if not webhook.issue:
-        raise ValueError("Webhook does not contain an issue")
+# Events, and their actions, which change a field of the issue we store. Anything
+# else GitHub sends is acknowledged without being parsed.
+HANDLED_EVENTS = {
+    "issues": {"opened", "edited", "closed", "reopened"},
+    "issue_comment": {"created", "deleted"},
+}
+
+
+def is_handled_event(event: str | None) -> bool:
+    return (event or "") in HANDLED_EVENTS
+
+
+def parse_webhook_issue(event: str | None, body: bytes) -> GitHubIssue | None:
+    """Get the issue from a verified webhook body, None if the event isn't one we
+    handle. Only the issue is validated, the rest of the payload is ignored."""
+    if not is_handled_event(event):
+        return None
+    payload = orjson.loads(body)
+    if payload.get("action") not in HANDLED_EVENTS[event or ""] or not payload.get(
+        "issue"
+    ):
+        return None
+    return GitHubIssue.model_validate(payload["issue"])
+
+
+def make_issue_snapshot(issue: GitHubIssue) -> GitHubIssueModel:
+    return GitHubIssueModel(
+        number=issue.number,
+        state=get_state_from_issue(issue),
+        title=issue.title,
+        created_at=issue.created_at,
+        updated_at=issue.updated_at,
+        closed_at=issue.closed_at,
+        comments=issue.comments,
+    )
+
+
+def update_issue_snapshot(github_issue: GitHubIssueModel) -> None:
     try:
         lumina.database.operations.update_submission_github_issue(
-            webhook.issue.number, github_issue
+            github_issue.number, github_issue, return_model=False
         )
+    except ResultOutdated:
+        log.info("Skipped issue %d as already up to date", github_issue.number)
     except ResultNotFound:
         log.exception("Could not update issue as not found in db")
 
 
-def handle_webhook(webhook: GitHubWebhook) -> None:
-    if webhook.issue:
-        update_issue_from_webhook(webhook)
+def update_issue_from_webhook(issue: GitHubIssue) -> None:
+    update_issue_snapshot(make_issue_snapshot(issue))
+
+
+def handle_webhook(event: str | None, body: bytes, delivery: str | None = None) -> bool:
+    """
+    Handle a verified webhook, returns whether it was handled. Deliveries already
+    handled, going by the X-GitHub-Delivery id, are skipped. Only deliveries of
+    actions we handle are recorded.
+    """
+    issue = parse_webhook_issue(event, body)
+    if issue is None:
+        return False
+    if delivery and not lumina.database.operations.put_webhook_delivery(delivery):
+        log.info("Skipped delivery %s as already handled", delivery)
+        return False
+    try:
+        update_issue_from_webhook(issue)
+    except Exception:
+        if delivery:
+            lumina.database.operations.delete_webhook_delivery(delivery)
+        raise
+    return True
@@ -4,7 +4,6 @@ from http import HTTPStatus
 
 import botocore.exceptions
 import lumina.github.connection
-from github import BadCredentialsException
 from lumina import ssm
 from lumina.config import settings
 from lumina.database import operations
@@ -71,9 +70,13 @@ def check_dynamodb() -> HealthCheckCondition:
 
 
 def check_github() -> HealthCheckCondition:
+    # Imported here so PyGithub is not loaded at startup
+    from github import BadCredentialsException
+
     try:
-        # Check if GitHub is available by grabbing the content repo
-        lumina.github.connection.get_content_repo()
+        # Check if GitHub is available by fetching the content repo, the handle is
+        # lazy so this is the only request made. Conditional, so cheap once fetched.
+        lumina.github.connection.get_content_repo().update()
         return HealthCheckCondition(
             ok=True,
             timestamp=dates.now(),
@@ -0,0 +1,36 @@
+"""
+Metrics in CloudWatch embedded metric format, a JSON log line which CloudWatch
+turns into metrics without us making an API call. Written straight to stdout as
+the Lambda log handler would prefix the line, which stops it being parsed.
+"""
+import json
+import sys
+import time
+
+from lumina.config import settings
+
+NAMESPACE = "Lumina"
+
+
+def put_metrics(metrics: dict[str, float], unit: str = "Count") -> None:
+    sys.stdout.write(
+        json.dumps(
+            {
+                "_aws": {
+                    "Timestamp": int(time.time() * 1000),
+                    "CloudWatchMetrics": [
+                        {
+                            "Namespace": NAMESPACE,
+                            "Dimensions": [["Environment"]],
+                            "Metrics": [
+                                {"Name": name, "Unit": unit} for name in metrics
+                            ],
+                        }
+                    ],
+                },
+                "Environment": settings.environment,
+                **metrics,
+            }
+        )
+        + "\n"
+    )
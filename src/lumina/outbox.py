@@ -0,0 +1,99 @@
+"""
+Outbox for creating the GitHub issues of new submissions.
+
+With settings.submission_outbox a submission is stored as pending and a message
+naming it is queued, so the request doesn't wait on GitHub. The worker creates the
+issue, records it on the pending submission, then swaps the pending submission for
+the real one. Every step can be repeated, so messages may be delivered more than
+once and failed messages simply retried.
+
+In AWS the queue is SQS and the worker a Lambda it triggers, see worker.py and
+lumina.queues.
+"""
+import datetime
+import functools
+import logging
+from uuid import UUID
+
+import lumina.database.operations
+import lumina.github.submissions
+from lumina import queues
+from lumina.config import settings
+from lumina.database.models import PendingSubmissionModel, SubmissionModel
+from lumina.util import dates
+
+log = logging.getLogger(__name__)
+
+
+class PendingSubmissionClaimed(Exception):
+    """Another worker is creating the issue, the message should be retried later"""
+
+
+def handle_messages(messages: list[queues.Message]) -> list[int]:
+    """Handle each message in a batch, returns the indexes of those which failed"""
+    failed = []
+    for i, message in enumerate(messages):
+        try:
+            handle_message(message)
+        except Exception:
+            log.exception("Failed to handle outbox message %s", message)
+            failed.append(i)
+    return failed
+
+
+@functools.lru_cache
+def get_queue() -> queues.Queue:
+    return queues.make_queue(settings.submission_queue_url, handle_messages)
+
+
+def make_message(pending: PendingSubmissionModel) -> dict[str, str]:
+    return {"owner": pending.pk, "id": str(pending.id)}
+
+
+def submit(pending: PendingSubmissionModel) -> PendingSubmissionModel:
+    """Store a pending submission and queue the creation of its issue."""
+    lumina.database.operations.put_pending_submission(pending)
+    get_queue().send(make_message(pending))
+    return pending
+
+
+def handle_pending_submission(owner: str, id: UUID) -> SubmissionModel | None:
+    """
+    Create the issue for a pending submission and store the submission, returns
+    None if this has already been done. Raises PendingSubmissionClaimed if another
+    worker is part way through.
+    """
+    try:
+        pending = lumina.database.operations.get_pending_submission(owner, id)
+    except lumina.database.operations.ResultNotFound:
+        log.info("Pending submission %s already completed", id)
+        return None
+    if pending.github_issue is None:
+        claimed_until = dates.now() + datetime.timedelta(
+            seconds=settings.pending_submission_claim_ttl
+        )
+        if not lumina.database.operations.claim_pending_submission(
+            owner, id, claimed_until
+        ):
+            raise PendingSubmissionClaimed(f"Pending submission {id} is claimed")
+        issue = lumina.github.submissions.make_issue_model(
+            lumina.github.submissions.create_pending_submission_issue(pending)
+        )
+        # Recorded straight away so if completing fails the retry reuses the issue
+        lumina.database.operations.set_pending_submission_issue(owner, id, issue)
+        pending = pending.model_copy(update={"github_issue": issue})
+    assert pending.github_issue is not None
+    try:
+        return lumina.database.operations.complete_pending_submission(
+            pending, pending.to_submission(pending.github_issue)
+        )
+    except lumina.database.operations.ResultAlreadyExists:
+        log.info("Pending submission %s already completed", id)
+        return None
+
+
+def handle_message(message: dict[str, str]) -> SubmissionModel | None:
+    return handle_pending_submission(message["owner"], UUID(message["id"]))
+
+
+handle_sqs_event = queues.make_sqs_handler(handle_messages)
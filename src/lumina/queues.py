@@ -0,0 +1,103 @@
+"""
+Queues for work done off the request path, see lumina.outbox and
+lumina.webhook_queue.
+
+In AWS a queue is SQS and its consumer a Lambda it triggers with batches of
+messages. Without a queue URL, e.g. locally and in tests, messages are kept in
+process and handled as one batch once the response has been sent.
+"""
+import collections
+import json
+import logging
+import threading
+from collections.abc import Callable
+from typing import Any, Protocol
+
+from lumina import aws
+
+log = logging.getLogger(__name__)
+
+Message = dict[str, Any]
+# Handles a batch of messages, returns the indexes of those which failed
+BatchHandler = Callable[[list[Message]], list[int]]
+
+
+class Queue(Protocol):
+    def send(self, message: Message) -> None:
+        ...
+
+    def flush(self) -> None:
+        """Handle any messages held in process"""
+        ...
+
+
+class SQSQueue:
+    def __init__(self, url: str) -> None:
+        self.url = url
+
+    def send(self, message: Message) -> None:
+        aws.get_sqs_client().send_message(
+            QueueUrl=self.url, MessageBody=json.dumps(message)
+        )
+
+    def flush(self) -> None:
+        pass
+
+
+class LocalQueue:
+    """Stand-in for SQS, messages are handled when flushed, by the request that
+    sent them once its response has been sent."""
+
+    def __init__(self, handle_batch: BatchHandler) -> None:
+        self.handle_batch = handle_batch
+        self.messages: collections.deque[Message] = collections.deque()
+        self._lock = threading.Lock()
+
+    def send(self, message: Message) -> None:
+        self.messages.append(message)
+
+    def flush(self) -> None:
+        with self._lock:
+            batch = []
+            while self.messages:
+                batch.append(self.messages.popleft())
+            if not batch:
+                return
+            try:
+                self.handle_batch(batch)
+            except Exception:
+                log.exception("Failed to handle %d queued messages", len(batch))
+
+
+def get_sqs_messages(event: dict[str, Any]) -> list[tuple[str, Message]]:
+    """The id and decoded body of each message in an SQS event"""
+    return [
+        (record["messageId"], json.loads(record["body"])) for record in event["Records"]
+    ]
+
+
+def make_batch_response(failed_ids: list[str]) -> dict[str, Any]:
+    """Lambda response reporting only the messages which failed, to be retried"""
+    return {"batchItemFailures": [{"itemIdentifier": id} for id in failed_ids]}
+
+
+def make_queue(url: str | None, handle_batch: BatchHandler) -> Queue:
+    """The SQS queue at `url`, or without one a LocalQueue handling the batches"""
+    if url:
+        return SQSQueue(url)
+    return LocalQueue(handle_batch)
+
+
+def make_sqs_handler(
+    handle_batch: BatchHandler,
+) -> Callable[[dict[str, Any], Any], dict[str, Any]]:
+    """A Lambda handler for the batches of SQS messages a queue triggers it with"""
+
+    def handle_sqs_event(event: dict[str, Any], context: Any) -> dict[str, Any]:
+        """Lambda handler for a batch of SQS messages, only the messages which
+        failed are reported back to be retried."""
+        messages = get_sqs_messages(event)
+        failed = handle_batch([message for _, message in messages])
+        return make_batch_response([messages[i][0] for i in failed])
+
+    return handle_sqs_event
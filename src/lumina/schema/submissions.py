@@ -1,20 +1,26 @@
 import datetime
-from uuid import UUID
+from typing import TYPE_CHECKING
+from uuid import UUID, uuid4
 
 import lumina.github.submissions
 import lumina.github.util
-from github.Issue import Issue
 from lumina.database.models import (
     GitHubIssueState,
     MemberModel,
+    PendingSubmissionModel,
+    SubmissionDraftModel,
     SubmissionModel,
+    SubmissionStatsModel,
     SubmitterModel,
 )
-from lumina.database.table import get_submission_sk
+from lumina.database.table import get_pending_submission_sk, get_submission_sk
 from lumina.schema.base import LuminaModel
 from lumina.util import dates
 from pydantic import EmailStr, Field
 
+if TYPE_CHECKING:
+    from github.Issue import Issue
+
 FIELD_SUBMITTER_ID = Field(description="The ID of the submitter", example="fred_bloggs")
 FIELD_SUBMITTER_NAME = Field(
     description="The name of the submitter", example="Fred Bloggs"
@@ -103,7 +109,7 @@ class GenericSubmissionRequest(BaseSubmissionRequest):
         submission_id: int,
         submitter_id: str | UUID,
         member: MemberModel | None,
-        github_issue: Issue,
+        github_issue: "Issue",
     ) -> SubmissionModel:
         return SubmissionModel(
             pk=str(submitter_id),
@@ -119,6 +125,24 @@ class GenericSubmissionRequest(BaseSubmissionRequest):
             github_issue=lumina.github.submissions.make_issue_model(github_issue),
         )
 
+    def to_pending_model(
+        self, *, submitter_id: str | UUID, member: MemberModel | None
+    ) -> PendingSubmissionModel:
+        return PendingSubmissionModel(
+            pk=str(submitter_id),
+            sk=get_pending_submission_sk(uuid4()),
+            created_at=dates.now(),
+            draft=SubmissionDraftModel(
+                url=self.target_url,
+                target_id=self.target_id,
+                target_type=self.target_type,
+                target_name=self.target_name,
+                subject=self.subject,
+                message=self.message,
+                submitter=self.get_submitter_model(member),
+            ),
+        )
+
 
 class ShowSubmissionRequest(BaseSubmissionRequest):
     target_id: str | None = FIELD_TARGET_ID
@@ -187,5 +211,55 @@ class SubmissionResponse(LuminaModel):
         )
 
 
+class PendingSubmissionResponse(LuminaModel):
+    """A submission accepted but whose GitHub issue is still being created, it will
+    be listed with the member's submissions once it has been."""
+
+    id: UUID = Field(description="The ID of the pending submission")
+    submitter: SubmitterResponse = Field(
+        description="The submitter of the submission",
+    )
+    target_type: str = FIELD_TARGET_TYPE
+    target_id: str = FIELD_TARGET_ID
+    target_name: str = FIELD_TARGET_NAME
+    target_url: str = FIELD_TARGET_URL
+    subject: str | None = FIELD_SUBJECT
+    message: str | None = FIELD_MESSAGE
+
+    @classmethod
+    def from_model(cls, pending: PendingSubmissionModel) -> "PendingSubmissionResponse":
+        draft = pending.draft
+        return cls(
+            id=pending.id,
+            submitter=SubmitterResponse(
+                id=pending.pk,
+                verified=draft.submitter.verified,
+                name=draft.submitter.name,
+            ),
+            target_type=draft.target_type,
+            target_id=draft.target_id,
+            target_name=draft.target_name,
+            target_url=draft.url,
+            subject=draft.subject,
+            message=draft.message,
+        )
+
+
 class SubmissionStatsResponse(LuminaModel):
     count: int = Field(description="The number of submissions")
+    open: int = Field(description="The number of submissions with an open issue")
+    closed: int = Field(
+        description="The number of submissions with an issue closed without changes"
+    )
+    completed: int = Field(
+        description="The number of submissions with an issue closed as completed"
+    )
+
+    @classmethod
+    def from_model(cls, stats: SubmissionStatsModel) -> "SubmissionStatsResponse":
+        return cls(
+            count=stats.count,
+            open=stats.open,
+            closed=stats.closed,
+            completed=stats.completed,
+        )
@@ -1,14 +1,114 @@
-import functools
+import logging
+import threading
+import time
+from typing import TYPE_CHECKING
 
-import boto3
+from lumina import aws
 from lumina.config import settings
 
+if TYPE_CHECKING:
+    from mypy_boto3_ssm import SSMClient
+
+log = logging.getLogger(__name__)
+
+
+class ParameterStore:
+    """
+    Cache of SSM parameters.
+
+    On first use every parameter under `path` is fetched with GetParametersByPath,
+    rather than one GetParameter per name. Values are kept for `ttl` seconds, after
+    which the stale value is still returned while a refresh runs in the background,
+    so rotated secrets are picked up without a request ever waiting on SSM.
+    Parameters outside of `path` are fetched individually and cached the same way.
+    """
+
+    def __init__(self, path: str, ttl: float):
+        self.path = path
+        self.ttl = ttl
+        self._values: dict[str, str] = {}
+        self._loaded_at: float | None = None
+        self._lock = threading.Lock()
+        self._refresh_thread: threading.Thread | None = None
+
+    @property
+    def client(self) -> "SSMClient":
+        return aws.get_ssm_client()
+
+    def get(self, name: str) -> str:
+        if self._loaded_at is None:
+            with self._lock:
+                if self._loaded_at is None:
+                    self._load()
+        elif self.is_stale():
+            self.refresh_in_background()
+        value = self._values.get(name)
+        if value is None:
+            # Parameters outside the path, or created since the last load. Under the
+            # lock, so a refresh doesn't replace the values while we add to them.
+            with self._lock:
+                value = self._values.get(name)
+                if value is None:
+                    value = self._values[name] = self._fetch_one(name)
+        return value
+
+    def is_stale(self) -> bool:
+        return self._loaded_at is None or time.monotonic() - self._loaded_at > self.ttl
+
+    def refresh(self) -> None:
+        """Fetch all parameters again, replacing the cached values."""
+        with self._lock:
+            self._load()
+
+    def refresh_in_background(self) -> threading.Thread:
+        """Start a refresh unless one is already running."""
+        with self._lock:
+            if self._refresh_thread is None or not self._refresh_thread.is_alive():
+                self._refresh_thread = threading.Thread(
+                    target=self._refresh_quietly, daemon=True
+                )
+                self._refresh_thread.start()
+            return self._refresh_thread
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values = {}
+            self._loaded_at = None
+
+    def _refresh_quietly(self) -> None:
+        try:
+            self.refresh()
+        except Exception:
+            # Keep serving the stale values, we'll try again on the next get
+            log.exception("Could not refresh parameters from SSM")
+
+    def _load(self) -> None:
+        values = {}
+        paginator = self.client.get_paginator("get_parameters_by_path")
+        for page in paginator.paginate(
+            Path=self.path, Recursive=True, WithDecryption=True
+        ):
+            for parameter in page["Parameters"]:
+                values[parameter["Name"]] = parameter["Value"]
+        # Keep parameters outside the path, they are re-fetched individually
+        for name in self._values.keys() - values.keys():
+            if not name.startswith(self.path):
+                values[name] = self._fetch_one(name)
+        self._values = values
+        self._loaded_at = time.monotonic()
+
+    def _fetch_one(self, name: str) -> str:
+        try:
+            response = self.client.get_parameter(Name=name, WithDecryption=True)
+        except self.client.exceptions.ParameterNotFound as e:
+            raise ValueError(f"Parameter {name} not found") from e
+        return response["Parameter"]["Value"]
+
+
+parameter_store = ParameterStore(
+    path=settings.ssm_parameter_path, ttl=settings.ssm_parameter_ttl
+)
+
 
-@functools.lru_cache
 def get_parameter(name: str) -> str:
-    ssm_client = boto3.client("ssm", region_name=settings.aws_region)
-    try:
-        response = ssm_client.get_parameter(Name=name, WithDecryption=True)
-    except ssm_client.exceptions.ParameterNotFound as e:
-        raise ValueError(f"Parameter {name} not found") from e
-    return response["Parameter"]["Value"]
+    return parameter_store.get(name)
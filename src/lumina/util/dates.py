@@ -3,3 +3,9 @@ import datetime
 
 def now() -> datetime.datetime:
     return datetime.datetime.now(datetime.timezone.utc)
+
+
+def as_utc(value: datetime.datetime) -> datetime.datetime:
+    """Make a naive datetime, taken to be in UTC, aware. PyGithub gives naive
+    datetimes, as did submissions stored from its issues."""
+    return value if value.tzinfo else value.replace(tzinfo=datetime.timezone.utc)
@@ -0,0 +1,31 @@
+import itertools
+from collections.abc import Iterable, Iterator
+
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+
+def iter_json_array(models: Iterable[BaseModel]) -> Iterator[bytes]:
+    """Serialise models as a JSON array, one model at a time."""
+    yield b"["
+    for i, model in enumerate(models):
+        if i:
+            yield b","
+        yield model.model_dump_json(by_alias=True).encode()
+    yield b"]"
+
+
+def stream_json_array(models: Iterable[BaseModel]) -> StreamingResponse:
+    """
+    Stream models as a JSON array without building the whole list in memory.
+
+    The first model is fetched before the response starts, so errors getting it (the
+    most likely time for one, e.g. the database being unavailable) are raised here
+    rather than leaving a truncated body behind a 200 status.
+    """
+    models = iter(models)
+    first = list(itertools.islice(models, 1))
+    return StreamingResponse(
+        iter_json_array(itertools.chain(first, models)),
+        media_type="application/json",
+    )
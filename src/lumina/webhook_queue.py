@@ -0,0 +1,104 @@
+"""
+Deferred handling of GitHub webhooks.
+
+With settings.webhook_deferred the endpoint only verifies a webhook and queues the
+snapshot of its issue, so GitHub gets its response well within its ten second
+timeout. The consumer handles messages in batches, events for the same issue are
+coalesced so only the newest snapshot is written.
+
+In AWS the queue is SQS and the consumer a Lambda it triggers, see
+webhook_worker.py and lumina.queues.
+"""
+import functools
+import logging
+from typing import NamedTuple
+
+import lumina.database.operations
+from lumina import queues
+from lumina.config import settings
+from lumina.database.models import GitHubIssueModel
+from lumina.github import webhooks
+
+log = logging.getLogger(__name__)
+
+
+class WebhookEvent(NamedTuple):
+    issue: GitHubIssueModel
+    delivery: str | None
+
+
+def make_message(issue: GitHubIssueModel, delivery: str | None) -> queues.Message:
+    return {"delivery": delivery, "issue": issue.model_dump(mode="json")}
+
+
+def parse_message(message: queues.Message) -> WebhookEvent:
+    return WebhookEvent(
+        issue=GitHubIssueModel.model_validate(message["issue"]),
+        delivery=message.get("delivery"),
+    )
+
+
+def enqueue(event: str | None, body: bytes, delivery: str | None = None) -> bool:
+    """Queue the issue from a verified webhook, returns whether it was an event we
+    handle."""
+    issue = webhooks.parse_webhook_issue(event, body)
+    if issue is None:
+        return False
+    get_queue().send(make_message(webhooks.make_issue_snapshot(issue), delivery))
+    return True
+
+
+def handle_issue_events(events: list[WebhookEvent]) -> None:
+    """
+    Write the newest snapshot from events for one issue. Deliveries already handled
+    are skipped, if the write fails the rest are forgotten so their retries aren't.
+    """
+    recorded: list[str] = []
+    try:
+        new_events = []
+        for event in events:
+            if event.delivery is None:
+                new_events.append(event)
+            elif lumina.database.operations.put_webhook_delivery(event.delivery):
+                recorded.append(event.delivery)
+                new_events.append(event)
+        if not new_events:
+            return
+        # Of events updated in the same second the last received is newest, max
+        # keeps the first of equal keys so look from the end
+        newest = max(reversed(new_events), key=lambda e: e.issue.updated_at)
+        webhooks.update_issue_snapshot(newest.issue)
+    except Exception:
+        for delivery in recorded:
+            lumina.database.operations.delete_webhook_delivery(delivery)
+        raise
+
+
+def handle_messages(messages: list[queues.Message]) -> list[int]:
+    """Handle a batch of messages, one write per issue, returns the indexes of the
+    messages which failed."""
+    failed = []
+    by_issue: dict[int, list[tuple[int, WebhookEvent]]] = {}
+    for i, message in enumerate(messages):
+        try:
+            event = parse_message(message)
+        except Exception:
+            log.exception("Failed to parse webhook message %s", message)
+            failed.append(i)
+            continue
+        by_issue.setdefault(event.issue.number, []).append((i, event))
+    for number, indexed_events in by_issue.items():
+        try:
+            handle_issue_events([event for _, event in indexed_events])
+        except Exception:
+            log.exception("Failed to handle webhooks for issue %d", number)
+            failed.extend(i for i, _ in indexed_events)
+    return sorted(failed)
+
+
+@functools.lru_cache
+def get_queue() -> queues.Queue:
+    return queues.make_queue(settings.webhook_queue_url, handle_messages)
+
+
+handle_sqs_event = queues.make_sqs_handler(handle_messages)
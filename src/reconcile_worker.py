@@ -0,0 +1,8 @@
+from sentry import init_sentry
+
+# Initialize Sentry, want to do as early as possible
+init_sentry()
+
+from lumina.github.reconcile import handle_scheduled_event  # noqa: E402
+
+handler = handle_scheduled_event
@@ -0,0 +1,8 @@
+from sentry import init_sentry
+
+# Initialize Sentry, want to do as early as possible
+init_sentry()
+
+from lumina.webhook_queue import handle_sqs_event  # noqa: E402
+
+handler = handle_sqs_event
@@ -1,6 +1,17 @@
+import datetime
+import uuid
 from unittest.mock import MagicMock
 
-from lumina.database.models import MemberModel
+from lumina.database import table
+from lumina.database.models import (
+    GitHubIssueModel,
+    MemberModel,
+    PendingSubmissionModel,
+    SubmissionDraftModel,
+    SubmissionModel,
+    SubmitterModel,
+)
+from lumina.util import dates
 
 MEMBER_MODEL_FRED_BLOGGS = MemberModel(
     pk="fred_bloggs",
@@ -13,8 +24,58 @@ GITHUB_ISSUE = MagicMock(
     html_url="https://github.com/newtheatre/lumina-test/issues/123",
     state="open",
     title="Test issue",
-    created_at="2020-01-01T00:00:00Z",
-    updated_at="2020-01-01T00:00:00Z",
+    # Naive, as PyGithub gives them
+    created_at=datetime.datetime(2020, 1, 1),  # noqa: DTZ001
+    updated_at=datetime.datetime(2020, 1, 1),  # noqa: DTZ001
     closed_at=None,
     comments=0,
 )
+
+
+def make_submission(id: int, **kwargs) -> SubmissionModel:
+    """Make a SubmissionModel with default values overridable by kwargs."""
+    return SubmissionModel(
+        pk="fred_bloggs",
+        sk=table.get_submission_sk(id),
+        url=f"https://github.com/newtheatre/history-project/issues/{id}",
+        target_id="00_01/romeo_and_juliet",
+        target_name="Romeo and Juliet",
+        target_type="show",
+        message="The part of Romeo was played by a hamster.",
+        created_at=dates.now(),
+        submitter=SubmitterModel(
+            id="fred_bloggs",
+            name="Fred Bloggs",
+            verified=True,
+        ),
+        github_issue=GitHubIssueModel(
+            number=id,
+            state="open",
+            title="Romeo and Juliet",
+            created_at=dates.now(),
+            updated_at=dates.now(),
+            closed_at=None,
+            comments=0,
+        ),
+    ).model_copy(update=kwargs)
+
+
+def make_pending_submission(**kwargs) -> PendingSubmissionModel:
+    """Make a PendingSubmissionModel with default values overridable by kwargs."""
+    return PendingSubmissionModel(
+        pk="fred_bloggs",
+        sk=table.get_pending_submission_sk(uuid.uuid4()),
+        created_at=dates.now(),
+        draft=SubmissionDraftModel(
+            url="https://history.newtheatre.org.uk/00_01/romeo_and_juliet",
+            target_id="00_01/romeo_and_juliet",
+            target_name="Romeo and Juliet",
+            target_type="show",
+            message="The part of Romeo was played by a hamster.",
+            submitter=SubmitterModel(
+                id="fred_bloggs",
+                name="Fred Bloggs",
+                verified=True,
+            ),
+        ),
+    ).model_copy(update=kwargs)
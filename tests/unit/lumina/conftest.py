@@ -2,6 +2,7 @@ from unittest import mock
 
 import pytest
 from fixtures import keys
+from lumina import auth
 
 
 @pytest.fixture()
@@ -11,4 +12,6 @@ def mock_keys():
     ), mock.patch(
         "lumina.auth.get_jwt_private_key", return_value=keys.EXAMPLE_PRIVATE_KEY
     ):
+        auth.verified_tokens.clear()
         yield
+        auth.verified_tokens.clear()
@@ -0,0 +1,43 @@
+import pytest
+from lumina.database.cursor import (
+    InvalidCursor,
+    check_start_key,
+    decode_cursor,
+    encode_cursor,
+)
+
+
+def test_round_trip():
+    key = {"pk": "fred_bloggs", "sk": "profile"}
+    assert decode_cursor(encode_cursor(key)) == key
+
+
+def test_url_safe():
+    cursor = encode_cursor({"pk": "?>?>?>", "sk": "profile"})
+    assert cursor.isascii()
+    assert not set(cursor) & set("+/=")
+
+
+@pytest.mark.parametrize(
+    "cursor", ["not a cursor", "bm90IGpzb24", "WzEsIDJd", "eyJwayI6IDF9"]
+)
+def test_invalid(cursor):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(cursor)
+
+
+def test_check_start_key():
+    check_start_key({"pk": "fred_bloggs", "sk": "profile"}, ("pk", "sk"), sk="profile")
+
+
+@pytest.mark.parametrize(
+    "key",
+    [
+        {"pk": "fred_bloggs"},
+        {"pk": "fred_bloggs", "sk": "profile", "gsi": "x"},
+        {"pk": "fred_bloggs", "sk": "submission/1"},
+    ],
+)
+def test_check_start_key_invalid(key):
+    with pytest.raises(InvalidCursor):
+        check_start_key(key, ("pk", "sk"), sk="profile")
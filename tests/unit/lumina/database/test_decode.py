@@ -0,0 +1,80 @@
+import datetime
+import uuid
+from decimal import Decimal
+
+import pytest
+from fixtures.models import MEMBER_MODEL_FRED_BLOGGS, make_submission
+from lumina.database import decode
+from lumina.database.models import (
+    GitHubIssueState,
+    MemberConsentModel,
+    MemberModel,
+    SubmissionModel,
+)
+from lumina.util import dates
+
+
+def test_trusted_member_matches_validated():
+    member = MEMBER_MODEL_FRED_BLOGGS.model_copy(
+        update={
+            "created_at": dates.now(),
+            "consent": MemberConsentModel(consent_news=dates.now()),
+            "anonymous_ids": [uuid.uuid4()],
+            "year_of_graduation": 1999,
+        }
+    )
+    item = member.ddict()
+    assert MemberModel.from_ddict(item) == MemberModel.from_ddict(item, trusted=False)
+    assert MemberModel.from_ddict(item) == member
+
+
+def test_trusted_submission_matches_validated():
+    submission = make_submission(101)
+    item = submission.ddict()
+    assert SubmissionModel.from_ddict(item) == SubmissionModel.from_ddict(
+        item, trusted=False
+    )
+    assert SubmissionModel.from_ddict(item) == submission
+
+
+def test_trusted_converts_dynamodb_types():
+    item = {
+        **make_submission(101).ddict(),
+        # Numbers come back from DynamoDB as Decimal
+        "github_issue": {
+            **make_submission(101).ddict()["github_issue"],
+            "number": Decimal(101),
+            "comments": Decimal(3),
+            "state": "completed",
+            "updated_at": "2020-01-02T03:04:05Z",
+        },
+    }
+    submission = SubmissionModel.from_ddict(item)
+    assert submission.github_issue.number == 101
+    assert type(submission.github_issue.comments) is int
+    assert submission.github_issue.state == GitHubIssueState.COMPLETED
+    assert submission.github_issue.updated_at == datetime.datetime(
+        2020, 1, 2, 3, 4, 5, tzinfo=datetime.timezone.utc
+    )
+
+
+def test_trusted_defaults_and_extra_attributes():
+    member = MemberModel.from_ddict(
+        {
+            "pk": "fred_bloggs",
+            "sk": "profile",
+            "name": "Fred Bloggs",
+            "email": "fred@bloggs.com",
+            "consent": None,
+            "gsi_only": "dropped",
+        }
+    )
+    assert member.consent is None
+    assert member.is_admin is False
+    assert member.profile_version == 0
+    assert "gsi_only" not in member.__dict__
+
+
+def test_unsupported_union():
+    with pytest.raises(TypeError):
+        decode.get_converter(int | str)
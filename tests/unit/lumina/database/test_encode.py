@@ -0,0 +1,75 @@
+import datetime
+import uuid
+from decimal import Decimal
+
+import pytest
+from fixtures.models import MEMBER_MODEL_FRED_BLOGGS, make_submission
+from lumina.database import encode
+from lumina.database.models import MemberConsentModel, MemberModel, SubmissionModel
+from pydantic import BaseModel
+
+NOW = datetime.datetime(2020, 1, 2, 3, 4, 5, 6, tzinfo=datetime.timezone.utc)
+
+
+def test_member():
+    anonymous_id = uuid.uuid4()
+    member = MEMBER_MODEL_FRED_BLOGGS.model_copy(
+        update={
+            "created_at": NOW,
+            "consent": MemberConsentModel(consent_news=NOW),
+            "anonymous_ids": [anonymous_id],
+        }
+    )
+    assert member.ddict() == {
+        "pk": "fred_bloggs",
+        "sk": "profile",
+        "name": "Fred Bloggs",
+        "email": "fred@bloggs.com",
+        "created_at": "2020-01-02T03:04:05.000006+00:00",
+        # None is omitted from nested models too
+        "consent": {"consent_news": "2020-01-02T03:04:05.000006+00:00"},
+        "anonymous_ids": [str(anonymous_id)],
+        "is_admin": False,
+        "profile_version": 0,
+    }
+
+
+def test_submission():
+    item = make_submission(101).ddict()
+    assert item["github_issue"]["state"] == "open"
+    assert item["github_issue"]["number"] == 101
+    assert "closed_at" not in item["github_issue"]
+    assert "subject" not in item
+
+
+@pytest.mark.parametrize(
+    "model",
+    [
+        MEMBER_MODEL_FRED_BLOGGS.model_copy(
+            update={"created_at": NOW, "anonymous_ids": [uuid.uuid4()]}
+        ),
+        make_submission(101),
+    ],
+)
+def test_round_trip(model):
+    assert type(model).from_ddict(model.ddict(), trusted=False) == model
+    assert type(model).from_ddict(model.ddict()) == model
+
+
+def test_float():
+    class Measurement(BaseModel):
+        value: float
+        values: list[float]
+
+    assert encode.get_model_encoder(Measurement)(
+        Measurement(value=0.1, values=[1.5])
+    ) == {"value": Decimal("0.1"), "values": [Decimal("1.5")]}
+
+
+def test_models_are_compiled_once():
+    assert encode.get_model_encoder(MemberModel) is encode.get_model_encoder(
+        MemberModel
+    )
+    assert encode.get_model_encoder(SubmissionModel) is not encode.get_model_encoder(
+        MemberModel
+    )
@@ -0,0 +1,55 @@
+from unittest import mock
+
+import moto
+import pytest
+from fixtures.models import make_submission
+from lumina.database import migrations, operations, table
+from lumina.database.models import GitHubIssueState, SubmissionStatsModel
+
+
+@pytest.fixture(scope="function", autouse=True)
+def create_tables():
+    operations.submission_owners.clear()
+    operations.target_submissions.clear()
+    with moto.mock_dynamodb():
+        table.create_tables()
+        yield
+
+
+def test_backfill_submission_owners():
+    # Written directly, as submissions were before owner pointers existed
+    for id, pk in ((101, "fred_bloggs"), (102, "alice_froggs")):
+        table.get_member_table().put_item(Item=make_submission(id, pk=pk).ddict())
+    assert migrations.backfill_submission_owners() == 2
+    assert operations.get_submission_owner(101) == "fred_bloggs"
+    assert operations.get_submission_owner(102) == "alice_froggs"
+    # Running again is harmless
+    assert migrations.backfill_submission_owners() == 2
+
+
+def test_backfill_submission_stats():
+    for id, pk in ((101, "fred_bloggs"), (102, "fred_bloggs"), (103, "alice_froggs")):
+        submission = make_submission(id, pk=pk)
+        if id == 102:
+            submission.github_issue.state = GitHubIssueState.COMPLETED
+        table.get_member_table().put_item(Item=submission.ddict())
+    # Two owners and one target
+    assert migrations.backfill_submission_stats() == 3
+    with mock.patch.object(
+        operations, "count_submission_stats", side_effect=AssertionError
+    ):
+        assert operations.get_member_submission_stats(
+            "fred_bloggs"
+        ) == SubmissionStatsModel(count=2, open=1, completed=1)
+        assert operations.get_target_submission_stats(
+            "show", "00_01/romeo_and_juliet"
+        ) == SubmissionStatsModel(count=3, open=2, completed=1)
+
+
+def test_backfill_submission_created_at():
+    table.get_member_table().put_item(Item=make_submission(101).ddict())
+    assert list(operations.iter_member_submissions("fred_bloggs")) == []
+    assert migrations.backfill_submission_created_at() == 1
+    assert [s.issue_id for s in operations.iter_member_submissions("fred_bloggs")] == [
+        101
+    ]
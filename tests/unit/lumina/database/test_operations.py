@@ -1,15 +1,19 @@
 import datetime
 import uuid
+from unittest import mock
 
 import freezegun
 import moto
 import pytest
+from fixtures.models import make_pending_submission, make_submission
 from lumina.database import operations, table
+from lumina.database.cursor import InvalidCursor
 from lumina.database.models import (
     GitHubIssueModel,
     GitHubIssueState,
+    MemberConsentModel,
     MemberModel,
-    SubmissionModel,
+    SubmissionStatsModel,
     SubmitterModel,
 )
 from lumina.util import dates
@@ -17,11 +21,26 @@ from lumina.util import dates
 
 @pytest.fixture(scope="function", autouse=True)
 def create_tables():
+    operations.submission_owners.clear()
+    operations.target_submissions.clear()
+    operations.webhook_deliveries.clear()
     with moto.mock_dynamodb():
         table.create_tables()
         yield
 
 
+def newer_issue(
+    issue: GitHubIssueModel, seconds: int = 1, **update
+) -> GitHubIssueModel:
+    """Copy the issue as if updated later, older updates aren't applied"""
+    return issue.model_copy(
+        update={
+            "updated_at": issue.updated_at + datetime.timedelta(seconds=seconds),
+            **update,
+        }
+    )
+
+
 @pytest.fixture()
 def fred_bloggs() -> MemberModel:
     return operations.put_member(
@@ -47,10 +66,117 @@ def test_get_members_empty():
 
 def test_get_members_one(fred_bloggs):
     # Put a submission to ensure we don't get it back
-    operations.put_submission(_make_submission(101))
+    operations.put_submission(make_submission(101))
     assert operations.get_members() == [fred_bloggs]
 
 
+def test_iter_members_paginates():
+    for i in range(5):
+        operations.put_member(
+            MemberModel(pk=f"member_{i}", name=f"Member {i}", email="m@bloggs.com")
+        )
+    with mock.patch.object(
+        table.get_member_table(), "query", wraps=table.get_member_table().query
+    ) as mock_query:
+        members = list(operations.iter_members(page_size=2))
+    assert sorted(m.pk for m in members) == [f"member_{i}" for i in range(5)]
+    assert mock_query.call_count == 3
+
+
+def test_iter_members_projection(fred_bloggs):
+    fred_bloggs.phone = "01234567890"
+    fred_bloggs.year_of_graduation = 2001
+    operations.put_member(fred_bloggs)
+    [member] = operations.iter_members(projection=["year_of_graduation"])
+    assert member.pk == fred_bloggs.pk
+    assert member.name == fred_bloggs.name
+    assert member.year_of_graduation == 2001
+    assert member.phone is None
+
+
+def _put_members(count: int) -> None:
+    for i in range(count):
+        operations.put_member(
+            MemberModel(
+                pk=f"member_{i}",
+                name=f"Member {i}",
+                email="m@bloggs.com",
+                year_of_graduation=2000 + i,
+                email_verified_at=dates.now() if i % 2 else None,
+                consent=MemberConsentModel(consent_news=dates.now() if i < 2 else None),
+            )
+        )
+
+
+def test_get_members_page():
+    _put_members(5)
+    seen = []
+    members, next_key = operations.get_members_page(limit=2)
+    seen.extend(members)
+    assert len(members) == 2
+    while next_key:
+        members, next_key = operations.get_members_page(limit=2, start_key=next_key)
+        seen.extend(members)
+    assert sorted(m.pk for m in seen) == [f"member_{i}" for i in range(5)]
+
+
+def test_get_members_page_filtered_fills_page():
+    _put_members(5)
+    members, _ = operations.get_members_page(
+        limit=2, filter_expression=operations.get_member_filter(email_verified=True)
+    )
+    assert sorted(m.pk for m in members) == ["member_1", "member_3"]
+
+
+def test_get_members_page_selective_filter():
+    _put_members(40)
+    filter_expression = operations.get_member_filter(year_of_graduation_max=2003)
+    seen = []
+    with mock.patch.object(
+        operations, "get_member_table", wraps=operations.get_member_table
+    ) as get_member_table:
+        members, next_key = operations.get_members_page(
+            limit=10, filter_expression=filter_expression
+        )
+        seen.extend(members)
+        while next_key:
+            members, next_key = operations.get_members_page(
+                limit=10, start_key=next_key, filter_expression=filter_expression
+            )
+            seen.extend(members)
+    assert sorted(m.pk for m in seen) == [f"member_{i}" for i in range(4)]
+    # Each query reads a whole page, rather than as many as are left to fill it
+    assert get_member_table.call_count == 40 // 10
+
+
+@pytest.mark.parametrize(
+    "filters,expected",
+    [
+        ({"email_verified": True}, {"member_1", "member_3"}),
+        ({"email_verified": False}, {"member_0", "member_2", "member_4"}),
+        ({"year_of_graduation_min": 2003}, {"member_3", "member_4"}),
+        ({"year_of_graduation_max": 2001}, {"member_0", "member_1"}),
+        (
+            {"year_of_graduation_min": 2001, "year_of_graduation_max": 2003},
+            {"member_1", "member_2", "member_3"},
+        ),
+        ({"consent_news": True}, {"member_0", "member_1"}),
+        ({"consent_news": False}, {"member_2", "member_3", "member_4"}),
+        ({"consent_news": True, "email_verified": True}, {"member_1"}),
+    ],
+)
+def test_iter_members_filtered(filters, expected):
+    _put_members(5)
+    members = operations.iter_members(
+        filter_expression=operations.get_member_filter(**filters)
+    )
+    assert {m.pk for m in members} == expected
+
+
+def test_get_member_filter_none():
+    assert operations.get_member_filter() is None
+
+
 def test_get_member_exists(fred_bloggs):
     assert fred_bloggs == operations.get_member(id="fred_bloggs")
 
@@ -78,49 +204,60 @@ def test_set_member_email_verified(fred_bloggs):
     )
 
 
+def test_get_member_profile_version(fred_bloggs):
+    assert operations.get_member_profile_version(fred_bloggs.pk) == 1
+
+
+def test_get_member_profile_version_not_found():
+    with pytest.raises(operations.ResultNotFound):
+        operations.get_member_profile_version("alice_froggs")
+
+
+def test_set_member_email_verified_bumps_profile_version(fred_bloggs):
+    operations.member_versions.put(fred_bloggs.pk, fred_bloggs.profile_version)
+    member = operations.set_member_email_verified(fred_bloggs.pk)
+    assert member.email_verified
+    assert member.profile_version == fred_bloggs.profile_version + 1
+    assert operations.get_member(fred_bloggs.pk) == member
+    assert operations.member_versions.get(fred_bloggs.pk) is None
+
+
+def test_put_member_bumps_profile_version(fred_bloggs):
+    operations.put_member(fred_bloggs.model_copy(update={"phone": "01234567890"}))
+    operations.member_versions.put(fred_bloggs.pk, 2)
+    member = operations.put_member(fred_bloggs.model_copy(update={"is_admin": True}))
+    assert member.is_admin
+    assert member.phone is None
+    assert member.profile_version == fred_bloggs.profile_version + 2
+    assert operations.get_member(fred_bloggs.pk) == member
+    assert operations.member_versions.get(fred_bloggs.pk) is None
+
+
 def test_delete_member_exists(fred_bloggs):
     operations.delete_member(id=fred_bloggs.pk)
     with pytest.raises(operations.ResultNotFound):
         operations.get_member(id=fred_bloggs.pk)
 
 
-def _make_submission(id: int, **kwargs) -> SubmissionModel:
-    """Make a SubmissionModel with default values overridable by kwargs."""
-    return SubmissionModel(
-        pk="fred_bloggs",
-        sk=table.get_submission_sk(id),
-        url=f"https://github.com/newtheatre/history-project/issues/{id}",
-        target_id="00_01/romeo_and_juliet",
-        target_name="Romeo and Juliet",
-        target_type="show",
-        message="The part of Romeo was played by a hamster.",
-        created_at=dates.now(),
-        submitter=SubmitterModel(
-            id="fred_bloggs",
-            name="Fred Bloggs",
-            verified=True,
-        ),
-        github_issue=GitHubIssueModel(
-            number=id,
-            state="open",
-            title="Romeo and Juliet",
-            created_at=dates.now(),
-            updated_at=dates.now(),
-            closed_at=None,
-            comments=0,
-        ),
-    ).model_copy(update=kwargs)
+def test_put_member_create_only(fred_bloggs):
+    operations.delete_member(fred_bloggs.pk)
+    assert operations.put_member(fred_bloggs, create_only=True) == fred_bloggs
+    with pytest.raises(operations.ResultAlreadyExists):
+        operations.put_member(
+            fred_bloggs.model_copy(update={"name": "Imposter"}), create_only=True
+        )
+    assert operations.get_member(fred_bloggs.pk).name == fred_bloggs.name
 
 
 def test_put_member_submission():
-    create_submission = operations.put_submission(_make_submission(101))
+    create_submission = operations.put_submission(make_submission(101))
     assert create_submission.pk == "fred_bloggs"
     assert create_submission.sk == "submission/101"
 
 
 def test_put_anonymous_submission():
     create_submission = operations.put_submission(
-        _make_submission(
+        make_submission(
             101,
             pk=table.PK_ANONYMOUS,
             submitter=SubmitterModel(
@@ -135,20 +272,44 @@ def test_put_anonymous_submission():
 
 
 def test_get_submission(fred_bloggs):
-    create_submission = operations.put_submission(_make_submission(101))
+    create_submission = operations.put_submission(make_submission(101))
     get_submission = operations.get_submission(101)
     assert create_submission == get_submission
 
 
+def test_put_submission_writes_owner_pointer():
+    operations.put_submission(make_submission(101, pk="alice_froggs"))
+    pointer = table.get_member_table().get_item(
+        Key=table.get_submission_owner_key(101)
+    )["Item"]
+    assert pointer[table.SUBMISSION_OWNER_ATTRIBUTE] == "alice_froggs"
+
+
+def test_get_submission_does_not_query():
+    operations.put_submission(make_submission(101))
+    with mock.patch.object(
+        operations, "query_submission_by_sk", side_effect=AssertionError
+    ):
+        assert operations.get_submission(101).pk == "fred_bloggs"
+
+
+def test_get_submission_without_owner_pointer():
+    # Submissions written before owner pointers existed are found through the index
+    submission = make_submission(101, pk="alice_froggs")
+    table.get_member_table().put_item(Item=submission.ddict())
+    assert operations.get_submission_owner(101) == "alice_froggs"
+    assert operations.get_submission(101) == submission
+
+
 def test_get_submission_not_found():
     with pytest.raises(operations.ResultNotFound):
         operations.get_submission(101)
 
 
 def test_get_submissions_for_member(fred_bloggs):
-    sub_1 = operations.put_submission(_make_submission(101, pk=fred_bloggs.pk))
-    sub_2 = operations.put_submission(_make_submission(102, pk=fred_bloggs.pk))
-    operations.put_submission(_make_submission(103, pk="alice_froggs"))
+    sub_1 = operations.put_submission(make_submission(101, pk=fred_bloggs.pk))
+    sub_2 = operations.put_submission(make_submission(102, pk=fred_bloggs.pk))
+    operations.put_submission(make_submission(103, pk="alice_froggs"))
     submissions = operations.get_submissions_for_member(fred_bloggs.pk)
     assert len(submissions) == 2
     assert sub_1 in submissions
@@ -160,18 +321,94 @@ def test_get_submissions_for_member_no_submissions(fred_bloggs):
     assert len(submissions) == 0
 
 
+def test_get_submissions_for_member_paginates(fred_bloggs):
+    for i in range(3):
+        operations.put_submission(make_submission(i, pk=fred_bloggs.pk))
+    query = table.get_member_table().query
+    with mock.patch.object(
+        table.get_member_table(),
+        "query",
+        side_effect=lambda **options: query(**options, Limit=1),
+    ):
+        assert len(operations.get_submissions_for_member(fred_bloggs.pk)) == 3
+
+
+def _put_dated_submissions(pk: str) -> None:
+    for id, day in ((101, 2), (102, 3), (103, 1)):
+        operations.put_submission(
+            make_submission(
+                id,
+                pk=pk,
+                created_at=datetime.datetime(
+                    2020, 1, day, tzinfo=datetime.timezone.utc
+                ),
+            )
+        )
+
+
+def test_iter_member_submissions_newest_first(fred_bloggs):
+    _put_dated_submissions(fred_bloggs.pk)
+    operations.put_submission(make_submission(104, pk="alice_froggs"))
+    assert [
+        s.issue_id
+        for s in operations.iter_member_submissions(fred_bloggs.pk, page_size=2)
+    ] == [102, 101, 103]
+
+
+def test_get_member_submissions_page(fred_bloggs):
+    _put_dated_submissions(fred_bloggs.pk)
+    submissions, next_key = operations.get_member_submissions_page(
+        fred_bloggs.pk, limit=2
+    )
+    assert [s.issue_id for s in submissions] == [102, 101]
+    assert next_key
+    submissions, next_key = operations.get_member_submissions_page(
+        fred_bloggs.pk, limit=2, start_key=next_key
+    )
+    assert [s.issue_id for s in submissions] == [103]
+    assert next_key is None
+
+
+def test_get_member_submissions_page_invalid_start_key(fred_bloggs):
+    _put_dated_submissions(fred_bloggs.pk)
+    _, next_key = operations.get_member_submissions_page(fred_bloggs.pk, limit=1)
+    assert next_key
+    for start_key in (
+        {"pk": fred_bloggs.pk, "sk": "profile"},
+        {**next_key, "pk": "alice_bloggs"},
+    ):
+        with pytest.raises(InvalidCursor):
+            operations.get_member_submissions_page(
+                fred_bloggs.pk, limit=1, start_key=start_key
+            )
+    with pytest.raises(InvalidCursor):
+        operations.get_members_page(limit=1, start_key=next_key)
+
+
+def test_moved_submissions_are_listed(fred_bloggs):
+    anonymous_id = uuid.uuid4()
+    operations.put_submission(make_submission(101, pk=str(anonymous_id)))
+    operations.move_anonymous_submissions_to_member(
+        member_id=fred_bloggs.pk, anonymous_id=anonymous_id
+    )
+    assert [s.issue_id for s in operations.iter_member_submissions(fred_bloggs.pk)] == [
+        101
+    ]
+    assert list(operations.iter_member_submissions(anonymous_id)) == []
+
+
 def test_get_submissions_for_target():
     show_submission_1 = operations.put_submission(
-        _make_submission(99, target_type="show", target_id="00_01/romeo_and_juliet")
+        make_submission(99, target_type="show", target_id="00_01/romeo_and_juliet")
     )
     show_submission_2 = operations.put_submission(
-        _make_submission(101, target_type="show", target_id="00_01/romeo_and_juliet")
+        make_submission(101, target_type="show", target_id="00_01/romeo_and_juliet")
     )
     operations.put_submission(
-        _make_submission(102, target_type="show", target_id="02_03/east")
+        make_submission(102, target_type="show", target_id="02_03/east")
     )
     operations.put_submission(
-        _make_submission(103, target_type="person", target_id="fred_bloggs")
+        make_submission(103, target_type="person", target_id="fred_bloggs")
     )
     submissions = operations.get_submissions_for_target(
         target_type="show", target_id="00_01/romeo_and_juliet"
@@ -181,20 +418,290 @@ def test_get_submissions_for_target():
     assert show_submission_2 in submissions
 
 
+def test_put_submission_already_exists():
+    operations.put_submission(make_submission(101))
+    with pytest.raises(operations.ResultAlreadyExists):
+        operations.put_submission(make_submission(101, pk="alice_froggs"))
+    assert operations.get_member_submission_stats("fred_bloggs").count == 1
+    assert operations.get_member_submission_stats("alice_froggs").count == 0
+
+
+def test_submission_stats():
+    operations.put_submission(make_submission(101))
+    # Seeds the counters, which later writes add to
+    operations.get_member_submission_stats("fred_bloggs")
+    operations.get_target_submission_stats("show", "00_01/romeo_and_juliet")
+    operations.put_submission(make_submission(102, target_id="02_03/east"))
+    operations.put_submission(make_submission(103, pk="alice_froggs"))
+    with mock.patch.object(
+        operations, "count_submission_stats", side_effect=AssertionError
+    ):
+        assert operations.get_member_submission_stats(
+            "fred_bloggs"
+        ) == SubmissionStatsModel(count=2, open=2)
+        assert operations.get_target_submission_stats(
+            "show", "00_01/romeo_and_juliet"
+        ) == SubmissionStatsModel(count=2, open=2)
+
+
+def test_submission_stats_none():
+    assert operations.get_member_submission_stats(
+        "fred_bloggs"
+    ) == SubmissionStatsModel(count=0)
+    assert operations.get_target_submission_stats(
+        "show", "00_01/romeo_and_juliet"
+    ) == SubmissionStatsModel(count=0)
+    # Unknown ids don't leave counters behind
+    for pk in ("fred_bloggs", table.get_target_pk("show", "00_01/romeo_and_juliet")):
+        assert "Item" not in table.get_member_table().get_item(
+            Key=table.get_submission_stats_key(pk)
+        )
+
+
+def test_submission_stats_counted_without_counters():
+    # Written directly, as submissions were before counters were kept
+    for id, state in (
+        (101, GitHubIssueState.OPEN),
+        (102, GitHubIssueState.CLOSED),
+        (103, GitHubIssueState.COMPLETED),
+    ):
+        submission = make_submission(id)
+        submission.github_issue.state = state
+        table.get_member_table().put_item(Item=submission.ddict())
+    expected = SubmissionStatsModel(count=3, open=1, closed=1, completed=1)
+    assert operations.get_member_submission_stats("fred_bloggs") == expected
+    assert (
+        operations.get_target_submission_stats("show", "00_01/romeo_and_juliet")
+        == expected
+    )
+    # Counters are created by the count, so aren't counted again
+    with mock.patch.object(
+        operations, "count_submission_stats", side_effect=AssertionError
+    ):
+        assert operations.get_member_submission_stats("fred_bloggs") == expected
+
+
+def test_submission_stats_not_seeded_by_writes():
+    submission = operations.put_submission(make_submission(101))
+    operations.update_submission_github_issue(
+        101, newer_issue(submission.github_issue, state=GitHubIssueState.CLOSED)
+    )
+    # Adding to missing counters would have created them with only the deltas
+    for pk in ("fred_bloggs", table.get_target_pk("show", "00_01/romeo_and_juliet")):
+        assert "Item" not in table.get_member_table().get_item(
+            Key=table.get_submission_stats_key(pk)
+        )
+    expected = SubmissionStatsModel(count=1, open=0, closed=1)
+    assert operations.get_member_submission_stats("fred_bloggs") == expected
+    operations.put_submission(make_submission(102))
+    with mock.patch.object(
+        operations, "count_submission_stats", side_effect=AssertionError
+    ):
+        assert operations.get_member_submission_stats(
+            "fred_bloggs"
+        ) == SubmissionStatsModel(count=2, open=1, closed=1)
+
+
+def test_update_submission_github_issue_moves_stats():
+    new_submission = operations.put_submission(make_submission(101))
+    operations.update_submission_github_issue(
+        101,
+        newer_issue(new_submission.github_issue, state=GitHubIssueState.COMPLETED),
+    )
+    expected = SubmissionStatsModel(count=1, open=0, completed=1)
+    assert operations.get_member_submission_stats("fred_bloggs") == expected
+    assert (
+        operations.get_target_submission_stats("show", "00_01/romeo_and_juliet")
+        == expected
+    )
+    # Updating without changing state leaves the stats alone
+    operations.update_submission_github_issue(
+        101,
+        newer_issue(
+            new_submission.github_issue,
+            seconds=2,
+            state=GitHubIssueState.COMPLETED,
+            comments=3,
+        ),
+        return_model=False,
+    )
+    assert operations.get_member_submission_stats("fred_bloggs") == expected
+
+
+def test_update_submission_github_issue_state_changed_meanwhile():
+    submission = operations.put_submission(make_submission(101))
+    operations.get_member_submission_stats("fred_bloggs")
+    stale = operations.get_submission_item("fred_bloggs", 101)
+    # Another webhook closes the issue after we read it open
+    closed = newer_issue(submission.github_issue, state=GitHubIssueState.CLOSED)
+    operations.update_submission_github_issue(101, closed)
+    get_submission_item = operations.get_submission_item
+    reads = iter([stale])
+    with mock.patch.object(
+        operations,
+        "get_submission_item",
+        side_effect=lambda *args: next(reads, None) or get_submission_item(*args),
+    ):
+        operations.update_submission_github_issue(
+            101, newer_issue(closed, state=GitHubIssueState.COMPLETED)
+        )
+    # Moved from the state it was in, not the one read
+    assert operations.get_member_submission_stats(
+        "fred_bloggs"
+    ) == SubmissionStatsModel(count=1, open=0, closed=0, completed=1)
+
+
+def test_delete_submission():
+    operations.put_submission(make_submission(101))
+    operations.put_submission(make_submission(102))
+    operations.delete_submission(101)
+    with pytest.raises(operations.ResultNotFound):
+        operations.get_submission(101)
+    assert operations.get_submission(102)
+    expected = SubmissionStatsModel(count=1, open=1)
+    assert operations.get_member_submission_stats("fred_bloggs") == expected
+    assert (
+        operations.get_target_submission_stats("show", "00_01/romeo_and_juliet")
+        == expected
+    )
+
+
+def test_put_pending_submission():
+    pending = operations.put_pending_submission(make_pending_submission())
+    assert operations.get_pending_submission("fred_bloggs", pending.id) == pending
+    with pytest.raises(operations.ResultAlreadyExists):
+        operations.put_pending_submission(pending)
+
+
+def test_pending_submissions_are_not_listed(fred_bloggs):
+    operations.put_pending_submission(make_pending_submission())
+    assert operations.get_submissions_for_member("fred_bloggs") == []
+    assert operations.get_submissions_for_target("show", "00_01/romeo_and_juliet") == []
+    assert operations.get_members() == [fred_bloggs]
+
+
+def test_get_pending_submission_not_found():
+    with pytest.raises(operations.ResultNotFound):
+        operations.get_pending_submission("fred_bloggs", uuid.uuid4())
+
+
+def test_claim_pending_submission():
+    pending = operations.put_pending_submission(make_pending_submission())
+    until = dates.now() + datetime.timedelta(minutes=2)
+    assert operations.claim_pending_submission("fred_bloggs", pending.id, until)
+    assert not operations.claim_pending_submission("fred_bloggs", pending.id, until)
+    with freezegun.freeze_time(until + datetime.timedelta(seconds=1)):
+        assert operations.claim_pending_submission(
+            "fred_bloggs", pending.id, dates.now() + datetime.timedelta(minutes=2)
+        )
+
+
+def test_claim_pending_submission_not_found():
+    assert not operations.claim_pending_submission(
+        "fred_bloggs", uuid.uuid4(), dates.now()
+    )
+
+
+def test_set_pending_submission_issue():
+    pending = operations.put_pending_submission(make_pending_submission())
+    issue = make_submission(101).github_issue
+    operations.set_pending_submission_issue("fred_bloggs", pending.id, issue)
+    assert (
+        operations.get_pending_submission("fred_bloggs", pending.id).github_issue
+        == issue
+    )
+    with pytest.raises(operations.ResultNotFound):
+        operations.set_pending_submission_issue("fred_bloggs", uuid.uuid4(), issue)
+
+
+def test_complete_pending_submission():
+    pending = operations.put_pending_submission(make_pending_submission())
+    submission = pending.to_submission(make_submission(101).github_issue)
+    operations.complete_pending_submission(pending, submission)
+    assert operations.get_submission(101) == submission
+    with pytest.raises(operations.ResultNotFound):
+        operations.get_pending_submission("fred_bloggs", pending.id)
+    assert operations.get_member_submission_stats(
+        "fred_bloggs"
+    ) == SubmissionStatsModel(count=1, open=1)
+    with pytest.raises(operations.ResultAlreadyExists):
+        operations.complete_pending_submission(pending, submission)
+    assert operations.get_member_submission_stats(
+        "fred_bloggs"
+    ) == SubmissionStatsModel(count=1, open=1)
+
+
+def test_complete_pending_submission_conflict():
+    pending = operations.put_pending_submission(make_pending_submission())
+    submission = pending.to_submission(make_submission(101).github_issue)
+    conflict = make_cancelled(None, None, None, "TransactionConflict", None)
+    client = table.get_member_table().meta.client
+    with mock.patch.object(
+        operations.transact, "write", side_effect=conflict
+    ), pytest.raises(client.exceptions.TransactionCanceledException):
+        operations.complete_pending_submission(pending, submission)
+    # Still pending, to be completed when retried
+    assert operations.get_pending_submission("fred_bloggs", pending.id)
+    operations.complete_pending_submission(pending, submission)
+    assert operations.get_submission(101) == submission
+
+
+def test_get_cached_submissions_for_target():
+    operations.put_submission(make_submission(101))
+    submissions = operations.get_cached_submissions_for_target(
+        "show", "00_01/romeo_and_juliet"
+    )
+    assert [s.issue_id for s in submissions] == [101]
+    with mock.patch.object(
+        operations, "get_submissions_for_target", side_effect=AssertionError
+    ):
+        assert (
+            operations.get_cached_submissions_for_target(
+                "show", "00_01/romeo_and_juliet"
+            )
+            == submissions
+        )
+
+
+def test_cached_submissions_for_target_invalidated_on_put():
+    operations.put_submission(make_submission(101))
+    operations.get_cached_submissions_for_target("show", "00_01/romeo_and_juliet")
+    operations.put_submission(make_submission(102))
+    assert [
+        s.issue_id
+        for s in operations.get_cached_submissions_for_target(
+            "show", "00_01/romeo_and_juliet"
+        )
+    ] == [101, 102]
+
+
+def test_cached_submissions_for_target_invalidated_on_issue_update():
+    new_submission = operations.put_submission(make_submission(101))
+    operations.get_cached_submissions_for_target("show", "00_01/romeo_and_juliet")
+    operations.update_submission_github_issue(
+        101,
+        newer_issue(new_submission.github_issue, comments=5),
+        return_model=False,
+    )
+    [submission] = operations.get_cached_submissions_for_target(
+        "show", "00_01/romeo_and_juliet"
+    )
+    assert submission.github_issue.comments == 5
+
+
 def test_update_submission_github_issue():
-    new_submission = operations.put_submission(_make_submission(101))
+    new_submission = operations.put_submission(make_submission(101))
     assert new_submission.github_issue.state == GitHubIssueState.OPEN
     assert new_submission.github_issue.closed_at is None
     assert new_submission.github_issue.comments == 0
     to_close_at = dates.now()
     operations.update_submission_github_issue(
         101,
-        new_submission.github_issue.model_copy(
-            update={
-                "state": GitHubIssueState.CLOSED,
-                "comments": 5,
-                "closed_at": to_close_at,
-            }
+        newer_issue(
+            new_submission.github_issue,
+            state=GitHubIssueState.CLOSED,
+            comments=5,
+            closed_at=to_close_at,
         ),
     )
     updated_submission = operations.get_submission(101)
@@ -203,20 +710,197 @@ def test_update_submission_github_issue():
     assert updated_submission.github_issue.comments == 5
 
 
+def test_update_submission_github_issue_returns_updated_model():
+    new_submission = operations.put_submission(make_submission(101))
+    issue = newer_issue(new_submission.github_issue, comments=5)
+    with mock.patch.object(
+        operations, "get_submission", side_effect=AssertionError
+    ), mock.patch.object(
+        operations, "query_submission_by_sk", side_effect=AssertionError
+    ):
+        updated_submission = operations.update_submission_github_issue(101, issue)
+    assert updated_submission == new_submission.model_copy(
+        update={"github_issue": issue}
+    )
+
+
+def test_update_submission_github_issue_without_model():
+    new_submission = operations.put_submission(make_submission(101))
+    issue = newer_issue(new_submission.github_issue, comments=5)
+    assert (
+        operations.update_submission_github_issue(101, issue, return_model=False)
+        is None
+    )
+    assert operations.get_submission(101).github_issue.comments == 5
+
+
+def test_update_submission_github_issue_not_found():
+    issue = make_submission(101).github_issue
+    with pytest.raises(operations.ResultNotFound):
+        operations.update_submission_github_issue(101, issue)
+    # No partial item is created
+    assert operations.get_submissions_for_member("fred_bloggs") == []
+
+
+def test_update_submission_github_issue_stale_owner():
+    new_submission = operations.put_submission(make_submission(101))
+    operations.submission_owners.put(101, "alice_froggs")
+    issue = newer_issue(new_submission.github_issue, comments=5)
+    updated_submission = operations.update_submission_github_issue(101, issue)
+    assert updated_submission.pk == "fred_bloggs"
+    assert updated_submission.github_issue.comments == 5
+    assert operations.get_submissions_for_member("alice_froggs") == []
+
+
+def make_cancelled(*codes: str | None) -> Exception:
+    client = table.get_member_table().meta.client
+    return client.exceptions.TransactionCanceledException(
+        {
+            "Error": {"Code": "TransactionCanceledException", "Message": ""},
+            "CancellationReasons": [{"Code": code or "None"} for code in codes],
+        },
+        "TransactWriteItems",
+    )
+
+
+def test_put_submission_conflict():
+    # Another submission updating the owner's counters at the same time
+    conflict = make_cancelled(None, None, "TransactionConflict", None)
+    client = table.get_member_table().meta.client
+    with mock.patch.object(
+        operations.transact, "write", side_effect=conflict
+    ), pytest.raises(client.exceptions.TransactionCanceledException):
+        operations.put_submission(make_submission(101))
+
+
+def test_update_submission_github_issue_outdated():
+    new_submission = operations.put_submission(make_submission(101))
+    issue = newer_issue(new_submission.github_issue, comments=5)
+    operations.update_submission_github_issue(101, issue)
+    # A redelivery, then an update from before the one applied
+    for outdated in (issue, newer_issue(issue, seconds=-1, comments=1)):
+        with pytest.raises(operations.ResultOutdated):
+            operations.update_submission_github_issue(101, outdated)
+    assert operations.get_submission(101).github_issue == issue
+    # Changed again within the same second
+    same_second = newer_issue(issue, seconds=0, comments=6)
+    operations.update_submission_github_issue(101, same_second)
+    assert operations.get_submission(101).github_issue == same_second
+
+
+def test_update_submission_github_issues():
+    submissions = [operations.put_submission(make_submission(i)) for i in (1, 2, 3)]
+    issues = [
+        newer_issue(submissions[0].github_issue, state=GitHubIssueState.COMPLETED),
+        submissions[1].github_issue,
+        newer_issue(submissions[2].github_issue, seconds=-1, comments=9),
+        # Not a submission
+        newer_issue(submissions[0].github_issue, number=404),
+    ]
+    operations.submission_owners.clear()
+    assert operations.update_submission_github_issues(issues) == [1]
+    assert operations.get_submission(1).github_issue == issues[0]
+    assert operations.get_submission(3).github_issue == submissions[2].github_issue
+    assert operations.get_member_submission_stats(
+        "fred_bloggs"
+    ) == SubmissionStatsModel(count=3, open=2, completed=1)
+    assert operations.get_target_submission_stats(
+        "show", "00_01/romeo_and_juliet"
+    ) == SubmissionStatsModel(count=3, open=2, completed=1)
+
+
+def test_update_submission_github_issues_many():
+    submissions = [operations.put_submission(make_submission(i)) for i in range(70)]
+    operations.get_member_submission_stats("fred_bloggs")
+    operations.get_target_submission_stats("show", "00_01/romeo_and_juliet")
+    issues = [
+        newer_issue(s.github_issue, state=GitHubIssueState.CLOSED) for s in submissions
+    ]
+    with mock.patch.object(
+        operations.transact, "write", wraps=operations.transact.write
+    ) as write:
+        assert sorted(operations.update_submission_github_issues(issues)) == list(
+            range(70)
+        )
+    assert write.call_count == 3
+    assert operations.get_member_submission_stats(
+        "fred_bloggs"
+    ) == SubmissionStatsModel(count=70, open=0, closed=70)
+
+
+def test_update_submission_github_issues_changed_meanwhile():
+    submission = operations.put_submission(make_submission(101))
+    read = operations.get_submission(101)
+    # A webhook lands between the batch read and write
+    webhook_issue = newer_issue(submission.github_issue, seconds=5, comments=2)
+    operations.update_submission_github_issue(101, webhook_issue)
+    batch_get_items = operations.batch_get_items
+    with mock.patch.object(
+        operations,
+        "batch_get_items",
+        side_effect=lambda keys: [read.ddict()]
+        if keys and keys[0]["sk"] == read.sk
+        else batch_get_items(keys),
+    ):
+        assert (
+            operations.update_submission_github_issues(
+                [newer_issue(submission.github_issue, comments=1)]
+            )
+            == []
+        )
+    assert operations.get_submission(101).github_issue == webhook_issue
+
+
+def test_github_issues_watermark():
+    assert operations.get_github_issues_watermark() is None
+    watermark = dates.now()
+    operations.put_github_issues_watermark(watermark)
+    assert operations.get_github_issues_watermark() == watermark
+
+
+def test_put_webhook_delivery():
+    assert operations.put_webhook_delivery("abc")
+    assert not operations.put_webhook_delivery("abc")
+    # Recorded in the table, not just this instance
+    operations.webhook_deliveries.clear()
+    assert not operations.put_webhook_delivery("abc")
+    assert operations.put_webhook_delivery("def")
+
+
+def test_put_webhook_delivery_expired():
+    with freezegun.freeze_time(dates.now() - datetime.timedelta(days=7)):
+        assert operations.put_webhook_delivery("abc")
+    operations.webhook_deliveries.clear()
+    # Expired, but not yet removed by DynamoDB
+    assert operations.put_webhook_delivery("abc")
+
+
+def test_delete_webhook_delivery():
+    operations.put_webhook_delivery("abc")
+    operations.delete_webhook_delivery("abc")
+    assert operations.put_webhook_delivery("abc")
+
+
 def test_move_anonymous_submissions_to_member(fred_bloggs):
     anonymous_id = uuid.uuid4()
     operations.put_submission(
-        _make_submission(
-            99, pk=anonymous_id, target_type="show", target_id="00_01/romeo_and_juliet"
+        make_submission(
+            99,
+            pk=str(anonymous_id),
+            target_type="show",
+            target_id="00_01/romeo_and_juliet",
         )
     )
     operations.put_submission(
-        _make_submission(
-            101, pk=anonymous_id, target_type="show", target_id="00_01/romeo_and_juliet"
+        make_submission(
+            101,
+            pk=str(anonymous_id),
+            target_type="show",
+            target_id="00_01/romeo_and_juliet",
         )
     )
     operations.put_submission(
-        _make_submission(
+        make_submission(
             102, pk="alice_froggs", target_type="show", target_id="02_03/east"
         )
     )
@@ -235,3 +919,101 @@ def test_move_anonymous_submissions_to_member(fred_bloggs):
     assert len(operations.get_submissions_for_member(fred_bloggs.pk)) == 2
     # There should be no anonymous submissions
     assert len(operations.get_submissions_for_member(anonymous_id)) == 0
+    # Owner pointers follow the moved submissions
+    assert operations.get_submission_owner(99) == fred_bloggs.pk
+    assert operations.get_submission(101).pk == fred_bloggs.pk
+
+
+def test_move_anonymous_submissions_removes_anonymous_id(fred_bloggs):
+    anonymous_id = uuid.uuid4()
+    other_anonymous_id = uuid.uuid4()
+    operations.put_member(
+        fred_bloggs.model_copy(
+            update={"anonymous_ids": [other_anonymous_id, anonymous_id]}
+        )
+    )
+    operations.put_submission(make_submission(101, pk=str(anonymous_id)))
+    operations.move_anonymous_submissions_to_member(
+        member_id=fred_bloggs.pk, anonymous_id=anonymous_id
+    )
+    assert operations.get_member(fred_bloggs.pk).anonymous_ids == [other_anonymous_id]
+
+
+def test_move_anonymous_submissions_without_submissions(fred_bloggs):
+    anonymous_id = uuid.uuid4()
+    operations.put_member(
+        fred_bloggs.model_copy(update={"anonymous_ids": [anonymous_id]})
+    )
+    assert (
+        operations.move_anonymous_submissions_to_member(
+            member_id=fred_bloggs.pk, anonymous_id=anonymous_id
+        )
+        == []
+    )
+    assert operations.get_member(fred_bloggs.pk).anonymous_ids == []
+
+
+def test_move_anonymous_submissions_in_chunks(fred_bloggs):
+    anonymous_id = uuid.uuid4()
+    operations.put_member(
+        fred_bloggs.model_copy(update={"anonymous_ids": [anonymous_id]})
+    )
+    count = operations.SUBMISSIONS_PER_TRANSACTION + 1
+    for i in range(count):
+        operations.put_submission(make_submission(i, pk=str(anonymous_id)))
+    # With both counters seeded each chunk is written at the first attempt
+    operations.get_member_submission_stats(anonymous_id)
+    table.get_member_table().put_item(
+        Item={
+            **table.get_submission_stats_key(fred_bloggs.pk),
+            **SubmissionStatsModel().model_dump(),
+        }
+    )
+    with mock.patch.object(
+        operations.transact, "write", wraps=operations.transact.write
+    ) as mock_write:
+        submissions = operations.move_anonymous_submissions_to_member(
+            member_id=fred_bloggs.pk, anonymous_id=anonymous_id
+        )
+    assert mock_write.call_count == 2
+    assert all(len(call.args[0]) <= 100 for call in mock_write.call_args_list)
+    assert len(submissions) == count
+    assert len(operations.get_submissions_for_member(fred_bloggs.pk)) == count
+    assert operations.get_submissions_for_member(anonymous_id) == []
+    assert operations.get_member(fred_bloggs.pk).anonymous_ids == []
+
+
+def test_move_anonymous_submissions_already_moved(fred_bloggs):
+    anonymous_id = uuid.uuid4()
+    submission = operations.put_submission(make_submission(101, pk=str(anonymous_id)))
+    # Another request moves the submission after we've listed it
+    with mock.patch.object(
+        operations, "get_submissions_for_member", return_value=[submission]
+    ):
+        operations.move_anonymous_submissions_to_member(
+            member_id=fred_bloggs.pk, anonymous_id=anonymous_id
+        )
+        with pytest.raises(operations.DbError):
+            operations.move_anonymous_submissions_to_member(
+                member_id=fred_bloggs.pk, anonymous_id=anonymous_id
+            )
+
+
+def test_move_anonymous_submissions_moves_stats(fred_bloggs):
+    anonymous_id = uuid.uuid4()
+    operations.put_submission(make_submission(101, pk=str(anonymous_id)))
+    operations.put_submission(make_submission(102, pk=fred_bloggs.pk))
+    operations.get_member_submission_stats(anonymous_id)
+    operations.get_member_submission_stats(fred_bloggs.pk)
+    operations.move_anonymous_submissions_to_member(
+        member_id=fred_bloggs.pk, anonymous_id=anonymous_id
+    )
+    assert operations.get_member_submission_stats(
+        fred_bloggs.pk
+    ) == SubmissionStatsModel(count=2, open=2)
+    assert operations.get_member_submission_stats(anonymous_id) == SubmissionStatsModel(
+        count=0
+    )
+    assert operations.get_target_submission_stats(
+        "show", "00_01/romeo_and_juliet"
+    ) == SubmissionStatsModel(count=2, open=2)
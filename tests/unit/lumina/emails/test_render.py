@@ -1,9 +1,24 @@
+from unittest import mock
+
+import html2text
+import jinja2
+import pytest
+from lumina.emails import render
 from lumina.emails.render import render_email
 
 NAME = "Fred Bloggs"
 AUTH_URL = "https://example.com/auth?token=12345"
 
 
+@pytest.fixture(autouse=True)
+def clear_caches():
+    render.get_environment.cache_clear()
+    render.get_skeleton.cache_clear()
+    yield
+    render.get_environment.cache_clear()
+    render.get_skeleton.cache_clear()
+
+
 class TestRegisterMemberEmail:
     def test_basic(self):
         email = render_email("register_member.html", name=NAME, auth_url=AUTH_URL)
@@ -34,3 +49,35 @@ class TestLoginEmail:
         assert "<p>" in email.html
         assert NAME in email.html
         assert AUTH_URL in email.html
+
+
+class TestPlaintext:
+    def test_matches_conversion(self):
+        email = render_email("login.html", name="Fred_O'Bloggs *", auth_url=AUTH_URL)
+        assert email.plaintext == html2text.html2text(email.html).strip()
+
+    def test_converted_once(self):
+        with mock.patch("html2text.html2text", wraps=html2text.html2text) as convert:
+            first = render_email("login.html", name=NAME, auth_url=AUTH_URL)
+            second = render_email("login.html", name="Jane Doe", auth_url=AUTH_URL)
+        assert convert.call_count == 1
+        assert NAME in first.plaintext
+        assert "Jane Doe" in second.plaintext
+        assert NAME not in second.plaintext
+
+    def test_transformed_context(self):
+        environment = jinja2.Environment(
+            loader=jinja2.DictLoader({"quiet.html": "<p>{{ name|lower }}</p>"})
+        )
+        with mock.patch.object(render, "get_environment", return_value=environment):
+            email = render_email("quiet.html", name=NAME)
+        assert email.plaintext == NAME.lower()
+
+
+def test_compiled_templates(tmp_path):
+    render.compile_templates(tmp_path)
+    with mock.patch.object(render, "COMPILED_TEMPLATES_PATH", tmp_path):
+        assert isinstance(render.get_environment().loader, jinja2.ModuleLoader)
+        email = render_email("login.html", name=NAME, auth_url=AUTH_URL)
+    assert NAME in email.html
+    assert AUTH_URL in email.plaintext
@@ -1,8 +1,17 @@
+import datetime
 from contextlib import contextmanager
 
 import pytest
 from lumina.app import app
-from lumina.auth import optional_member, require_member
+from lumina.auth import (
+    AuthenticatedToken,
+    MemberPrincipal,
+    optional_member,
+    optional_principal,
+    require_member,
+    require_principal,
+    require_token,
+)
 from lumina.database.models import MemberModel
 
 
@@ -11,13 +20,28 @@ def mock_auth_member(member: MemberModel):
     def i_am_member():
         return member
 
+    def i_am_principal():
+        return MemberPrincipal.from_model(member)
+
+    def my_token():
+        return AuthenticatedToken(
+            id=member.id,
+            expires_at=datetime.datetime(2030, 1, 1, tzinfo=datetime.timezone.utc),
+        )
+
     app.dependency_overrides[require_member] = i_am_member
     app.dependency_overrides[optional_member] = i_am_member
+    app.dependency_overrides[require_principal] = i_am_principal
+    app.dependency_overrides[optional_principal] = i_am_principal
+    app.dependency_overrides[require_token] = my_token
 
     yield i_am_member()
 
     del app.dependency_overrides[require_member]
     del app.dependency_overrides[optional_member]
+    del app.dependency_overrides[require_principal]
+    del app.dependency_overrides[optional_principal]
+    del app.dependency_overrides[require_token]
 
 
 MEMBER_FRED_BLOGGS = MemberModel(
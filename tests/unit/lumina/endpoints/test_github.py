@@ -0,0 +1,104 @@
+from http import HTTPStatus
+from unittest import mock
+
+import fixtures.github
+import pytest
+from fastapi.testclient import TestClient
+from lumina.app import app
+
+client = TestClient(app)
+
+
+@pytest.fixture(autouse=True)
+def mock_webhook_secret():
+    with mock.patch(
+        "lumina.github.webhooks.get_webhook_secret",
+        return_value=fixtures.github.SIGNED_SECRET,
+    ):
+        yield
+
+
+@pytest.fixture()
+def update_issue():
+    with mock.patch(
+        "lumina.database.operations.update_submission_github_issue"
+    ) as update_issue:
+        yield update_issue
+
+
+def post_webhook(
+    body: bytes, event: str, signature: str | None, delivery: str | None = None
+):
+    headers = {"X-GitHub-Event": event, "Content-Type": "application/json"}
+    if delivery:
+        headers["X-GitHub-Delivery"] = delivery
+    if signature:
+        headers["X-Hub-Signature-256"] = signature
+    return client.post("/github/webhook", content=body, headers=headers)
+
+
+def test_webhook(update_issue):
+    response = post_webhook(
+        fixtures.github.SIGNED_BODY.encode(),
+        "issue_comment",
+        fixtures.github.SIGNED_HEADER,
+    )
+    assert response.status_code == HTTPStatus.OK
+    assert update_issue.call_args[0][0] == 7
+
+
+def test_webhook_ignored_event(update_issue):
+    response = post_webhook(
+        fixtures.github.SIGNED_BODY.encode(), "star", fixtures.github.SIGNED_HEADER
+    )
+    assert response.status_code == HTTPStatus.OK
+    update_issue.assert_not_called()
+
+
+def test_webhook_missing_signature(update_issue):
+    response = post_webhook(fixtures.github.SIGNED_BODY.encode(), "issues", None)
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+    update_issue.assert_not_called()
+
+
+def test_webhook_verified_before_parsing(update_issue):
+    with mock.patch("lumina.github.webhooks.parse_webhook_issue") as parse:
+        response = post_webhook(b"{", "issues", fixtures.github.SIGNED_HEADER)
+    assert response.status_code == HTTPStatus.UNAUTHORIZED
+    parse.assert_not_called()
+    update_issue.assert_not_called()
+
+
+def test_webhook_redelivered(update_issue):
+    with mock.patch(
+        "lumina.database.operations.put_webhook_delivery", side_effect=[True, False]
+    ) as put_delivery:
+        for _ in range(2):
+            response = post_webhook(
+                fixtures.github.SIGNED_BODY.encode(),
+                "issue_comment",
+                fixtures.github.SIGNED_HEADER,
+                delivery="72d3162e-cc78-11e3-81ab-4c9367dc0958",
+            )
+            assert response.status_code == HTTPStatus.OK
+    put_delivery.assert_called_with("72d3162e-cc78-11e3-81ab-4c9367dc0958")
+    update_issue.assert_called_once()
+
+
+def test_webhook_deferred(update_issue):
+    queue = mock.Mock()
+    with mock.patch("lumina.config.settings.webhook_deferred", True), mock.patch(
+        "lumina.webhook_queue.get_queue", return_value=queue
+    ):
+        response = post_webhook(
+            fixtures.github.SIGNED_BODY.encode(),
+            "issue_comment",
+            fixtures.github.SIGNED_HEADER,
+            delivery="abc",
+        )
+    assert response.status_code == HTTPStatus.ACCEPTED
+    [message] = [c.args[0] for c in queue.send.call_args_list]
+    assert message["delivery"] == "abc"
+    assert message["issue"]["number"] == 7
+    queue.flush.assert_called_once()
+    update_issue.assert_not_called()
@@ -1,3 +1,4 @@
+import datetime
 import uuid
 from http import HTTPStatus
 from unittest import mock
@@ -6,8 +7,15 @@ import freezegun
 from fastapi.testclient import TestClient
 from fixtures.models import MEMBER_MODEL_FRED_BLOGGS
 from lumina.app import app
+from lumina.auth import HEADER_REFRESHED_TOKEN, decode_jwt
+from lumina.config import settings
+from lumina.database.cursor import decode_cursor, encode_cursor
 from lumina.database.models import MemberModel
-from lumina.database.operations import ResultNotFound
+from lumina.database.operations import (
+    ResultAlreadyExists,
+    ResultNotFound,
+    get_member_filter,
+)
 
 client = TestClient(app)
 
@@ -46,13 +54,68 @@ class TestListMembers:
 
     def test_success(self, auth_admin_bloggs, snapshot):
         with mock.patch(
-            "lumina.database.operations.get_members",
-            return_value=[FRED_BLOGGS, ALICE_BLOGGS],
-        ) as mock_get_members:
+            "lumina.database.operations.iter_members",
+            return_value=iter([FRED_BLOGGS, ALICE_BLOGGS]),
+        ) as mock_iter_members:
             response = client.get("/member")
         assert response.status_code == HTTPStatus.OK
         assert response.json() == snapshot
-        assert mock_get_members.called
+        assert mock_iter_members.called
+
+    def test_success_no_members(self, auth_admin_bloggs):
+        with mock.patch(
+            "lumina.database.operations.iter_members", return_value=iter([])
+        ):
+            response = client.get("/member")
+        assert response.status_code == HTTPStatus.OK
+        assert response.json() == []
+
+    def test_filters(self, auth_admin_bloggs):
+        with mock.patch(
+            "lumina.database.operations.iter_members", return_value=iter([])
+        ) as mock_iter_members:
+            response = client.get(
+                "/member", params={"emailVerified": "true", "consentNews": "false"}
+            )
+        assert response.status_code == HTTPStatus.OK
+        assert mock_iter_members.call_args.kwargs[
+            "filter_expression"
+        ] == get_member_filter(email_verified=True, consent_news=False)
+
+    def test_page(self, auth_admin_bloggs):
+        with mock.patch(
+            "lumina.database.operations.get_members_page",
+            return_value=([FRED_BLOGGS], {"pk": "fred_bloggs", "sk": "profile"}),
+        ) as mock_get_members_page:
+            response = client.get("/member", params={"limit": 1})
+        assert response.status_code == HTTPStatus.OK
+        assert [m["id"] for m in response.json()] == ["fred_bloggs"]
+        assert mock_get_members_page.call_args.kwargs["limit"] == 1
+        assert mock_get_members_page.call_args.kwargs["start_key"] is None
+        assert decode_cursor(response.headers["X-Next-Cursor"]) == {
+            "pk": "fred_bloggs",
+            "sk": "profile",
+        }
+
+    def test_last_page(self, auth_admin_bloggs):
+        cursor = encode_cursor({"pk": "fred_bloggs", "sk": "profile"})
+        with mock.patch(
+            "lumina.database.operations.get_members_page",
+            return_value=([ALICE_BLOGGS], None),
+        ) as mock_get_members_page:
+            response = client.get("/member", params={"cursor": cursor})
+        assert response.status_code == HTTPStatus.OK
+        assert [m["id"] for m in response.json()] == ["alice_bloggs"]
+        assert mock_get_members_page.call_args.kwargs["start_key"] == {
+            "pk": "fred_bloggs",
+            "sk": "profile",
+        }
+        assert "X-Next-Cursor" not in response.headers
+
+    def test_invalid_cursor(self, auth_admin_bloggs):
+        response = client.get("/member", params={"cursor": "not a cursor"})
+        assert response.status_code == HTTPStatus.BAD_REQUEST
+        assert response.json() == {"detail": "Invalid cursor"}
 
 
 class TestReadMember:
@@ -65,25 +128,30 @@ class TestReadMember:
         assert response.status_code == HTTPStatus.FORBIDDEN
         assert response.json() == {"detail": "You cannot read another member"}
 
-    @mock.patch(
-        "lumina.database.operations.set_member_email_verified",
-        return_value=None,
-    )
-    @mock.patch("lumina.database.operations.get_member")
+    @mock.patch("lumina.database.operations.set_member_email_verified")
     def test_success_self_first_call(
         self,
-        mock_get_member,
         mock_set_member_email_verified,
         auth_fred_bloggs,
+        mock_keys,
         snapshot,
     ):
-        mock_get_member.return_value = MemberModel(**auth_fred_bloggs.model_dump())
-        mock_get_member.return_value.email_verified_at = "2021-01-01T00:00:00"
-        response = client.get("/member/fred_bloggs")
+        mock_set_member_email_verified.return_value = MemberModel(
+            **auth_fred_bloggs.model_dump(exclude={"profile_version"}),
+            profile_version=1,
+        )
+        mock_set_member_email_verified.return_value.email_verified_at = (
+            "2021-01-01T00:00:00"
+        )
+        with mock.patch.object(settings, "jwt_member_claims", True):
+            response = client.get("/member/fred_bloggs")
         assert response.status_code == HTTPStatus.OK, response.json()
-        assert mock_set_member_email_verified.called
-        assert mock_get_member.called
+        mock_set_member_email_verified.assert_called_once_with("fred_bloggs")
         assert response.json() == snapshot
+        # The token used no longer has current claims, a new one is given
+        principal = decode_jwt(response.headers[HEADER_REFRESHED_TOKEN]).principal
+        assert principal.email_verified
+        assert principal.profile_version == 1
 
     @mock.patch(
         "lumina.database.operations.set_member_email_verified",
@@ -108,12 +176,18 @@ class TestReadMember:
     ):
         auth_fred_bloggs.email_verified_at = "2021-01-01T00:00:00"
         auth_fred_bloggs.anonymous_ids = [FRED_ANON_ID]
-        response = client.get("/member/fred_bloggs")
+        with mock.patch(
+            "lumina.database.operations.get_member",
+            # Moving clears the anonymous ids
+            return_value=auth_fred_bloggs.model_copy(update={"anonymous_ids": []}),
+        ):
+            response = client.get("/member/fred_bloggs")
         # We don't call set_member_email_verified as email is already verified
         assert response.status_code == HTTPStatus.OK, response.json()
         mock_move_anonymous_submissions_to_member.assert_called_with(
             member_id="fred_bloggs", anonymous_id=FRED_ANON_ID
         )
+        assert response.json()["anonymousIds"] == []
         assert response.json() == snapshot
 
 
@@ -152,14 +226,12 @@ VALID_REGISTER_MEMBER_PAYLOAD = {
 
 class TestRegisterMember:
     @mock.patch("lumina.database.operations.put_member", return_value=None)
-    @mock.patch("lumina.database.operations.get_member", side_effect=ResultNotFound())
     @mock.patch("lumina.auth.get_auth_url", return_value=FAKE_TOKEN_URL)
     @mock.patch("lumina.emails.send.send_email", return_value="abc123")
     def test_success(
         self,
         send_email,
         get_auth_url,
-        get_member,
         create_member,
     ):
         response = client.post(
@@ -167,25 +239,26 @@ class TestRegisterMember:
             json=VALID_REGISTER_MEMBER_PAYLOAD,
         )
         assert response.status_code == HTTPStatus.OK, response.json()
-        assert get_member.called
         assert send_email.called
         assert create_member.called
+        assert create_member.call_args.kwargs == {"create_only": True}
 
     @mock.patch(
-        "lumina.database.operations.get_member",
-        return_value=MEMBER_MODEL_FRED_BLOGGS,
+        "lumina.database.operations.put_member",
+        side_effect=ResultAlreadyExists(),
     )
     @mock.patch(
         "lumina.auth.get_auth_url", return_value="https://nthp.test/auth?token=123"
     )
     @mock.patch("lumina.emails.send.send_email", return_value="abc123")
-    def test_conflict_member_already_exists(self, send_email, get_auth_url, get_member):
+    def test_conflict_member_already_exists(self, send_email, get_auth_url, put_member):
         response = client.post(
             "/member/test_id",
             json=VALID_REGISTER_MEMBER_PAYLOAD,
         )
         assert response.status_code == HTTPStatus.CONFLICT, response.json()
-        assert get_member.called
+        assert response.json() == {"detail": "Member already exists"}
+        assert put_member.called
         assert not send_email.called
 
     def test_invalid_email(self):
@@ -247,6 +320,25 @@ class TestUpdateMember:
         assert mock_get_member.called
         assert mock_put_member.called
         assert mock_put_member.call_args == snapshot
+        assert HEADER_REFRESHED_TOKEN not in response.headers
+
+    def test_success_refreshes_token(self, auth_fred_bloggs, mock_keys):
+        updated = FRED_BLOGGS.model_copy(update={"profile_version": 3})
+        with mock.patch(
+            "lumina.database.operations.get_member", return_value=FRED_BLOGGS
+        ), mock.patch(
+            "lumina.database.operations.put_member", return_value=updated
+        ), mock.patch.object(
+            settings, "jwt_member_claims", True
+        ):
+            response = client.put("/member/fred_bloggs", json=UPDATE_MEMBER_PAYLOAD)
+        assert response.status_code == HTTPStatus.OK, response.text
+        token = decode_jwt(response.headers[HEADER_REFRESHED_TOKEN])
+        assert token.principal.profile_version == 3
+        # Expires with the token used, rather than extending the session
+        assert token.expires_at == datetime.datetime(
+            2030, 1, 1, tzinfo=datetime.timezone.utc
+        )
 
 
 class TestDeleteMember:
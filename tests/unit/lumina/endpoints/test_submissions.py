@@ -1,16 +1,30 @@
+import datetime
 from http import HTTPStatus
 from unittest import mock
 
+import pytest
 from fastapi.testclient import TestClient
 from fixtures.models import GITHUB_ISSUE, MEMBER_MODEL_FRED_BLOGGS
 from lumina.app import app
+from lumina.config import settings
+from lumina.database.cursor import (
+    HEADER_NEXT_CURSOR,
+    InvalidCursor,
+    decode_cursor,
+    encode_cursor,
+)
 from lumina.database.models import (
     GitHubIssueModel,
     GitHubIssueState,
     SubmissionModel,
+    SubmissionStatsModel,
     SubmitterModel,
 )
+from lumina.github.ratelimit import GitHubRateLimited
+from lumina.outbox import handle_messages
+from lumina.queues import LocalQueue
 from lumina.schema.submissions import GenericSubmissionRequest
+from lumina.util import dates
 
 client = TestClient(app)
 
@@ -68,80 +82,184 @@ DUMMY_SUBMISSION_OLDER = SubmissionModel(
 class TestListMemberSubmissions:
     def test_no_submissions(self):
         with mock.patch(
-            "lumina.database.operations.get_submissions_for_member"
-        ) as mock_get_submissions:
-            mock_get_submissions.return_value = []
-            response = client.get("/submissions/member/fred-bloggs")
+            "lumina.database.operations.get_member_submission_stats"
+        ) as mock_get_stats:
+            mock_get_stats.return_value = SubmissionStatsModel()
+            response = client.get("/submissions/member/fred-bloggs/stats")
         assert response.status_code == HTTPStatus.OK
-        assert response.json() == []
+        assert response.json() == {"count": 0, "open": 0, "closed": 0, "completed": 0}
 
     def test_with_submissions(self):
         with mock.patch(
-            "lumina.database.operations.get_submissions_for_member"
-        ) as mock_get_submissions:
-            mock_get_submissions.return_value = [DUMMY_SUBMISSION]
-            response = client.get("/submissions/member/fred-bloggs")
+            "lumina.database.operations.get_member_submission_stats"
+        ) as mock_get_stats:
+            mock_get_stats.return_value = SubmissionStatsModel(
+                count=3, open=1, completed=2
+            )
+            response = client.get("/submissions/member/fred-bloggs/stats")
         assert response.status_code == HTTPStatus.OK
-        assert response.json() == [
-            {
-                "id": 2,
-                "subject": None,
-                "message": "This is a message",
-                "submitter": {
-                    "id": "fred_bloggs",
-                    "name": "Fred Bloggs",
-                    "verified": True,
-                },
-                "targetId": "00_01/a_show",
-                "targetName": "A Show",
-                "targetType": "show",
-                "targetUrl": "https://github.com/newtheatre/history-project/issues/2",
-                "githubIssue": {
-                    "closedAt": None,
-                    "comments": 1,
-                    "createdAt": "2020-01-01T00:00:00Z",
-                    "number": 1,
-                    "state": "open",
-                    "title": "A title",
-                    "updatedAt": "2020-01-01T00:00:00Z",
-                    "url": "https://github.com/newtheatre/lumina-test/issues/2",
-                },
+        assert response.json() == {"count": 3, "open": 1, "closed": 0, "completed": 2}
+        mock_get_stats.assert_called_once_with("fred-bloggs")
+
+    def test_list(self):
+        with mock.patch(
+            "lumina.database.operations.iter_member_submissions",
+            return_value=iter([DUMMY_SUBMISSION, DUMMY_SUBMISSION_OLDER]),
+        ) as mock_iter:
+            response = client.get("/submissions/member/fred_bloggs")
+        assert response.status_code == HTTPStatus.OK
+        assert [s["id"] for s in response.json()] == [2, 1]
+        assert mock_iter.call_args.args == ("fred_bloggs",)
+        assert HEADER_NEXT_CURSOR not in response.headers
+
+    def test_list_page(self):
+        next_key = {"pk": "fred_bloggs", "sk": "submission/2"}
+        with mock.patch(
+            "lumina.database.operations.get_member_submissions_page",
+            return_value=([DUMMY_SUBMISSION], next_key),
+        ) as mock_page:
+            response = client.get("/submissions/member/fred_bloggs?limit=1")
+        assert response.status_code == HTTPStatus.OK
+        assert [s["id"] for s in response.json()] == [2]
+        assert mock_page.call_args.kwargs == {"limit": 1, "start_key": None}
+        assert decode_cursor(response.headers[HEADER_NEXT_CURSOR]) == next_key
+
+    def test_list_next_page(self):
+        start_key = {"pk": "fred_bloggs", "sk": "submission/2"}
+        with mock.patch(
+            "lumina.database.operations.get_member_submissions_page",
+            return_value=([DUMMY_SUBMISSION_OLDER], None),
+        ) as mock_page:
+            response = client.get(
+                "/submissions/member/fred_bloggs",
+                params={"limit": 1, "cursor": encode_cursor(start_key)},
+            )
+        assert response.status_code == HTTPStatus.OK
+        assert [s["id"] for s in response.json()] == [1]
+        assert mock_page.call_args.kwargs == {"limit": 1, "start_key": start_key}
+        assert HEADER_NEXT_CURSOR not in response.headers
+
+    def test_list_fresh(self, auth_fred_bloggs):
+        closed = DUMMY_SUBMISSION.model_copy(
+            update={
+                "github_issue": DUMMY_SUBMISSION.github_issue.model_copy(
+                    update={"state": GitHubIssueState.CLOSED}
+                )
             }
-        ]
+        )
+        with mock.patch(
+            "lumina.database.operations.iter_member_submissions",
+            return_value=iter([DUMMY_SUBMISSION]),
+        ), mock.patch(
+            "lumina.github.issues.refresh_submissions", return_value=[closed]
+        ) as mock_refresh:
+            response = client.get("/submissions/member/fred_bloggs?fresh=true")
+        assert response.status_code == HTTPStatus.OK
+        assert response.json()[0]["githubIssue"]["state"] == "closed"
+        mock_refresh.assert_called_once_with([DUMMY_SUBMISSION])
+
+    @pytest.mark.parametrize("authed", [False, True])
+    def test_list_fresh_forbidden(self, authed, request):
+        if authed:
+            request.getfixturevalue("auth_fred_bloggs")
+        with mock.patch("lumina.github.issues.refresh_submissions") as mock_refresh:
+            response = client.get("/submissions/member/alice_bloggs?fresh=true")
+        assert response.status_code == HTTPStatus.FORBIDDEN
+        mock_refresh.assert_not_called()
 
-    def test_sort_order(self):
+    def test_list_invalid_cursor(self):
+        response = client.get("/submissions/member/fred_bloggs?cursor=nope")
+        assert response.status_code == HTTPStatus.BAD_REQUEST
+        assert response.json() == {"detail": "Invalid cursor"}
+
+    def test_list_cursor_for_other_query(self):
+        cursor = encode_cursor({"pk": "fred_bloggs", "sk": "profile"})
         with mock.patch(
-            "lumina.database.operations.get_submissions_for_member"
-        ) as mock_get_submissions:
-            mock_get_submissions.return_value = [
-                DUMMY_SUBMISSION_OLDER,
-                DUMMY_SUBMISSION,
-            ]
-            response = client.get("/submissions/member/fred-bloggs")
+            "lumina.database.operations.get_member_submissions_page",
+            side_effect=InvalidCursor,
+        ):
+            response = client.get(
+                "/submissions/member/fred_bloggs", params={"cursor": cursor}
+            )
+        assert response.status_code == HTTPStatus.BAD_REQUEST
+        assert response.json() == {"detail": "Invalid cursor"}
+
+
+class TestListTargetSubmissions:
+    def test_list(self):
+        with mock.patch(
+            "lumina.database.operations.get_cached_submissions_for_target",
+            return_value=[DUMMY_SUBMISSION_OLDER, DUMMY_SUBMISSION],
+        ) as mock_get:
+            response = client.get("/submissions/target/show/00_01/a_show")
+        assert response.status_code == HTTPStatus.OK
+        assert [s["id"] for s in response.json()] == [2, 1]
+        mock_get.assert_called_once_with("show", "00_01/a_show")
+        assert response.headers["ETag"].startswith('W/"')
+        assert response.headers["Cache-Control"] == "public, max-age=60"
+
+    def test_list_fresh(self, auth_admin_bloggs):
+        with mock.patch(
+            "lumina.database.operations.get_cached_submissions_for_target",
+            return_value=[DUMMY_SUBMISSION],
+        ), mock.patch(
+            "lumina.github.issues.refresh_submissions",
+            return_value=[DUMMY_SUBMISSION],
+        ) as mock_refresh:
+            response = client.get("/submissions/target/show/00_01/a_show?fresh=1")
+            plain = client.get("/submissions/target/show/00_01/a_show")
         assert response.status_code == HTTPStatus.OK
-        data = response.json()
-        assert data[0]["id"] == 2
-        assert data[1]["id"] == 1
+        assert response.json() == plain.json()
+        mock_refresh.assert_called_once_with([DUMMY_SUBMISSION])
 
+    def test_list_fresh_forbidden(self, auth_fred_bloggs):
+        with mock.patch("lumina.github.issues.refresh_submissions") as mock_refresh:
+            response = client.get("/submissions/target/show/00_01/a_show?fresh=1")
+        assert response.status_code == HTTPStatus.FORBIDDEN
+        mock_refresh.assert_not_called()
 
-class TestReadMemberSubmissionStats:
-    def test_no_submissions(self):
+    def test_not_modified(self):
         with mock.patch(
-            "lumina.database.operations.get_submissions_for_member"
-        ) as mock_get_submissions:
-            mock_get_submissions.return_value = []
-            response = client.get("/submissions/member/fred-bloggs/stats")
+            "lumina.database.operations.get_cached_submissions_for_target",
+            return_value=[DUMMY_SUBMISSION],
+        ):
+            etag = client.get("/submissions/target/show/00_01/a_show").headers["ETag"]
+            response = client.get(
+                "/submissions/target/show/00_01/a_show",
+                headers={"If-None-Match": etag},
+            )
+        assert response.status_code == HTTPStatus.NOT_MODIFIED
+        assert response.headers["ETag"] == etag
+        assert response.content == b""
+
+    def test_etag_changes_with_issue_update(self):
+        updated_submission = DUMMY_SUBMISSION.model_copy(
+            update={
+                "github_issue": DUMMY_SUBMISSION.github_issue.model_copy(
+                    update={"updated_at": "2021-01-01T00:00:00Z"}
+                )
+            }
+        )
+        with mock.patch(
+            "lumina.database.operations.get_cached_submissions_for_target",
+            side_effect=[[DUMMY_SUBMISSION], [updated_submission]],
+        ):
+            etag = client.get("/submissions/target/show/00_01/a_show").headers["ETag"]
+            response = client.get(
+                "/submissions/target/show/00_01/a_show",
+                headers={"If-None-Match": etag},
+            )
         assert response.status_code == HTTPStatus.OK
-        assert response.json() == {"count": 0}
+        assert response.headers["ETag"] != etag
 
-    def test_with_submissions(self):
+    def test_no_submissions(self):
         with mock.patch(
-            "lumina.database.operations.get_submissions_for_member"
-        ) as mock_get_submissions:
-            mock_get_submissions.return_value = [DUMMY_SUBMISSION]
-            response = client.get("/submissions/member/fred-bloggs/stats")
+            "lumina.database.operations.get_cached_submissions_for_target",
+            return_value=[],
+        ):
+            response = client.get("/submissions/target/person/fred_bloggs")
         assert response.status_code == HTTPStatus.OK
-        assert response.json() == {"count": 1}
+        assert response.json() == []
 
 
 class TestCreateGenericSubmission:
@@ -334,3 +452,65 @@ class TestCreateGenericSubmission:
                 "url": "https://github.com/newtheatre/lumina-test/issues/123",
             },
         }
+
+    def test_outbox_accepted(self, auth_fred_bloggs):
+        queue = LocalQueue(handle_messages)
+        with mock.patch.object(settings, "submission_outbox", True), mock.patch(
+            "lumina.outbox.get_queue", return_value=queue
+        ), mock.patch(
+            "lumina.database.operations.put_pending_submission",
+            side_effect=lambda pending: pending,
+        ) as mock_put_pending_submission, mock.patch(
+            "lumina.outbox.handle_message"
+        ) as mock_handle_message, mock.patch(
+            "lumina.github.submissions.create_generic_submission_issue"
+        ) as mock_create_generic_submission_issue:
+            response = client.post(
+                "/submissions/message",
+                json=GenericSubmissionRequest(
+                    target_type="test",
+                    target_id="test-page",
+                    target_name="Test Page",
+                    target_url="https://example.com/test-page",
+                    subject="Hi there",
+                    message="Hello World",
+                ).model_dump(),
+            )
+        assert response.status_code == HTTPStatus.ACCEPTED
+        pending = mock_put_pending_submission.call_args.args[0]
+        assert pending.pk == "fred_bloggs"
+        assert response.json() == {
+            "id": str(pending.id),
+            "subject": "Hi there",
+            "message": "Hello World",
+            "submitter": {"id": "fred_bloggs", "verified": True, "name": "Fred Bloggs"},
+            "targetId": "test-page",
+            "targetName": "Test Page",
+            "targetType": "test",
+            "targetUrl": "https://example.com/test-page",
+        }
+        # The issue is created after the response, not by the request
+        mock_create_generic_submission_issue.assert_not_called()
+        mock_handle_message.assert_called_once_with(
+            {"owner": "fred_bloggs", "id": str(pending.id)}
+        )
+
+    def test_rate_limited(self, auth_fred_bloggs):
+        retry_at = dates.now() + datetime.timedelta(seconds=30)
+        with mock.patch(
+            "lumina.github.submissions.create_generic_submission_issue",
+            side_effect=GitHubRateLimited(retry_at),
+        ), mock.patch("lumina.database.operations.put_submission") as put_submission:
+            response = client.post(
+                "/submissions/message",
+                json=GenericSubmissionRequest(
+                    target_type="test",
+                    target_id="test-page",
+                    target_name="Test Page",
+                    target_url="https://example.com/test-page",
+                    message="Hello World",
+                ).model_dump(),
+            )
+        assert response.status_code == HTTPStatus.SERVICE_UNAVAILABLE
+        assert 1 <= int(response.headers["Retry-After"]) <= 31
+        put_submission.assert_not_called()
@@ -11,6 +11,6 @@ def mock_token():
     # GitHub API without committing secrets.
     with mock.patch(
         "lumina.github.connection.get_access_token",
-        return_value=environ.get("GITHUB_TOKEN"),
+        return_value=environ.get("GITHUB_TOKEN", "test-token"),
     ):
         yield
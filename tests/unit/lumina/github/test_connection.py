@@ -1,3 +1,5 @@
+from unittest import mock
+
 import pytest
 from lumina.github import connection
 
@@ -6,3 +8,23 @@ from lumina.github import connection
 def test_get_content_repo():
     repo = connection.get_content_repo()
     assert repo.name == "lumina-test"
+
+
+def test_get_content_repo_is_lazy():
+    connection.make_content_repo.cache_clear()
+    with mock.patch("github.Requester.Requester.requestJson") as request_json:
+        repo = connection.get_content_repo()
+    connection.make_content_repo.cache_clear()
+    request_json.assert_not_called()
+    assert repo.url == "/repos/newtheatre/lumina-test"
+
+
+def test_get_github_follows_token():
+    github = connection.get_github()
+    assert connection.get_github() is github
+    assert connection.get_content_repo() is connection.get_content_repo()
+    with mock.patch.object(connection, "get_access_token", return_value="rotated"):
+        assert connection.get_github() is not github
+        assert connection.get_content_repo()._requester is (  # noqa: SLF001
+            connection.get_github()._Github__requester  # noqa: SLF001
+        )
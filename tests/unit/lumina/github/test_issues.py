@@ -0,0 +1,168 @@
+import datetime
+from unittest import mock
+
+import moto
+import pytest
+from fixtures.models import make_submission
+from lumina.database import operations, table
+from lumina.database.models import GitHubIssueState
+from lumina.github import issues
+from lumina.github.ratelimit import GitHubRateLimited
+
+
+@pytest.fixture(autouse=True)
+def requester():
+    issues.fresh_issues.clear()
+    with mock.patch("lumina.github.connection.get_requester") as get_requester:
+        get_requester().rate_limiting = (-1, -1)
+        yield get_requester()
+
+
+def make_node(number: int, updated_at: datetime.datetime, **kwargs) -> dict:
+    return {
+        "number": number,
+        "state": "OPEN",
+        "stateReason": None,
+        "title": "Romeo and Juliet",
+        "createdAt": "2023-01-01T00:00:00Z",
+        "updatedAt": updated_at.isoformat(),
+        "closedAt": None,
+        "comments": {"totalCount": 0},
+        **kwargs,
+    }
+
+
+@pytest.fixture()
+def graphql():
+    with mock.patch.object(issues, "graphql") as graphql:
+        yield graphql
+
+
+def set_graphql_response(graphql: mock.Mock, nodes: dict) -> mock.Mock:
+    graphql.return_value = {"repository": nodes}
+    return graphql
+
+
+def test_graphql():
+    with mock.patch.object(issues, "get_requester") as get_requester:
+        request = get_requester().requestJsonAndCheck
+        request.return_value = (
+            {},
+            {"data": {"repository": None}, "errors": [{"message": "Not found"}]},
+        )
+        assert issues.graphql("query", {"owner": "newtheatre"}) == {"repository": None}
+    request.assert_called_once_with(
+        "POST",
+        "/graphql",
+        input={"query": "query", "variables": {"owner": "newtheatre"}},
+    )
+
+
+def test_query_issues(graphql):
+    updated_at = datetime.datetime(2023, 8, 1, tzinfo=datetime.timezone.utc)
+    request = set_graphql_response(
+        graphql,
+        {
+            "i1": make_node(
+                1,
+                updated_at,
+                state="CLOSED",
+                stateReason="COMPLETED",
+                closedAt="2023-08-01T00:00:00Z",
+                comments={"totalCount": 3},
+            ),
+            "i2": make_node(2, updated_at),
+            # Deleted
+            "i3": None,
+        },
+    )
+    fetched = issues.query_issues([1, 2, 3])
+    query, variables = request.call_args.args
+    assert variables == {"owner": "newtheatre", "name": "lumina-test"}
+    assert "i1: issue(number: 1)" in query
+    assert "i3: issue(number: 3)" in query
+    assert sorted(fetched) == [1, 2]
+    assert fetched[1].state == GitHubIssueState.COMPLETED
+    assert fetched[1].comments == 3
+    assert fetched[1].closed_at == updated_at
+    assert fetched[2].state == GitHubIssueState.OPEN
+
+
+def test_get_fresh_issues_cached(graphql):
+    updated_at = datetime.datetime(2023, 8, 1, tzinfo=datetime.timezone.utc)
+    request = set_graphql_response(graphql, {"i1": make_node(1, updated_at)})
+    assert list(issues.get_fresh_issues([1])) == [1]
+    set_graphql_response(graphql, {"i2": make_node(2, updated_at)})
+    assert sorted(issues.get_fresh_issues([1, 2, 2])) == [1, 2]
+    # Only the uncached issue is fetched, once
+    assert request.call_count == 2
+    assert "issue(number: 1)" not in request.call_args.args[0]
+
+
+class TestRefreshSubmissions:
+    @pytest.fixture(autouse=True)
+    def create_tables(self):
+        operations.submission_owners.clear()
+        operations.target_submissions.clear()
+        with moto.mock_dynamodb():
+            table.create_tables()
+            yield
+
+    def test_writes_back_changed(self, graphql):
+        changed = operations.put_submission(make_submission(1))
+        unchanged = operations.put_submission(make_submission(2))
+        updated_at = changed.github_issue.updated_at + datetime.timedelta(minutes=1)
+        set_graphql_response(
+            graphql,
+            {
+                "i1": make_node(1, updated_at, comments={"totalCount": 4}),
+                "i2": {
+                    **make_node(2, unchanged.github_issue.updated_at),
+                    "title": unchanged.github_issue.title,
+                    "createdAt": unchanged.github_issue.created_at.isoformat(),
+                },
+            },
+        )
+        with mock.patch(
+            "lumina.database.operations.update_submission_github_issues",
+            wraps=operations.update_submission_github_issues,
+        ) as update_issues:
+            refreshed = issues.refresh_submissions([changed, unchanged])
+        assert refreshed[0].github_issue.comments == 4
+        assert refreshed[0].github_issue.updated_at == updated_at
+        assert refreshed[1] is unchanged
+        assert [i.number for i in update_issues.call_args.args[0]] == [1]
+        assert operations.get_submission(1).github_issue == refreshed[0].github_issue
+
+    def test_stored_naive(self, graphql):
+        # Submissions created through the API before issues were stored aware
+        operations.put_submission(make_submission(1))
+        table.get_member_table().update_item(
+            Key={"pk": "fred_bloggs", "sk": "submission/1"},
+            UpdateExpression="set github_issue.updated_at = :naive",
+            ExpressionAttributeValues={":naive": "2023-08-01T00:00:00"},
+        )
+        naive = make_submission(
+            1,
+            github_issue=make_submission(1).github_issue.model_copy(
+                update={"updated_at": datetime.datetime(2023, 8, 1)}  # noqa: DTZ001
+            ),
+        )
+        updated_at = datetime.datetime(2023, 8, 2, tzinfo=datetime.timezone.utc)
+        set_graphql_response(
+            graphql, {"i1": make_node(1, updated_at, comments={"totalCount": 2})}
+        )
+        for submission in (operations.get_submission(1), naive):
+            issues.fresh_issues.clear()
+            [refreshed] = issues.refresh_submissions([submission])
+            assert refreshed.github_issue.comments == 2
+        assert operations.get_submission(1).github_issue.comments == 2
+
+    def test_rate_limited(self):
+        submission = make_submission(1)
+        with mock.patch.object(
+            issues,
+            "get_fresh_issues",
+            side_effect=GitHubRateLimited(datetime.datetime.now(datetime.timezone.utc)),
+        ):
+            assert issues.refresh_submissions([submission]) == [submission]
@@ -0,0 +1,156 @@
+import datetime
+from unittest import mock
+
+import freezegun
+import pytest
+from github import GithubException, RateLimitExceededException
+from lumina.github import ratelimit
+from lumina.util import dates
+
+NOW = datetime.datetime(2022, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+@pytest.fixture(autouse=True)
+def clear_tracker():
+    for tracker in ratelimit.trackers.values():
+        tracker.clear()
+    yield
+    for tracker in ratelimit.trackers.values():
+        tracker.clear()
+
+
+@pytest.fixture()
+def rate_limiting():
+    client = mock.MagicMock(rate_limiting=(-1, -1), rate_limiting_resettime=0)
+    with mock.patch("lumina.github.connection.get_requester", return_value=client):
+        yield client
+
+
+def test_tracks_remaining(rate_limiting):
+    rate_limiting.rate_limiting = (4000, 5000)
+    rate_limiting.rate_limiting_resettime = int(NOW.timestamp())
+    ratelimit.rate_limited(lambda: None)()
+    assert ratelimit.tracker.remaining == 4000
+    assert ratelimit.tracker.limit == 5000
+    assert ratelimit.tracker.reset_at == NOW
+
+
+def test_rate_limit_read_without_fetching():
+    from github import Github
+    from github.Requester import Requester
+
+    # Nothing recorded yet, Github.rate_limiting would fetch /rate_limit
+    requester = Github(auth=None)._Github__requester  # noqa: SLF001
+    assert isinstance(requester, Requester)
+    with mock.patch(
+        "lumina.github.connection.get_requester", return_value=requester
+    ), mock.patch.object(requester, "requestJsonAndCheck") as request:
+        ratelimit.rate_limited(lambda: None)()
+    request.assert_not_called()
+    assert ratelimit.tracker.remaining is None
+
+
+def test_original_exception_kept():
+    def timeout():
+        raise TimeoutError
+
+    with mock.patch(
+        "lumina.github.connection.get_requester", side_effect=ConnectionError
+    ), pytest.raises(TimeoutError):
+        ratelimit.rate_limited(timeout)()
+
+
+def test_unknown_remaining_is_ignored(rate_limiting):
+    ratelimit.rate_limited(lambda: None)()
+    assert ratelimit.tracker.remaining is None
+
+
+@freezegun.freeze_time(NOW)
+def test_stops_at_reserve(rate_limiting):
+    reset = NOW + datetime.timedelta(minutes=10)
+    rate_limiting.rate_limiting = (10, 5000)
+    rate_limiting.rate_limiting_resettime = int(reset.timestamp())
+    func = mock.Mock()
+    ratelimit.rate_limited(func)()
+    with pytest.raises(ratelimit.GitHubRateLimited) as e:
+        ratelimit.rate_limited(func)()
+    func.assert_called_once()
+    assert e.value.retry_at == reset
+    assert e.value.retry_after == 601
+    # Once the quota has reset requests are made again
+    with freezegun.freeze_time(reset + datetime.timedelta(seconds=1)):
+        ratelimit.rate_limited(func)()
+
+
+@freezegun.freeze_time(NOW)
+def test_secondary_rate_limit_backs_off(rate_limiting):
+    func = mock.Mock(
+        side_effect=GithubException(
+            403,
+            {"message": "You have exceeded a secondary rate limit."},
+            {"Retry-After": "30"},
+        )
+    )
+    with pytest.raises(ratelimit.GitHubRateLimited):
+        ratelimit.rate_limited(func)()
+    with pytest.raises(ratelimit.GitHubRateLimited) as e:
+        ratelimit.rate_limited(func)()
+    func.assert_called_once()
+    assert e.value.retry_at == dates.now() + datetime.timedelta(seconds=30)
+
+
+@freezegun.freeze_time(NOW)
+def test_primary_rate_limit_backs_off_until_reset(rate_limiting):
+    reset = NOW + datetime.timedelta(minutes=30)
+    func = mock.Mock(
+        side_effect=RateLimitExceededException(
+            403,
+            {"message": "API rate limit exceeded"},
+            {
+                "x-ratelimit-remaining": "0",
+                "x-ratelimit-reset": str(int(reset.timestamp())),
+            },
+        )
+    )
+    with pytest.raises(ratelimit.GitHubRateLimited) as e:
+        ratelimit.rate_limited(func)()
+    assert e.value.retry_at == reset
+
+
+def test_other_errors_are_raised(rate_limiting):
+    func = mock.Mock(side_effect=GithubException(403, {"message": "Forbidden"}, {}))
+    with pytest.raises(GithubException):
+        ratelimit.rate_limited(func)()
+    ratelimit.tracker.check()
+
+
+def test_emits_metrics(rate_limiting, capsys):
+    rate_limiting.rate_limiting = (4000, 5000)
+    ratelimit.rate_limited(lambda: None)()
+    assert '"GitHubRateLimitRemaining": 4000' in capsys.readouterr().out
+
+
+@freezegun.freeze_time(NOW)
+def test_graphql_quota_tracked_apart(rate_limiting):
+    reset = NOW + datetime.timedelta(minutes=10)
+    graphql = ratelimit.rate_limited_by(ratelimit.RESOURCE_GRAPHQL)(
+        lambda: ratelimit.record_response_rate_limit(
+            {
+                "X-RateLimit-Resource": "graphql",
+                "X-RateLimit-Remaining": "10",
+                "X-RateLimit-Limit": "5000",
+                "X-RateLimit-Reset": str(int(reset.timestamp())),
+            }
+        )
+    )
+    # PyGithub records every response as if core
+    rate_limiting.rate_limiting = (10, 5000)
+    graphql()
+    assert ratelimit.trackers[ratelimit.RESOURCE_GRAPHQL].remaining == 10
+    assert ratelimit.tracker.remaining is None
+    with pytest.raises(ratelimit.GitHubRateLimited):
+        graphql()
+    # The REST quota is untouched, so submissions can still be created
+    rate_limiting.rate_limiting = (4000, 5000)
+    ratelimit.rate_limited(lambda: None)()
+    ratelimit.tracker.check()
@@ -0,0 +1,214 @@
+import datetime
+import re
+from unittest import mock
+
+import moto
+import pytest
+import responses
+from fixtures.models import make_submission
+from github.Issue import Issue
+from lumina.config import settings
+from lumina.database import operations, table
+from lumina.database.models import GitHubIssueState
+from lumina.github import ratelimit, reconcile
+from lumina.github.submissions import make_issue_model
+
+
+@pytest.fixture(autouse=True)
+def create_tables():
+    operations.submission_owners.clear()
+    operations.target_submissions.clear()
+    with moto.mock_dynamodb():
+        table.create_tables()
+        yield
+
+
+@pytest.fixture()
+def requester():
+    with mock.patch.object(reconcile, "get_requester") as get_requester, mock.patch(
+        "lumina.github.connection.get_requester"
+    ) as get_core_requester:
+        get_core_requester().rate_limiting = (-1, -1)
+        yield get_requester()
+
+
+def list_issues(requester: mock.Mock, *pages: list[dict], etag: str = '"abc"'):
+    """Respond to listing issues with the pages, linked by the Link header"""
+    requester.requestJsonAndCheck.side_effect = [
+        (
+            {"etag": etag}
+            | (
+                {"link": f'<https://api.github.com/page/{i + 2}>; rel="next"'}
+                if i + 1 < len(pages)
+                else {}
+            ),
+            page,
+        )
+        for i, page in enumerate(pages)
+    ]
+
+
+def make_issue(number: int, updated_at: datetime.datetime, **kwargs) -> dict:
+    """An issue as listed by GitHub's REST API"""
+    timestamp = updated_at.astimezone(datetime.timezone.utc).strftime(
+        "%Y-%m-%dT%H:%M:%SZ"
+    )
+    return {
+        "number": number,
+        "state": "open",
+        "state_reason": None,
+        "title": "Romeo and Juliet",
+        "created_at": timestamp,
+        "updated_at": timestamp,
+        "closed_at": None,
+        "comments": 0,
+        **kwargs,
+    }
+
+
+LIST_PATH = f"/repos/{settings.github_owner}/{settings.github_repo}/issues"
+LIST_PARAMETERS = {
+    "state": "all",
+    "sort": "updated",
+    "direction": "asc",
+    "per_page": 100,
+}
+
+
+def test_reconcile_issues(requester):
+    submission = operations.put_submission(make_submission(101))
+    operations.put_submission(make_submission(102))
+    updated_at = (
+        submission.github_issue.updated_at + datetime.timedelta(minutes=1)
+    ).replace(microsecond=0)
+    closed = make_issue(
+        101,
+        updated_at,
+        state="closed",
+        state_reason="completed",
+        closed_at=updated_at.isoformat(),
+    )
+    pull_request = make_issue(103, updated_at, pull_request={"url": "x"})
+    list_issues(requester, [closed], [pull_request])
+
+    assert reconcile.reconcile_issues() == [101]
+    assert requester.requestJsonAndCheck.call_args_list == [
+        mock.call("GET", LIST_PATH, LIST_PARAMETERS, headers=None),
+        mock.call("GET", "https://api.github.com/page/2"),
+    ]
+    github_issue = operations.get_submission(101).github_issue
+    assert github_issue.state == GitHubIssueState.COMPLETED
+    assert github_issue.closed_at == updated_at
+    assert operations.get_github_issues_watermark() == updated_at
+
+    # The next run starts from the watermark, and the issue is now up to date
+    list_issues(requester, [closed], etag='"def"')
+    assert reconcile.reconcile_issues() == []
+    requester.requestJsonAndCheck.assert_called_with(
+        "GET",
+        LIST_PATH,
+        LIST_PARAMETERS | {"since": updated_at.strftime("%Y-%m-%dT%H:%M:%SZ")},
+        headers=None,
+    )
+    # Listed from the watermark, which didn't move, so the next run is conditional
+    list_issues(requester, [closed])
+    reconcile.reconcile_issues()
+    assert requester.requestJsonAndCheck.call_args.kwargs == {
+        "headers": {"If-None-Match": '"def"'}
+    }
+
+
+def test_reconcile_issues_not_modified(requester):
+    watermark = datetime.datetime(2023, 8, 1, tzinfo=datetime.timezone.utc)
+    operations.put_github_issues_watermark(watermark, etag='"abc"')
+    requester.requestJsonAndCheck.return_value = ({}, None)
+    with mock.patch.object(
+        operations, "update_submission_github_issues"
+    ) as update_issues:
+        assert reconcile.reconcile_issues() == []
+    update_issues.assert_not_called()
+    assert operations.get_github_issues_watermark_item() == (watermark, '"abc"')
+
+
+def test_reconcile_issues_none_updated(requester):
+    watermark = datetime.datetime(2023, 8, 1, tzinfo=datetime.timezone.utc)
+    operations.put_github_issues_watermark(watermark)
+    list_issues(requester, [])
+    assert reconcile.reconcile_issues() == []
+    assert operations.get_github_issues_watermark() == watermark
+
+
+def test_reconcile_issues_full(requester):
+    operations.put_github_issues_watermark(
+        datetime.datetime(2023, 8, 1, tzinfo=datetime.timezone.utc), etag='"abc"'
+    )
+    list_issues(requester, [])
+    reconcile.reconcile_issues(full=True)
+    requester.requestJsonAndCheck.assert_called_once_with(
+        "GET", LIST_PATH, LIST_PARAMETERS, headers=None
+    )
+
+
+def make_pygithub_issue(number: int, updated_at: str) -> Issue:
+    """A real PyGithub issue, as returned when a submission's issue is created"""
+    return Issue(
+        requester=None,
+        headers={},
+        attributes={
+            "number": number,
+            "state": "open",
+            "title": "Romeo and Juliet",
+            "created_at": "2023-08-01T00:00:00Z",
+            "updated_at": updated_at,
+            "closed_at": None,
+            "comments": 0,
+        },
+        completed=True,
+    )
+
+
+def test_reconcile_issues_created_through_api(requester):
+    issue = make_issue_model(make_pygithub_issue(101, "2023-08-01T00:00:00Z"))
+    operations.put_submission(make_submission(101, github_issue=issue))
+    updated_at = datetime.datetime(2023, 8, 2, tzinfo=datetime.timezone.utc)
+    list_issues(requester, [make_issue(101, updated_at, comments=2)])
+    assert reconcile.reconcile_issues() == [101]
+    assert operations.get_submission(101).github_issue.comments == 2
+
+
+def test_reconcile_issues_stored_naive(requester):
+    # Submissions stored before issues were made aware hold naive times
+    operations.put_submission(make_submission(101))
+    table.get_member_table().update_item(
+        Key={"pk": "fred_bloggs", "sk": "submission/101"},
+        UpdateExpression="set github_issue.updated_at = :naive",
+        ExpressionAttributeValues={":naive": "2023-08-01T00:00:00"},
+    )
+    stored = operations.get_submission(101).github_issue
+    assert stored.updated_at.tzinfo is not None
+    updated_at = datetime.datetime(2023, 8, 2, tzinfo=datetime.timezone.utc)
+    list_issues(requester, [make_issue(101, updated_at, comments=2)])
+    assert reconcile.reconcile_issues() == [101]
+    assert operations.get_submission(101).github_issue.comments == 2
+
+
+@responses.activate
+def test_reconcile_issues_not_modified_costs_no_quota():
+    from github import Github
+
+    requester = Github(auth=None)._Github__requester  # noqa: SLF001
+    watermark = datetime.datetime(2023, 8, 1, tzinfo=datetime.timezone.utc)
+    operations.put_github_issues_watermark(watermark, etag='"abc"')
+    # PyGithub adds the port to the URL
+    url = re.compile(f"https://api.github.com(:443)?{LIST_PATH}")
+    # GitHub doesn't count a 304 against the quota, so reports it unchanged
+    quota = {"x-ratelimit-remaining": "4000", "x-ratelimit-limit": "5000"}
+    responses.get(url, status=304, headers=quota)
+    ratelimit.tracker.update(4000, 5000, 0)
+    with mock.patch.object(
+        reconcile, "get_requester", return_value=requester
+    ), mock.patch("lumina.github.connection.get_requester", return_value=requester):
+        assert reconcile.reconcile_issues() == []
+    [call] = responses.calls
+    assert call.request.headers["If-None-Match"] == '"abc"'
+    assert ratelimit.tracker.remaining == 4000
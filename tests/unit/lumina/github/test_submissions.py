@@ -1,4 +1,7 @@
+from unittest import mock
+
 import pytest
+from fixtures.models import MEMBER_MODEL_FRED_BLOGGS
 from lumina.database.models import GitHubIssueModel, GitHubIssueState, MemberModel
 from lumina.github import submissions
 from lumina.schema.submissions import GenericSubmissionRequest, SubmitterRequest
@@ -103,8 +106,30 @@ def test_make_issue_model():
         number=8,
         state=GitHubIssueState.OPEN,
         title="Test submission",
-        created_at="2022-01-26T20:45:07",
-        updated_at="2022-01-26T20:45:07",
+        created_at="2022-01-26T20:45:07Z",
+        updated_at="2022-01-26T20:45:07Z",
         closed_at=None,
         comments=0,
     )
+
+
+@pytest.mark.parametrize("member", [None, MEMBER_MODEL_FRED_BLOGGS])
+def test_create_pending_submission_issue_matches_generic(member):
+    request = GenericSubmissionRequest(
+        target_type="show",
+        target_id="11_12/faust_is_dead",
+        target_name="Faust is Dead",
+        target_url="https://history.newtheatre.org.uk/years/11_12/faust_is_dead/",
+        message="This is a test submission.",
+        submitter=None
+        if member
+        else SubmitterRequest(id="c0286cf1-15cc-4e43-93de-aaca592e447b", name="Fred"),
+    )
+    submitter_id = member.pk if member else request.submitter.id
+    with mock.patch.object(submissions, "get_content_repo") as get_content_repo:
+        submissions.create_generic_submission_issue(request, member)
+        submissions.create_pending_submission_issue(
+            request.to_pending_model(submitter_id=submitter_id, member=member)
+        )
+    generic, pending = get_content_repo().create_issue.call_args_list
+    assert pending == generic
@@ -1,16 +1,12 @@
 from unittest import mock
 
 import fixtures.github
+import orjson
 import pytest
 from lumina.database.models import GitHubIssueModel, GitHubIssueState
-from lumina.database.operations import ResultNotFound
+from lumina.database.operations import ResultNotFound, ResultOutdated
 from lumina.github import webhooks
-from lumina.schema.github import (
-    GitHubIssue,
-    GitHubRepository,
-    GitHubRepositoryOwner,
-    GitHubWebhook,
-)
+from lumina.schema.github import GitHubIssue
 
 
 @pytest.fixture(autouse=True)
@@ -42,60 +38,75 @@ class TestVerifyWebhook:
         )
 
 
-ISSUE_CLOSED_HOOK = GitHubWebhook(
-    action="closed",
-    issue=GitHubIssue(
-        number=1,
-        state=GitHubIssueState.CLOSED,
-        title="Issue 1",
-        created_at="2020-01-01T00:00:00Z",
-        updated_at="2020-01-01T00:00:00Z",
-        closed_at="2020-01-02T00:00:00Z",
-        comments=2,
-    ),
-    repository=GitHubRepository(
-        name="lumina-test",
-        owner=GitHubRepositoryOwner(login="newtheatre"),
-    ),
-)
+def make_body(payload: dict, **issue) -> bytes:
+    return orjson.dumps({**payload, "issue": {**payload["issue"], **issue}})
 
-ISSUE_COMPLETED_HOOK = GitHubWebhook(
-    action="closed",
-    issue=GitHubIssue(
-        number=1,
-        state=GitHubIssueState.CLOSED,
-        title="Issue 1",
-        created_at="2020-01-01T00:00:00Z",
-        updated_at="2020-01-01T00:00:00Z",
-        closed_at="2020-01-02T00:00:00Z",
-        comments=2,
-        state_reason="completed",
-    ),
-    repository=GitHubRepository(
-        name="lumina-test",
-        owner=GitHubRepositoryOwner(login="newtheatre"),
-    ),
+
+ISSUE_CLOSED_BODY = make_body(fixtures.github.WEBHOOK_ISSUE_CLOSED)
+ISSUE_COMPLETED_BODY = make_body(
+    fixtures.github.WEBHOOK_ISSUE_CLOSED, state_reason="completed"
 )
 
 
+class TestParseWebhookIssue:
+    def test_issue_closed(self):
+        issue = webhooks.parse_webhook_issue("issues", ISSUE_CLOSED_BODY)
+        assert issue == GitHubIssue(**fixtures.github.WEBHOOK_ISSUE_CLOSED["issue"])
+
+    def test_issue_comment(self):
+        issue = webhooks.parse_webhook_issue(
+            "issue_comment", fixtures.github.SIGNED_BODY.encode()
+        )
+        assert issue.number == 7
+
+    @pytest.mark.parametrize(
+        "event,body",
+        [
+            (None, ISSUE_CLOSED_BODY),
+            ("push", ISSUE_CLOSED_BODY),
+            # Not parsed, so not even JSON matters
+            ("star", b"not json"),
+            (
+                "issues",
+                orjson.dumps(
+                    {**fixtures.github.WEBHOOK_ISSUE_CLOSED, "action": "labeled"}
+                ),
+            ),
+            (
+                "issue_comment",
+                orjson.dumps(
+                    {
+                        **fixtures.github.WEBHOOK_ISSUE_COMMENT_CREATED,
+                        "action": "edited",
+                    }
+                ),
+            ),
+        ],
+    )
+    def test_ignored(self, event, body):
+        assert webhooks.parse_webhook_issue(event, body) is None
+
+
 class TestHandleWebhook:
     def test_issue_closed(self):
         with mock.patch(
             "lumina.database.operations.update_submission_github_issue",
             return_value=None,
         ) as mock_update_issue:
-            webhooks.handle_webhook(ISSUE_CLOSED_HOOK)
+            assert webhooks.handle_webhook("issues", ISSUE_CLOSED_BODY)
         assert mock_update_issue.call_count == 1
+        issue = fixtures.github.WEBHOOK_ISSUE_CLOSED["issue"]
         assert mock_update_issue.call_args[0][1] == GitHubIssueModel(
-            **ISSUE_CLOSED_HOOK.issue.model_dump()
+            **{field: issue[field] for field in GitHubIssueModel.model_fields}
         )
+        assert mock_update_issue.call_args[1] == {"return_model": False}
 
     def test_issue_completed(self):
         with mock.patch(
             "lumina.database.operations.update_submission_github_issue",
             return_value=None,
         ) as mock_update_issue:
-            webhooks.handle_webhook(ISSUE_COMPLETED_HOOK)
+            webhooks.handle_webhook("issues", ISSUE_COMPLETED_BODY)
         assert mock_update_issue.call_count == 1
         saved_issue: GitHubIssueModel = mock_update_issue.call_args[0][1]
         assert saved_issue.state == GitHubIssueState.COMPLETED
@@ -105,4 +116,61 @@ class TestHandleWebhook:
             "lumina.database.operations.update_submission_github_issue",
             side_effect=ResultNotFound,
         ):
-            webhooks.handle_webhook(ISSUE_CLOSED_HOOK)
+            webhooks.handle_webhook("issues", ISSUE_CLOSED_BODY)
+
+    def test_ignored(self):
+        with mock.patch(
+            "lumina.database.operations.update_submission_github_issue"
+        ) as mock_update_issue:
+            assert not webhooks.handle_webhook("push", ISSUE_CLOSED_BODY)
+        mock_update_issue.assert_not_called()
+
+
+class TestHandleWebhookDelivery:
+    @pytest.fixture()
+    def update_issue(self):
+        with mock.patch(
+            "lumina.database.operations.update_submission_github_issue"
+        ) as update_issue:
+            yield update_issue
+
+    def test_redelivery_skipped(self, update_issue):
+        with mock.patch(
+            "lumina.database.operations.put_webhook_delivery", side_effect=[True, False]
+        ) as put_delivery:
+            assert webhooks.handle_webhook("issues", ISSUE_CLOSED_BODY, "abc")
+            assert not webhooks.handle_webhook("issues", ISSUE_CLOSED_BODY, "abc")
+        assert put_delivery.call_args_list == [mock.call("abc"), mock.call("abc")]
+        assert update_issue.call_count == 1
+
+    def test_ignored_event_not_recorded(self, update_issue):
+        with mock.patch(
+            "lumina.database.operations.put_webhook_delivery"
+        ) as put_delivery:
+            assert not webhooks.handle_webhook("star", b"{}", "abc")
+        put_delivery.assert_not_called()
+
+    def test_ignored_action_not_recorded(self, update_issue):
+        body = orjson.dumps({**orjson.loads(ISSUE_CLOSED_BODY), "action": "labeled"})
+        with mock.patch(
+            "lumina.database.operations.put_webhook_delivery"
+        ) as put_delivery:
+            assert not webhooks.handle_webhook("issues", body, "abc")
+        put_delivery.assert_not_called()
+        update_issue.assert_not_called()
+
+    def test_failure_forgets_delivery(self, update_issue):
+        update_issue.side_effect = RuntimeError
+        with mock.patch(
+            "lumina.database.operations.put_webhook_delivery", return_value=True
+        ), mock.patch(
+            "lumina.database.operations.delete_webhook_delivery"
+        ) as delete_delivery, pytest.raises(
+            RuntimeError
+        ):
+            webhooks.handle_webhook("issues", ISSUE_CLOSED_BODY, "abc")
+        delete_delivery.assert_called_once_with("abc")
+
+    def test_outdated_issue(self, update_issue):
+        update_issue.side_effect = ResultOutdated
+        assert webhooks.handle_webhook("issues", ISSUE_CLOSED_BODY)
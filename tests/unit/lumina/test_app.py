@@ -0,0 +1,19 @@
+import subprocess
+import sys
+
+
+def test_heavy_dependencies_not_imported_at_startup():
+    # Run in a fresh interpreter as other tests will have imported these already
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import sys, lumina.app; "
+            "print(','.join(m for m in ('github', 'jinja2', 'html2text') "
+            "if m in sys.modules))",
+        ],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert result.stdout.strip() == ""
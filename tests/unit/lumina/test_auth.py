@@ -1,10 +1,16 @@
 from http import HTTPStatus
+from unittest import mock
 
 import freezegun
 import jwt
 import pytest
 from fastapi import HTTPException
+from fixtures import keys
 from lumina import auth
+from lumina.config import settings
+from lumina.database import operations
+from lumina.database.models import MemberModel
+from lumina.database.operations import ResultNotFound
 from unit.lumina.endpoints.conftest import MEMBER_ADMIN_BLOGGS, MEMBER_FRED_BLOGGS
 
 
@@ -33,6 +39,118 @@ def test_expired_token(mock_keys):
         auth.decode_jwt(token)
 
 
+class TestVerifiedTokenCache:
+    def test_public_key_parsed_once(self, mock_keys):
+        auth.load_public_key.cache_clear()
+        token = auth.encode_jwt("fred_bloggs")
+        with mock.patch(
+            "lumina.auth.serialization.load_pem_public_key",
+            wraps=auth.serialization.load_pem_public_key,
+        ) as mock_load:
+            auth.decode_jwt(token)
+            auth.decode_jwt(auth.encode_jwt("alice_froggs"))
+        assert mock_load.call_count == 1
+
+    def test_verified_token_not_verified_again(self, mock_keys):
+        token = auth.encode_jwt("fred_bloggs")
+        with mock.patch("lumina.auth.jwt.decode", wraps=jwt.decode) as mock_decode:
+            assert auth.decode_jwt(token).id == "fred_bloggs"
+            assert auth.decode_jwt(token).id == "fred_bloggs"
+        assert mock_decode.call_count == 1
+
+    def test_cache_cleared_on_key_rotation(self, mock_keys):
+        token = auth.encode_jwt("fred_bloggs")
+        auth.decode_jwt(token)
+        with mock.patch(
+            "lumina.auth.get_jwt_public_key",
+            return_value=keys.EXAMPLE_PUBLIC_KEY + "\n",
+        ), mock.patch("lumina.auth.jwt.decode", wraps=jwt.decode) as mock_decode:
+            auth.decode_jwt(token)
+        assert mock_decode.call_count == 1
+
+    def test_lru_eviction(self, mock_keys):
+        cache = auth.VerifiedTokenCache(maxsize=2)
+        key = auth.load_public_key(keys.EXAMPLE_PUBLIC_KEY)
+        tokens = [auth.encode_jwt(id) for id in ("a", "b", "c")]
+        # First get binds the cache to the key
+        assert cache.get(tokens[0], key) is None
+        for token in tokens:
+            cache.put(token, auth.decode_jwt(token))
+        assert cache.get(tokens[0], key) is None
+        assert cache.get(tokens[1], key).id == "b"
+        assert cache.get(tokens[2], key).id == "c"
+
+
+@pytest.fixture()
+def member_claims():
+    operations.member_versions.clear()
+    with mock.patch.object(settings, "jwt_member_claims", True):
+        yield
+    operations.member_versions.clear()
+
+
+class TestMemberClaims:
+    def test_no_claims_by_default(self, mock_keys):
+        token = auth.encode_jwt("admin_bloggs", MEMBER_ADMIN_BLOGGS)
+        assert auth.decode_jwt(token).principal is None
+
+    def test_encode_and_decode_claims(self, mock_keys, member_claims):
+        token = auth.encode_jwt("admin_bloggs", MEMBER_ADMIN_BLOGGS)
+        assert auth.decode_jwt(token).principal == auth.MemberPrincipal(
+            id="admin_bloggs",
+            is_admin=True,
+            email_verified=False,
+            profile_version=0,
+        )
+
+    @mock.patch("lumina.database.operations.get_member", side_effect=AssertionError)
+    @mock.patch("lumina.database.operations.get_member_profile_version", return_value=0)
+    def test_principal_from_claims(
+        self, get_member_profile_version, get_member, mock_keys, member_claims
+    ):
+        token = auth.decode_jwt(auth.encode_jwt("admin_bloggs", MEMBER_ADMIN_BLOGGS))
+        assert auth.require_principal(token).is_admin is True
+        assert auth.require_principal(token).is_admin is True
+        # Version is cached between requests
+        assert get_member_profile_version.call_count == 1
+
+    @mock.patch(
+        "lumina.database.operations.get_member",
+        return_value=MemberModel(
+            **MEMBER_ADMIN_BLOGGS.model_dump(exclude={"is_admin", "profile_version"}),
+            is_admin=False,
+            profile_version=1,
+        ),
+    )
+    @mock.patch("lumina.database.operations.get_member_profile_version", return_value=1)
+    def test_stale_claims_read_member(
+        self, get_member_profile_version, get_member, mock_keys, member_claims
+    ):
+        token = auth.decode_jwt(auth.encode_jwt("admin_bloggs", MEMBER_ADMIN_BLOGGS))
+        assert auth.require_principal(token).is_admin is False
+        assert get_member.called
+
+    @mock.patch(
+        "lumina.database.operations.get_member", return_value=MEMBER_ADMIN_BLOGGS
+    )
+    def test_no_claims_read_member(self, get_member, mock_keys):
+        token = auth.decode_jwt(auth.encode_jwt("admin_bloggs"))
+        assert auth.require_principal(token).is_admin is True
+        assert get_member.called
+
+    @mock.patch(
+        "lumina.database.operations.get_member_profile_version",
+        side_effect=ResultNotFound,
+    )
+    def test_member_no_longer_exists(
+        self, get_member_profile_version, mock_keys, member_claims
+    ):
+        token = auth.decode_jwt(auth.encode_jwt("admin_bloggs", MEMBER_ADMIN_BLOGGS))
+        with pytest.raises(HTTPException) as exc:
+            auth.require_principal(token)
+        assert exc.value.status_code == HTTPStatus.UNAUTHORIZED
+
+
 class TestRequireAdmin:
     def test_success(self):
         member = auth.require_admin(MEMBER_ADMIN_BLOGGS)
@@ -0,0 +1,40 @@
+import pytest
+from lumina import aws
+from lumina.config import settings
+
+
+@pytest.fixture()
+def clear_clients():
+    # Clients created outside of moto have no credentials, don't leave them around
+    aws.clients.clear()
+    yield
+    aws.clients.clear()
+
+
+def test_clients_are_reused():
+    registry = aws.ClientRegistry()
+    assert registry.client("ssm") is registry.client("ssm")
+    assert registry.client("ses") is not registry.client("ssm")
+    assert registry.resource("dynamodb") is registry.resource("dynamodb")
+
+
+def test_clients_are_configured():
+    client = aws.ClientRegistry().client("ssm")
+    assert client.meta.region_name == settings.aws_region
+    assert client.meta.config.connect_timeout == settings.aws_connect_timeout
+    assert client.meta.config.read_timeout == settings.aws_read_timeout
+    assert client.meta.config.max_pool_connections == settings.aws_max_pool_connections
+    assert client.meta.config.retries["mode"] == "adaptive"
+    assert client.meta.config.tcp_keepalive is True
+
+
+def test_clear():
+    registry = aws.ClientRegistry()
+    client = registry.client("ssm")
+    registry.clear()
+    assert registry.client("ssm") is not client
+
+
+def test_shared_registry(clear_clients):
+    assert aws.get_ssm_client() is aws.get_ssm_client()
+    assert aws.get_dynamodb_resource() is aws.get_dynamodb_resource()
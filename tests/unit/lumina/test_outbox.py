@@ -0,0 +1,136 @@
+import datetime
+import json
+from unittest import mock
+
+import moto
+import pytest
+from fixtures.models import GITHUB_ISSUE, make_pending_submission
+from lumina import aws, outbox, queues
+from lumina.database import operations, table
+from lumina.github.submissions import make_issue_model
+from lumina.util import dates
+
+
+@pytest.fixture(scope="function", autouse=True)
+def create_tables():
+    operations.submission_owners.clear()
+    operations.target_submissions.clear()
+    with moto.mock_dynamodb():
+        table.create_tables()
+        yield
+
+
+@pytest.fixture()
+def create_issue():
+    with mock.patch(
+        "lumina.github.submissions.create_pending_submission_issue",
+        return_value=GITHUB_ISSUE,
+    ) as create_issue:
+        yield create_issue
+
+
+def test_handle_pending_submission(create_issue):
+    pending = operations.put_pending_submission(make_pending_submission())
+    submission = outbox.handle_message(outbox.make_message(pending))
+    create_issue.assert_called_once_with(pending)
+    assert submission.issue_id == GITHUB_ISSUE.number
+    assert submission.pk == "fred_bloggs"
+    assert submission.target_id == pending.draft.target_id
+    assert operations.get_submission(GITHUB_ISSUE.number) == submission
+    with pytest.raises(operations.ResultNotFound):
+        operations.get_pending_submission("fred_bloggs", pending.id)
+
+
+def test_handle_pending_submission_twice(create_issue):
+    pending = operations.put_pending_submission(make_pending_submission())
+    assert outbox.handle_message(outbox.make_message(pending))
+    assert outbox.handle_message(outbox.make_message(pending)) is None
+    create_issue.assert_called_once()
+    assert operations.get_member_submission_stats("fred_bloggs").count == 1
+
+
+def test_handle_pending_submission_conflict(create_issue):
+    pending = operations.put_pending_submission(make_pending_submission())
+    client = table.get_member_table().meta.client
+    conflict = client.exceptions.TransactionCanceledException(
+        {
+            "Error": {"Code": "TransactionCanceledException", "Message": ""},
+            "CancellationReasons": [
+                {"Code": "None"},
+                {"Code": "None"},
+                {"Code": "TransactionConflict"},
+                {"Code": "None"},
+                {"Code": "None"},
+            ],
+        },
+        "TransactWriteItems",
+    )
+    with mock.patch.object(
+        operations.transact, "write", side_effect=conflict
+    ), pytest.raises(client.exceptions.TransactionCanceledException):
+        outbox.handle_message(outbox.make_message(pending))
+    # The retry reuses the issue and completes the submission
+    assert outbox.handle_message(outbox.make_message(pending))
+    create_issue.assert_called_once()
+
+
+def test_handle_pending_submission_with_issue(create_issue):
+    # The issue was created by an earlier attempt which failed to complete
+    issue = make_issue_model(GITHUB_ISSUE)
+    pending = operations.put_pending_submission(
+        make_pending_submission(github_issue=issue)
+    )
+    submission = outbox.handle_message(outbox.make_message(pending))
+    create_issue.assert_not_called()
+    assert submission.github_issue == issue
+
+
+def test_handle_pending_submission_claimed(create_issue):
+    pending = operations.put_pending_submission(make_pending_submission())
+    operations.claim_pending_submission(
+        "fred_bloggs", pending.id, dates.now() + datetime.timedelta(minutes=2)
+    )
+    with pytest.raises(outbox.PendingSubmissionClaimed):
+        outbox.handle_message(outbox.make_message(pending))
+    create_issue.assert_not_called()
+
+
+def test_local_queue(create_issue):
+    queue = queues.LocalQueue(outbox.handle_messages)
+    with mock.patch.object(outbox, "get_queue", return_value=queue):
+        pending = outbox.submit(make_pending_submission())
+    assert operations.get_pending_submission("fred_bloggs", pending.id)
+    create_issue.assert_not_called()
+    queue.flush()
+    create_issue.assert_called_once()
+    assert not queue.messages
+    assert operations.get_submission(GITHUB_ISSUE.number)
+
+
+def test_sqs_queue():
+    # A registry of our own so the SQS client created under moto isn't kept
+    with moto.mock_sqs(), mock.patch.object(aws, "clients", aws.ClientRegistry()):
+        url = aws.get_sqs_client().create_queue(QueueName="submissions")["QueueUrl"]
+        pending = make_pending_submission()
+        queues.SQSQueue(url).send(outbox.make_message(pending))
+        messages = aws.get_sqs_client().receive_message(QueueUrl=url)["Messages"]
+    assert [json.loads(m["Body"]) for m in messages] == [
+        {"owner": "fred_bloggs", "id": str(pending.id)}
+    ]
+
+
+def test_handle_sqs_event_reports_failures(create_issue):
+    pending = operations.put_pending_submission(make_pending_submission())
+    claimed = operations.put_pending_submission(make_pending_submission())
+    operations.claim_pending_submission(
+        "fred_bloggs", claimed.id, dates.now() + datetime.timedelta(minutes=2)
+    )
+    event = {
+        "Records": [
+            {"messageId": "1", "body": json.dumps(outbox.make_message(pending))},
+            {"messageId": "2", "body": json.dumps(outbox.make_message(claimed))},
+        ]
+    }
+    assert outbox.handle_sqs_event(event, None) == {
+        "batchItemFailures": [{"itemIdentifier": "2"}]
+    }
@@ -1,3 +1,5 @@
+from unittest import mock
+
 import boto3
 import pytest
 from lumina import ssm
@@ -5,15 +7,106 @@ from lumina.config import settings
 from moto import mock_ssm
 
 
+@pytest.fixture(autouse=True)
+def clear_parameter_store():
+    ssm.parameter_store.clear()
+    yield
+    ssm.parameter_store.clear()
+
+
+def put_parameter(name: str, value: str) -> None:
+    boto3.client("ssm", region_name=settings.aws_region).put_parameter(
+        Name=name, Value=value, Type="String", Overwrite=True
+    )
+
+
 class TestGetSsmParameter:
     @mock_ssm()
     def test_get_param(self):
-        boto3.client("ssm", region_name=settings.aws_region).put_parameter(
-            Name="/test/exists", Value="test", Type="String"
-        )
+        put_parameter("/test/exists", "test")
         assert ssm.get_parameter("/test/exists") == "test"
 
     @mock_ssm()
     def test_get_missing_param(self):
         with pytest.raises(ValueError):
             ssm.get_parameter("/test/not-exists")
+
+    @mock_ssm()
+    def test_get_param_under_path(self):
+        put_parameter("/lumina/jwt/public", "public")
+        assert ssm.get_parameter("/lumina/jwt/public") == "public"
+
+    @mock_ssm()
+    def test_get_missing_param_under_path(self):
+        put_parameter("/lumina/jwt/public", "public")
+        with pytest.raises(ValueError):
+            ssm.get_parameter("/lumina/jwt/not-exists")
+
+
+class TestParameterStore:
+    @mock_ssm()
+    def test_fetches_path_in_one_go(self):
+        put_parameter("/lumina/jwt/public", "public")
+        put_parameter("/lumina/jwt/private", "private")
+        put_parameter("/lumina/github/access-token", "token")
+        store = ssm.ParameterStore(path="/lumina/", ttl=300)
+        with mock.patch.object(
+            store.client, "get_parameter", side_effect=AssertionError
+        ):
+            assert store.get("/lumina/jwt/public") == "public"
+            assert store.get("/lumina/jwt/private") == "private"
+            assert store.get("/lumina/github/access-token") == "token"
+
+    @mock_ssm()
+    def test_fresh_values_are_not_refreshed(self):
+        put_parameter("/lumina/jwt/public", "public")
+        store = ssm.ParameterStore(path="/lumina/", ttl=300)
+        store.get("/lumina/jwt/public")
+        with mock.patch.object(store, "refresh_in_background") as mock_refresh:
+            store.get("/lumina/jwt/public")
+        assert not mock_refresh.called
+
+    @mock_ssm()
+    def test_stale_value_served_while_refreshing(self):
+        put_parameter("/lumina/jwt/public", "old")
+        store = ssm.ParameterStore(path="/lumina/", ttl=0)
+        assert store.get("/lumina/jwt/public") == "old"
+        put_parameter("/lumina/jwt/public", "new")
+        with mock.patch.object(store, "refresh_in_background") as mock_refresh:
+            assert store.get("/lumina/jwt/public") == "old"
+        assert mock_refresh.called
+
+    @mock_ssm()
+    def test_background_refresh_picks_up_rotated_value(self):
+        put_parameter("/lumina/jwt/public", "old")
+        store = ssm.ParameterStore(path="/lumina/", ttl=300)
+        assert store.get("/lumina/jwt/public") == "old"
+        put_parameter("/lumina/jwt/public", "new")
+        store.refresh_in_background().join()
+        assert store.get("/lumina/jwt/public") == "new"
+
+    @mock_ssm()
+    def test_failed_refresh_keeps_stale_values(self):
+        put_parameter("/lumina/jwt/public", "old")
+        store = ssm.ParameterStore(path="/lumina/", ttl=300)
+        store.get("/lumina/jwt/public")
+        with mock.patch.object(
+            store.client, "get_paginator", side_effect=Exception("SSM is down")
+        ):
+            store.refresh_in_background().join()
+        assert store.get("/lumina/jwt/public") == "old"
+
+    @mock_ssm()
+    def test_parameter_outside_path_fetched_under_lock(self):
+        put_parameter("/test/exists", "test")
+        store = ssm.ParameterStore(path="/lumina/", ttl=300)
+        fetch_one = store._fetch_one  # noqa: SLF001
+
+        def fetch_locked(name):
+            # A refresh would otherwise replace the values as we add to them
+            assert store._lock.locked()  # noqa: SLF001
+            return fetch_one(name)
+
+        with mock.patch.object(store, "_fetch_one", side_effect=fetch_locked):
+            assert store.get("/test/exists") == "test"
+        assert store.get("/test/exists") == "test"
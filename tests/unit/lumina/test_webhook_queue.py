@@ -0,0 +1,126 @@
+import datetime
+import json
+from unittest import mock
+
+import fixtures.github
+import moto
+import orjson
+import pytest
+from fixtures.models import make_submission
+from lumina import queues, webhook_queue
+from lumina.database import operations, table
+from lumina.database.models import GitHubIssueModel
+
+
+@pytest.fixture(scope="function", autouse=True)
+def create_tables():
+    operations.submission_owners.clear()
+    operations.target_submissions.clear()
+    operations.webhook_deliveries.clear()
+    with moto.mock_dynamodb():
+        table.create_tables()
+        yield
+
+
+def issue_at(issue: GitHubIssueModel, seconds: int, **update) -> GitHubIssueModel:
+    return issue.model_copy(
+        update={
+            "updated_at": issue.updated_at + datetime.timedelta(seconds=seconds),
+            **update,
+        }
+    )
+
+
+def test_enqueue():
+    queue = queues.LocalQueue(webhook_queue.handle_messages)
+    with mock.patch.object(webhook_queue, "get_queue", return_value=queue):
+        assert webhook_queue.enqueue(
+            "issue_comment", fixtures.github.SIGNED_BODY.encode(), "abc"
+        )
+        assert not webhook_queue.enqueue("star", b"{}", "def")
+    [message] = queue.messages
+    assert message["delivery"] == "abc"
+    assert webhook_queue.parse_message(message).issue.number == 7
+    # Survives the trip through SQS
+    assert json.loads(orjson.dumps(message)) == message
+
+
+def test_handle_messages_coalesces():
+    issue = operations.put_submission(make_submission(101)).github_issue
+    other = operations.put_submission(make_submission(102)).github_issue
+    messages = [
+        webhook_queue.make_message(issue_at(issue, 2, comments=2), "b"),
+        webhook_queue.make_message(issue_at(other, 1, comments=7), "c"),
+        webhook_queue.make_message(issue_at(issue, 3, comments=3), "d"),
+        webhook_queue.make_message(issue_at(issue, 1, comments=1), "a"),
+    ]
+    with mock.patch(
+        "lumina.database.operations.update_submission_github_issue",
+        wraps=operations.update_submission_github_issue,
+    ) as update_issue:
+        assert webhook_queue.handle_messages(messages) == []
+    assert update_issue.call_count == 2
+    assert operations.get_submission(101).github_issue.comments == 3
+    assert operations.get_submission(102).github_issue.comments == 7
+    # Every delivery was recorded, not just the one written
+    assert not any(operations.put_webhook_delivery(d) for d in "abcd")
+
+
+def test_handle_messages_same_second():
+    issue = operations.put_submission(make_submission(101)).github_issue
+    messages = [
+        webhook_queue.make_message(issue_at(issue, 1, comments=1), "a"),
+        webhook_queue.make_message(issue_at(issue, 1, comments=2), "b"),
+    ]
+    assert webhook_queue.handle_messages(messages) == []
+    assert operations.get_submission(101).github_issue.comments == 2
+
+
+def test_handle_messages_skips_redelivered():
+    issue = operations.put_submission(make_submission(101)).github_issue
+    operations.put_webhook_delivery("b")
+    messages = [
+        webhook_queue.make_message(issue_at(issue, 1, comments=1), "a"),
+        webhook_queue.make_message(issue_at(issue, 2, comments=2), "b"),
+    ]
+    assert webhook_queue.handle_messages(messages) == []
+    assert operations.get_submission(101).github_issue.comments == 1
+
+
+def test_handle_messages_failure():
+    issue = operations.put_submission(make_submission(101)).github_issue
+    other = operations.put_submission(make_submission(102)).github_issue
+    messages = [
+        webhook_queue.make_message(issue_at(other, 1), "a"),
+        webhook_queue.make_message(issue_at(issue, 1), "b"),
+        {"delivery": "c", "issue": {"number": "x"}},
+        webhook_queue.make_message(issue_at(issue, 2), "d"),
+    ]
+    with mock.patch(
+        "lumina.github.webhooks.update_issue_snapshot",
+        side_effect=[None, RuntimeError],
+    ):
+        assert webhook_queue.handle_messages(messages) == [1, 2, 3]
+    # Deliveries of the failed issue are forgotten, so their retries are handled
+    assert not operations.put_webhook_delivery("a")
+    assert operations.put_webhook_delivery("b")
+    assert operations.put_webhook_delivery("d")
+
+
+def test_handle_sqs_event():
+    issue = operations.put_submission(make_submission(101)).github_issue
+    event = {
+        "Records": [
+            {
+                "messageId": "1",
+                "body": json.dumps(
+                    webhook_queue.make_message(issue_at(issue, 1, comments=4), "a")
+                ),
+            },
+            {"messageId": "2", "body": json.dumps({"issue": {}})},
+        ]
+    }
+    assert webhook_queue.handle_sqs_event(event, None) == {
+        "batchItemFailures": [{"itemIdentifier": "2"}]
+    }
+    assert operations.get_submission(101).github_issue.comments == 4
@@ -0,0 +1,35 @@
+import freezegun
+from lumina.util.cache import TTLCache
+
+
+class TestTTLCache:
+    def test_get_put(self):
+        cache: TTLCache[str, int] = TTLCache(ttl=60)
+        assert cache.get("a") is None
+        cache.put("a", 1)
+        assert cache.get("a") == 1
+
+    def test_expires(self):
+        cache: TTLCache[str, int] = TTLCache(ttl=60)
+        with freezegun.freeze_time("2020-01-01 00:00:00") as frozen_time:
+            cache.put("a", 1)
+            frozen_time.tick(59)
+            assert cache.get("a") == 1
+            frozen_time.tick(1)
+            assert cache.get("a") is None
+
+    def test_evicts_least_recently_used(self):
+        cache: TTLCache[str, int] = TTLCache(ttl=60, maxsize=2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.get("a")
+        cache.put("c", 3)
+        assert cache.get("a") == 1
+        assert cache.get("b") is None
+        assert cache.get("c") == 3
+
+    def test_invalidate(self):
+        cache: TTLCache[str, int] = TTLCache(ttl=60)
+        cache.put("a", 1)
+        cache.invalidate("a")
+        assert cache.get("a") is None